@@ -5,47 +5,76 @@ from flask import Flask, redirect, session, render_template
 from routes import init_routes
 from flask_mail import Mail
 from models import init_models
-from utils.database import init_db
+from utils.database import get_pool_stats
+from services.alert_dispatcher import ensure_dispatcher
+from services import context_cache, local_responder, model_router, semantic_cache, write_behind
+from utils import admission, cooperative, lifecycle
 import os
 
-app = Flask(__name__)
-app.config.from_object('config.Config')
-
-# Configure session secret key
-app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-
-# Initialize email
-mail = Mail(app)
-
-# Initialize MongoDB (no Flask app context required)
-init_db()
-init_models()
-init_routes(app)
-
-@app.route('/')
-def index():
-    """Root route - redirect based on login status."""
-    if 'user_email' in session:
-        role = session.get('user_role', 'student')
-        if role == 'student':
-            return redirect('/student/dashboard')
-        elif role == 'proctor':
-            return redirect('/proctor/dashboard')
-        elif role == 'hod':
-            return redirect('/proctor/hod')
-    return redirect('/login')
-
-@app.route('/health')
-def health():
-    return {'status': 'ok', 'app': 'AURA'}
-
-@app.route('/ui/chat')
-def ui_chat():
-    """Render the high-end chat UI template."""
-    return render_template('index.html')
+mail = Mail()
+
+
+def create_app() -> Flask:
+    """Build the Flask app.
+
+    Safe to call before a pre-forking server forks (gunicorn preload_app):
+    nothing here opens a connection or starts a thread. MongoDB, the alert
+    dispatcher, write-behind queues and admission state are all created
+    lazily, per process, on first use.
+    """
+    app = Flask(__name__)
+    app.config.from_object('config.Config')
+
+    # Configure session secret key
+    app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+
+    # Initialize email
+    mail.init_app(app)
+
+    init_models()
+    init_routes(app)
+
+    @app.before_request
+    def _start_background_workers():
+        # Idempotent and fork-aware: starts the alert outbox dispatcher in each worker
+        ensure_dispatcher()
+
+    @app.route('/')
+    def index():
+        """Root route - redirect based on login status."""
+        if 'user_email' in session:
+            role = session.get('user_role', 'student')
+            if role == 'student':
+                return redirect('/student/dashboard')
+            elif role == 'proctor':
+                return redirect('/proctor/dashboard')
+            elif role == 'hod':
+                return redirect('/proctor/hod')
+        return redirect('/login')
+
+    @app.route('/health')
+    def health():
+        draining = lifecycle.draining()
+        # 503 while draining so a load balancer stops sending new requests here
+        return {'status': 'draining' if draining else 'ok', 'app': 'AURA',
+                'db_pool': get_pool_stats(),
+                'write_behind': write_behind.all_stats(), 'admission': admission.stats(),
+                'local_responder': local_responder.stats(), 'model_tiers': model_router.stats(),
+                'context_cache': context_cache.stats(), 'semantic_cache': semantic_cache.stats(),
+                'concurrency': cooperative.describe()}, 503 if draining else 200
+
+    @app.route('/ui/chat')
+    def ui_chat():
+        """Render the high-end chat UI template."""
+        return render_template('index.html')
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
-    # Respect FLASK_DEBUG environment variable for local development
+    # Development only; production: python aura.py serve (see docs/PRODUCTION_SERVER.md)
     debug = os.getenv('FLASK_DEBUG', '').strip().lower() in ('1','true','yes','on')
     use_reloader = debug
     print(f"Starting app with debug={debug}")
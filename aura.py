@@ -0,0 +1,62 @@
+"""AURA command line.
+
+    python aura.py serve [--bind HOST:PORT] [--workers N] [--threads N]
+                         [--worker-class gthread|gevent] [--no-preload]
+    python aura.py dev   [--port 5000]
+
+`serve` runs the production server (gunicorn with gunicorn.conf.py); flags
+override the AURA_* / WEB_CONCURRENCY environment settings it reads. `dev`
+runs the Werkzeug development server with the debugger and reloader.
+See docs/PRODUCTION_SERVER.md.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def serve(args: argparse.Namespace) -> None:
+    if os.name == 'nt':
+        sys.exit('gunicorn does not run on Windows; use WSL or a container, or `python aura.py dev` locally.')
+    env = os.environ.copy()
+    for name, value in (('AURA_BIND', args.bind), ('WEB_CONCURRENCY', args.workers),
+                        ('AURA_THREADS', args.threads), ('AURA_WORKER_CLASS', args.worker_class)):
+        if value is not None:
+            env[name] = str(value)
+    if args.no_preload:
+        env['AURA_PRELOAD'] = 'false'
+    argv = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+            '--chdir', ROOT, args.app]
+    # Replace this process so gunicorn's master gets the signals (SIGTERM drains)
+    os.execvpe(argv[0], argv, env)
+
+
+def dev(args: argparse.Namespace) -> None:
+    from app import app
+    app.run(host='0.0.0.0', port=args.port, debug=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='aura', description='Run the AURA server.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='production server (gunicorn)')
+    p.add_argument('--bind', help='HOST:PORT (default 0.0.0.0:$PORT or 5000)')
+    p.add_argument('--workers', type=int, help='worker processes (default: CPU count, at least 2)')
+    p.add_argument('--threads', type=int, help='threads per gthread worker (default 64)')
+    p.add_argument('--worker-class', choices=('gthread', 'gevent'), help='default gthread')
+    p.add_argument('--no-preload', action='store_true', help='import the app in each worker instead of the master')
+    p.add_argument('--app', default='app:app', help=argparse.SUPPRESS)
+    p.set_defaults(func=serve)
+
+    p = sub.add_parser('dev', help='Werkzeug development server (debug, reloader)')
+    p.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    p.set_defaults(func=dev)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret')
@@ -12,11 +13,120 @@ class Config:
     # Local MongoDB: no TLS needed
     MONGODB_TLS = False
     MONGODB_TLS_ALLOW_INVALID_CERTIFICATES = False
+    # Connection pool (per process; 0 = no limit for the timeouts)
+    MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '50'))
+    MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', '0'))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+    MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '30000'))
+    MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '5000'))
+    # Read preference for dashboard aggregations (primary|primaryPreferred|secondary|secondaryPreferred|nearest)
+    MONGODB_ANALYTICS_READ_PREFERENCE = os.getenv('MONGODB_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+
+    # Store stress/mood readings as MongoDB time-series collections (5.0+).
+    # Existing data is moved with: python -m utils.timeseries migrate
+    READINGS_TIMESERIES = os.getenv('READINGS_TIMESERIES', 'false').strip().lower() == 'true'
+    READINGS_TS_GRANULARITY = os.getenv('READINGS_TS_GRANULARITY', 'hours')  # seconds|minutes|hours
+
+    # Live proctor feed (MongoDB change streams; requires a replica set)
+    LIVE_FEED_STREAM_ID = os.getenv('LIVE_FEED_STREAM_ID', 'proctor_feed')
+    LIVE_FEED_STRESS_THRESHOLD = int(os.getenv('LIVE_FEED_STRESS_THRESHOLD', '75'))
+
+    # Stress alerting: absolute ceiling plus per-student EWMA deviation
+    STRESS_ALERT_SCORE = int(os.getenv('STRESS_ALERT_SCORE', '80'))
+    STRESS_EWMA_ALPHA = float(os.getenv('STRESS_EWMA_ALPHA', '0.2'))
+    STRESS_ANOMALY_Z = float(os.getenv('STRESS_ANOMALY_Z', '3.0'))
+    STRESS_ANOMALY_MIN_DELTA = int(os.getenv('STRESS_ANOMALY_MIN_DELTA', '15'))
+    STRESS_ANOMALY_WARMUP = int(os.getenv('STRESS_ANOMALY_WARMUP', '5'))
+    # Variance floor (score points squared) for students with a flat baseline
+    STRESS_ANOMALY_MIN_VAR = float(os.getenv('STRESS_ANOMALY_MIN_VAR', '9'))
+    # JSON overrides for services.scoring.WEIGHT_PROFILES, keyed by profile
+    STRESS_WEIGHTS = os.getenv('STRESS_WEIGHTS', '')
 
     # Mail (optional; alerts will still be logged without mail)
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', '587'))
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').strip().lower() == 'true'
     MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME', ''))
+    MAIL_TIMEOUT = float(os.getenv('MAIL_TIMEOUT', '10'))
+    # Email alerts; unset means on when a sender (or MAIL_USERNAME) is configured
+    ALERTS_EMAIL_ENABLED = os.getenv('ALERTS_EMAIL_ENABLED',
+                                     'true' if MAIL_DEFAULT_SENDER else 'false').strip().lower() == 'true'
+    # Reopen the pooled SMTP connection after this much idle time
+    MAIL_IDLE_SECONDS = int(os.getenv('MAIL_IDLE_SECONDS', '60'))
+
+    # Alert outbox (services.alert_dispatcher)
+    ALERT_DEDUP_WINDOW_MINUTES = int(os.getenv('ALERT_DEDUP_WINDOW_MINUTES', '360'))
+    ALERT_BATCH_SIZE = int(os.getenv('ALERT_BATCH_SIZE', '50'))
+    ALERT_POLL_SECONDS = float(os.getenv('ALERT_POLL_SECONDS', '5'))
+    ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', '5'))
+    ALERT_RETRY_BASE_SECONDS = int(os.getenv('ALERT_RETRY_BASE_SECONDS', '30'))
+
+    # Write-behind persistence for chat turns (services.write_behind)
+    CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'true').strip().lower() == 'true'
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '100'))
+    WRITE_BEHIND_FLUSH_MS = int(os.getenv('WRITE_BEHIND_FLUSH_MS', '200'))
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv('WRITE_BEHIND_MAX_QUEUE', '5000'))
+    WRITE_BEHIND_PUT_TIMEOUT_MS = int(os.getenv('WRITE_BEHIND_PUT_TIMEOUT_MS', '50'))
+    WRITE_BEHIND_SHUTDOWN_SECONDS = float(os.getenv('WRITE_BEHIND_SHUTDOWN_SECONDS', '10'))
+
+    # Offline batch sync (/student/api/sync): events per request and how old a
+    # queued event may be before it is rejected instead of applied
+    SYNC_MAX_EVENTS = int(os.getenv('SYNC_MAX_EVENTS', '100'))
+    SYNC_MAX_AGE_DAYS = int(os.getenv('SYNC_MAX_AGE_DAYS', '7'))
+
+    # Idempotency-Key handling for chat/study POSTs (utils.idempotency)
+    IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+    IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', '120'))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '30'))
+
+    # Trivial chat messages answered locally without an LLM (services.local_responder);
+    # any of greeting,identity,thanks,how_are_you,farewell, empty to disable
+    LOCAL_RESPONDER_TIERS = os.getenv('LOCAL_RESPONDER_TIERS', 'greeting,identity,thanks,how_are_you,farewell')
+
+    # Model and output budget per reply kind/style (services.model_router);
+    # JSON merged over the built-in table, e.g. {"routes": {"mental:concise": "brief"}}
+    MODEL_ROUTING = os.getenv('MODEL_ROUTING', '')
+
+    # Provider-side context caching of the study prompt and uploaded documents
+    # (services.context_cache); backend genai, or fake in tests only
+    CONTEXT_CACHE_ENABLED = os.getenv('CONTEXT_CACHE_ENABLED', 'true').lower() == 'true'
+    CONTEXT_CACHE_BACKEND = os.getenv('CONTEXT_CACHE_BACKEND', 'genai')
+    CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '1800'))
+    CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = int(os.getenv('CONTEXT_CACHE_REFRESH_MARGIN_SECONDS', '300'))
+    CONTEXT_CACHE_RETRY_SECONDS = int(os.getenv('CONTEXT_CACHE_RETRY_SECONDS', '3600'))
+
+    # Approximate reply cache for first-turn messages (services.semantic_cache),
+    # per process; THRESHOLD is the cosine similarity needed for a hit
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.8'))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+    SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', '86400'))
+
+    # Native threads per gevent worker for blocking work (bcrypt, file I/O,
+    # SQLite), see utils.cooperative; unused with thread workers
+    COOPERATIVE_THREADPOOL_SIZE = int(os.getenv('COOPERATIVE_THREADPOOL_SIZE', '10'))
+
+    # Admission control for LLM calls (utils.admission), shared by all workers
+    # through a local SQLite file
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_DB_PATH = os.getenv('ADMISSION_DB_PATH', os.path.join(tempfile.gettempdir(), 'aura-admission.sqlite3'))
+    ADMISSION_USER_RATE_PER_MIN = float(os.getenv('ADMISSION_USER_RATE_PER_MIN', '6'))
+    ADMISSION_USER_BURST = int(os.getenv('ADMISSION_USER_BURST', '5'))
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '8'))
+    ADMISSION_MAX_WAITING = int(os.getenv('ADMISSION_MAX_WAITING', '16'))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', '10'))
+    ADMISSION_SLOT_LEASE_SECONDS = float(os.getenv('ADMISSION_SLOT_LEASE_SECONDS', '120'))
+
+    # Data retention (services.retention). Days of history kept in MongoDB per
+    # collection before archival to compressed monthly NDJSON files; 0 keeps forever.
+    RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', 'archive')
+    RETENTION_COMPRESSION = os.getenv('RETENTION_COMPRESSION', 'gzip')  # gzip|zstd
+    RETENTION_CHATS_DAYS = int(os.getenv('RETENTION_CHATS_DAYS', '365'))
+    RETENTION_READINGS_DAYS = int(os.getenv('RETENTION_READINGS_DAYS', '730'))
+    RETENTION_ALERTS_DAYS = int(os.getenv('RETENTION_ALERTS_DAYS', '180'))
+    # Operational records (batch job checkpoints) expire via TTL index
+    RETENTION_JOBS_DAYS = int(os.getenv('RETENTION_JOBS_DAYS', '30'))
+    # Raw chat feedback events; per-day rollups in feedback_daily are kept
+    RETENTION_FEEDBACK_DAYS = int(os.getenv('RETENTION_FEEDBACK_DAYS', '90'))
@@ -0,0 +1,73 @@
+"""Gunicorn settings for AURA: python aura.py serve (or gunicorn -c gunicorn.conf.py app:app).
+
+AURA requests are long and I/O bound: a chat reply waits seconds on the LLM
+provider and the proctor feed is a server-sent event stream that stays open.
+A sync worker would hold a whole process per request, so the worker class is:
+
+  gthread (default)  WEB_CONCURRENCY processes x AURA_THREADS threads each
+  gevent             WEB_CONCURRENCY processes x AURA_WORKER_CONNECTIONS
+                     greenlets each (utils.cooperative); needs gevent
+
+Defaults are computed from the CPU count and can each be overridden from the
+environment. See docs/PRODUCTION_SERVER.md for the benchmark behind them.
+"""
+import multiprocessing
+import os
+
+worker_class = os.getenv('AURA_WORKER_CLASS', 'gthread')
+cores = multiprocessing.cpu_count()
+
+bind = os.getenv('AURA_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+# Threads/greenlets carry the concurrency; processes use the cores (templates,
+# JSON, scoring) and keep one crash from taking the whole service down
+workers = int(os.getenv('WEB_CONCURRENCY', str(max(2, cores))))
+if worker_class == 'gevent':
+    worker_connections = int(os.getenv('AURA_WORKER_CONNECTIONS', '1000'))
+else:
+    # Every open proctor feed holds a thread, and so does every chat waiting
+    # on a provider or an admission slot (ADMISSION_MAX_CONCURRENT plus
+    # ADMISSION_MAX_WAITING per host); idle keep-alive connections do not
+    threads = int(os.getenv('AURA_THREADS', '64'))
+
+# preload_app imports the app once in the master; create_app() is fork-safe.
+# gevent must patch before anything is imported, so it preloads only when the
+# master is patched here as well.
+preload_app = os.getenv('AURA_PRELOAD', 'true').lower() == 'true'
+if worker_class == 'gevent' and preload_app:
+    from gevent import monkey
+    monkey.patch_all()
+
+# Heartbeat timeout; gthread/gevent workers keep beating during long requests
+timeout = int(os.getenv('AURA_TIMEOUT', '120'))
+# In-flight chats get this long to finish on shutdown/reload; above the
+# longest LLM call plus ADMISSION_MAX_WAIT_SECONDS
+graceful_timeout = int(os.getenv('AURA_GRACEFUL_TIMEOUT', '60'))
+# Seconds an idle keep-alive connection is held. Kept above the usual 60 s
+# load balancer / proxy idle timeout so the server never closes a connection
+# the client is about to reuse (a reset request); raise it if yours is longer
+keepalive = int(os.getenv('AURA_KEEPALIVE', '75'))
+
+# Recycle workers now and then (bounded memory from per-process caches)
+max_requests = int(os.getenv('AURA_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('AURA_MAX_REQUESTS_JITTER', '500'))
+
+accesslog = os.getenv('AURA_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('AURA_LOG_LEVEL', 'info')
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def on_starting(server):
+    concurrency = (f"{worker_connections} connections" if worker_class == 'gevent' else f"{threads} threads")
+    server.log.info(f"AURA: {workers} {worker_class} workers x {concurrency}, preload={preload_app}, "
+                    f"graceful_timeout={graceful_timeout}s, keepalive={keepalive}s")
+
+
+def post_worker_init(worker):
+    from utils import lifecycle
+    lifecycle.attach(worker)
+
+
+def worker_exit(server, worker):
+    from utils import lifecycle
+    lifecycle.shutdown()
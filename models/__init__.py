@@ -2,6 +2,15 @@ from .user import UserModel
 from .chat import ChatModel
 from .mood import MoodModel
 from .stress import StressModel
+from .student_state import StudentStateModel
+from .wellness_cube import WellnessCubeModel
+from .grievance import GrievanceModel
+from .alert import AlertModel
+from .proctor_note import ProctorNoteModel
+from .feedback_event import FeedbackEventModel, FeedbackDailyModel
+from .sync_receipt import SyncReceiptModel
+from .idempotency_key import IdempotencyKeyModel
+from .context_cache import ContextCacheModel
 
 def init_models():
     # Placeholder: models are defined as schema helpers for MongoDB
@@ -10,4 +19,14 @@ def init_models():
         'ChatModel': ChatModel,
         'MoodModel': MoodModel,
         'StressModel': StressModel,
+        'StudentStateModel': StudentStateModel,
+        'WellnessCubeModel': WellnessCubeModel,
+        'GrievanceModel': GrievanceModel,
+        'AlertModel': AlertModel,
+        'ProctorNoteModel': ProctorNoteModel,
+        'FeedbackEventModel': FeedbackEventModel,
+        'FeedbackDailyModel': FeedbackDailyModel,
+        'SyncReceiptModel': SyncReceiptModel,
+        'IdempotencyKeyModel': IdempotencyKeyModel,
+        'ContextCacheModel': ContextCacheModel,
     }
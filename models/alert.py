@@ -0,0 +1,39 @@
+from typing import Dict, Any
+from datetime import datetime
+from pymongo import DESCENDING
+
+class AlertModel:
+    """Institutional alert outbox, see utils.alerts and services.alert_dispatcher."""
+    collection_name = 'alerts'
+    STATUSES = ('pending', 'sending', 'sent', 'logged', 'failed')
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'student_email': str,
+            'score': int,
+            'reason': str,  # threshold|anomaly|crisis
+            'status': str,  # pending|sending|sent|logged|failed
+            'attempts': int,
+            'created_at': datetime,
+            'next_attempt_at': datetime,  # optional, retry backoff
+            'lease_until': datetime,  # optional, set while a dispatcher holds it
+            'proctor_email': str,  # optional until resolved
+            'parent_email': str,  # optional
+            'dup_count': int,  # optional, repeats folded into this alert
+            'sent_at': datetime,  # optional
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if not isinstance(doc.get('student_email'), str):
+            raise ValueError('student_email must be a string')
+        if doc.get('status') not in AlertModel.STATUSES:
+            raise ValueError('status must be one of ' + '|'.join(AlertModel.STATUSES))
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('status', 1), ('created_at', 1)], {}),  # dispatcher claims
+            ([('student_email', 1), ('created_at', DESCENDING)], {}),  # dedupe window
+        ]
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from datetime import datetime
+from pymongo import DESCENDING
 
 class ChatModel:
     collection_name = 'chats'
@@ -18,3 +19,11 @@ class ChatModel:
     def validate(doc: Dict[str, Any]) -> None:
         if doc.get('type') not in ('mental', 'study'):
             raise ValueError('type must be mental or study')
+
+    @staticmethod
+    def index_specs():
+        return [
+            # _id breaks created_at ties for keyset pagination (utils.pagination)
+            ([('user_email', 1), ('type', 1), ('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+            ('created_at', {}),  # retention sweeps by age
+        ]
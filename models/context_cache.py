@@ -0,0 +1,39 @@
+from typing import Dict, Any
+from datetime import datetime
+
+class ContextCacheModel:
+    """Handles of provider-side cached contexts, shared by all workers.
+
+    See services.context_cache. A record lives as long as the provider cache
+    it points to; `name` is None for a prefix the provider refused to cache,
+    so it is not retried on every request.
+    """
+    collection_name = 'context_caches'
+    KINDS = ('prompt', 'document')
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'key': str,  # unique: prompt:<model>:<hash> or document:<user>:<conversation>
+            'kind': str,  # prompt|document
+            'name': str,  # provider handle (cachedContents/...), None if not cacheable
+            'model': str,  # a cache can only be used with the model it was created for
+            'content_hash': str,  # sha256 of what was cached
+            'user_email': str,  # document caches only
+            'conversation_id': str,  # document caches only
+            'mime_type': str,  # document caches only
+            'created_at': datetime,
+            'expires_at': datetime,  # provider expiry; TTL
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if doc.get('kind') not in ContextCacheModel.KINDS:
+            raise ValueError('kind must be one of ' + '|'.join(ContextCacheModel.KINDS))
+
+    @staticmethod
+    def index_specs():
+        return [
+            ('key', {'unique': True}),
+            ('expires_at', {'expireAfterSeconds': 0}),
+        ]
@@ -0,0 +1,103 @@
+from typing import Dict, Any, Optional
+from datetime import datetime
+from config import Config
+
+class FeedbackEventModel:
+    """Client telemetry about chat replies (thumbs, copy, regenerate)."""
+    collection_name = 'feedback_events'
+    ACTIONS = ('thumbs_up', 'thumbs_down', 'copy', 'regenerate')
+    STYLES = ('ultra_brief', 'concise', 'structured', 'unknown')
+    PROVIDERS = ('gemini', 'groq', 'openai', 'local', 'semantic_cache', 'unknown')
+    MAX_TEXT = 500
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'user_email': str,  # from the session, never from the client
+            'action': str,  # thumbs_up|thumbs_down|copy|regenerate
+            'response_id': str,  # optional, chats._id of the rated reply
+            'style': str,  # reply style, see services.ai_service._classify_request
+            'provider': str,  # gemini|groq|openai|local|semantic_cache
+            'text': str,  # optional, truncated to MAX_TEXT
+            'client_ts': datetime,  # optional, when the client recorded it
+            'created_at': datetime,
+        }
+
+    @staticmethod
+    def from_client(raw: Any, user_email: str, now: datetime) -> Dict[str, Any]:
+        """Build a validated event document from client JSON; raises ValueError."""
+        if not isinstance(raw, dict):
+            raise ValueError('event must be an object')
+        doc = {
+            'user_email': user_email,
+            'action': str(raw.get('action') or '').strip(),
+            'style': str(raw.get('style') or 'unknown'),
+            'provider': str(raw.get('provider') or 'unknown'),
+            'created_at': now,
+        }
+        if raw.get('response_id'):
+            doc['response_id'] = str(raw['response_id'])[:64]
+        if raw.get('text'):
+            doc['text'] = str(raw['text'])[:FeedbackEventModel.MAX_TEXT]
+        client_ts = FeedbackEventModel._parse_ts(raw.get('ts'))
+        if client_ts is not None:
+            doc['client_ts'] = client_ts
+        FeedbackEventModel.validate(doc)
+        return doc
+
+    @staticmethod
+    def _parse_ts(value) -> Optional[datetime]:
+        if isinstance(value, (int, float)):
+            return datetime.utcfromtimestamp(value / 1000.0)  # JS Date.now()
+        if isinstance(value, str) and value:
+            try:
+                return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+            except ValueError:
+                raise ValueError('ts must be epoch milliseconds or ISO-8601')
+        return None
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if doc.get('action') not in FeedbackEventModel.ACTIONS:
+            raise ValueError('action must be one of ' + '|'.join(FeedbackEventModel.ACTIONS))
+        if doc.get('style') not in FeedbackEventModel.STYLES:
+            raise ValueError('style must be one of ' + '|'.join(FeedbackEventModel.STYLES))
+        if doc.get('provider') not in FeedbackEventModel.PROVIDERS:
+            raise ValueError('provider must be one of ' + '|'.join(FeedbackEventModel.PROVIDERS))
+
+    @staticmethod
+    def index_specs():
+        return [
+            # Daily rollups; raw events expire once rolled up into feedback_daily
+            ('created_at', {'expireAfterSeconds': Config.RETENTION_FEEDBACK_DAYS * 86400}),
+        ]
+
+
+class FeedbackDailyModel:
+    """Per-day feedback counts by reply style and provider (services.feedback_stats)."""
+    collection_name = 'feedback_daily'
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'day': str,  # YYYY-MM-DD (UTC)
+            'style': str,
+            'provider': str,
+            'thumbs_up': int,
+            'thumbs_down': int,
+            'copy': int,
+            'regenerate': int,
+            'up_rate': float,  # thumbs_up / (thumbs_up + thumbs_down), None without votes
+            'updated_at': datetime,
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if not isinstance(doc.get('day'), str):
+            raise ValueError('day must be a YYYY-MM-DD string')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('day', 1), ('style', 1), ('provider', 1)], {'unique': True}),
+        ]
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from datetime import datetime
+from pymongo import DESCENDING
 
 class GrievanceModel:
     collection_name = 'grievances'
@@ -21,3 +22,10 @@ class GrievanceModel:
     def validate(doc: Dict[str, Any]) -> None:
         if doc.get('status') not in ('pending', 'in_progress', 'resolved'):
             raise ValueError('status must be pending, in_progress, or resolved')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('status', 1), ('created_at', DESCENDING)], {}),
+            ([('user_email', 1), ('created_at', DESCENDING)], {}),
+        ]
@@ -0,0 +1,32 @@
+from typing import Dict, Any
+from datetime import datetime
+
+class IdempotencyKeyModel:
+    """Idempotency-Key records for expensive POSTs, see utils.idempotency."""
+    collection_name = 'idempotency_keys'
+    STATUSES = ('in_progress', 'completed')
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'user_email': str,
+            'key': str,  # Idempotency-Key header, unique per user
+            'fingerprint': str,  # sha256 of method, path and body
+            'status': str,  # in_progress|completed
+            'lease_until': datetime,  # in_progress only; a crashed holder's key is taken over after this
+            'response': dict,  # completed only: {status_code, mimetype, body}
+            'created_at': datetime,
+            'expires_at': datetime,  # TTL
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if doc.get('status') not in IdempotencyKeyModel.STATUSES:
+            raise ValueError('status must be one of ' + '|'.join(IdempotencyKeyModel.STATUSES))
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('user_email', 1), ('key', 1)], {'unique': True}),
+            ('expires_at', {'expireAfterSeconds': 0}),
+        ]
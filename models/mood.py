@@ -1,5 +1,7 @@
 from typing import Dict, Any
 from datetime import datetime
+from pymongo import DESCENDING
+from config import Config
 
 class MoodModel:
     collection_name = 'moods'
@@ -18,3 +20,23 @@ class MoodModel:
         intensity = doc.get('intensity')
         if not isinstance(intensity, int) or not (1 <= intensity <= 10):
             raise ValueError('intensity must be an int between 1 and 10')
+
+    @staticmethod
+    def timeseries_options():
+        """Collection options when readings are stored as time-series, else None."""
+        if not Config.READINGS_TIMESERIES:
+            return None
+        return {'timeField': 'created_at', 'metaField': 'user_email',
+                'granularity': Config.READINGS_TS_GRANULARITY}
+
+    @staticmethod
+    def index_specs():
+        if Config.READINGS_TIMESERIES:
+            return [
+                ([('user_email', 1), ('created_at', 1)], {}),
+                ('created_at', {}),
+            ]
+        return [
+            ([('user_email', 1), ('created_at', DESCENDING)], {}),
+            ('created_at', {}),  # retention sweeps by age
+        ]
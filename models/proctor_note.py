@@ -0,0 +1,27 @@
+from typing import Dict, Any
+from datetime import datetime
+from pymongo import DESCENDING
+
+class ProctorNoteModel:
+    collection_name = 'proctor_notes'
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'user_email': str,  # student
+            'proctor_email': str,
+            'note': str,
+            'urgent': bool,
+            'created_at': datetime,
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if not isinstance(doc.get('note'), str) or not doc['note'].strip():
+            raise ValueError('note must be a non-empty string')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('user_email', 1), ('created_at', DESCENDING)], {}),
+        ]
@@ -1,5 +1,7 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
+from pymongo import DESCENDING
+from config import Config
 
 class StressModel:
     collection_name = 'stress'
@@ -23,45 +25,47 @@ class StressModel:
         if not isinstance(doc.get('source'), str):
             raise ValueError('source must be a string')
 
+    @staticmethod
+    def timeseries_options():
+        """Collection options when readings are stored as time-series, else None."""
+        if not Config.READINGS_TIMESERIES:
+            return None
+        return {'timeField': 'created_at', 'metaField': 'user_email',
+                'granularity': Config.READINGS_TS_GRANULARITY}
+
     @staticmethod
     def index_specs():
+        if Config.READINGS_TIMESERIES:
+            # (meta, time) serves per-user ranges and latest-first sorts in either
+            # direction; time-series collections allow no partial/unique indexes.
+            return [
+                ([('user_email', 1), ('created_at', 1)], {}),
+                ('created_at', {}),
+            ]
         return [
-            ('user_email', {'unique': False}),
-            ('created_at', {'unique': False}),
+            ([('user_email', 1), ('created_at', DESCENDING)], {}),
+            ('created_at', {'unique': False}),  # cube rebuild scans by day
+            ([('batch_id', 1), ('user_email', 1)], {'partialFilterExpression': {'batch_id': {'$exists': True}}}),
         ]
 
     @staticmethod
     def calculate_stress(mood: str, recent_chats, activity_level: int = 5) -> int:
-        """Compute stress score 0-100 using mood, chat sentiment proxy, and activity level."""
-        mood_weight = 0.4
-        chat_weight = 0.3
-        activity_weight = 0.3
+        """Compute stress score 0-100 using mood, chat sentiment, and activity level.
 
-        mood_map = {
-            'happy': 25,
-            'calm': 30,
-            'sad': 60,
-            'anxious': 70,
-            'stressed': 80,
-        }
-        mood_score = mood_map.get(mood, 50)
+        Thin wrapper over `services.scoring` with the 'activity' weight profile.
+        Chats without a stored `sentiment` are classified with a keyword proxy.
+        """
+        from services.scoring import score_one
 
-        # Simple sentiment proxy: shorter, positive-ish messages reduce stress; otherwise neutral.
         neg_words = {'stressed', 'anxious', 'anxiety', 'overwhelmed', 'tired', 'sad', 'panic'}
         pos_words = {'confident', 'prepared', 'ready', 'good', 'calm', 'okay'}
-        chat_scores = []
+        sentiments = []
         for chat in recent_chats or []:
-            text = (chat.get('message') or '') + ' ' + (chat.get('response') or '')
-            text_lower = text.lower()
-            negatives = sum(w in text_lower for w in neg_words)
-            positives = sum(w in text_lower for w in pos_words)
-            score = 60 + 10 * negatives - 10 * positives
-            chat_scores.append(score)
-        chat_score = sum(chat_scores) / len(chat_scores) if chat_scores else 50
-
-        # Activity: expected 0-10 (higher = healthier) → lower stress
-        activity_level = max(0, min(10, activity_level or 0))
-        activity_score = 100 - (activity_level * 10)
+            if chat.get('sentiment'):
+                sentiments.append(chat['sentiment'])
+                continue
+            text_lower = ((chat.get('message') or '') + ' ' + (chat.get('response') or '')).lower()
+            balance = sum(w in text_lower for w in neg_words) - sum(w in text_lower for w in pos_words)
+            sentiments.append('negative' if balance > 0 else 'positive' if balance < 0 else 'neutral')
 
-        raw = (mood_score * mood_weight) + (chat_score * chat_weight) + (activity_score * activity_weight)
-        return max(0, min(100, int(round(raw))))
+        return score_one(mood, sentiments, activity_level=activity_level or 0, weights='activity')
@@ -0,0 +1,48 @@
+from typing import Dict, Any
+from datetime import datetime
+from pymongo import DESCENDING
+
+class StudentStateModel:
+    """Per-student derived state, one document per student.
+
+    Maintained on every mood/stress write so dashboards can ask "what changed"
+    without touching raw readings.
+    """
+    collection_name = 'student_state'
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'user_email': str,
+            'proctor_email': str,  # denormalized from users for per-proctor queries
+            'department': str,  # optional, denormalized from users
+            'updated_at': datetime,
+            'last_stress_at': datetime,  # optional
+            'last_mood_at': datetime,  # optional
+            'recent': list,  # capped [{score, at}] window of stress readings
+            'risk': float,  # 0-100, see services.student_state.compute_risk
+            'latest_score': int,
+            'avg_7d': float,
+            'trend': str,  # up|down|stable
+            'risk_updated_at': datetime,
+            'ewma_mean': float,  # per-student baseline, see services.anomaly
+            'ewma_var': float,
+            'ewma_n': int,
+            'last_z': float,
+            'last_anomaly': bool,
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if not isinstance(doc.get('user_email'), str):
+            raise ValueError('user_email must be a string')
+        if not isinstance(doc.get('updated_at'), datetime):
+            raise ValueError('updated_at must be a datetime')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ('user_email', {'unique': True}),
+            ([('proctor_email', 1), ('updated_at', DESCENDING)], {}),
+            ([('proctor_email', 1), ('risk', DESCENDING)], {}),
+        ]
@@ -0,0 +1,39 @@
+from typing import Dict, Any
+from datetime import datetime
+from config import Config
+
+class SyncReceiptModel:
+    """One row per applied offline event, keyed by the client's idempotency key.
+
+    See services.offline_sync: a retried batch finds its receipts here and is
+    answered from them instead of being applied twice.
+    """
+    collection_name = 'sync_receipts'
+    KINDS = ('quick_action', 'mood')
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'user_email': str,
+            'key': str,  # client-generated, unique per user
+            'kind': str,  # quick_action|mood
+            'client_ts': datetime,  # when the event happened on the device
+            'status': str,  # pending|applied
+            'result': dict,  # optional until the batch is written, echoed on replay
+            'created_at': datetime,
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if not isinstance(doc.get('key'), str) or not doc['key']:
+            raise ValueError('key must be a non-empty string')
+        if doc.get('kind') not in SyncReceiptModel.KINDS:
+            raise ValueError('kind must be one of ' + '|'.join(SyncReceiptModel.KINDS))
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('user_email', 1), ('key', 1)], {'unique': True}),  # exactly-once per key
+            # Receipts only need to outlive the longest a device may hold queued events
+            ('created_at', {'expireAfterSeconds': Config.RETENTION_JOBS_DAYS * 86400}),
+        ]
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from datetime import datetime
+from pymongo import DESCENDING
 import hashlib
 
 class UserModel:
@@ -30,3 +31,11 @@ class UserModel:
         role = doc.get('role')
         if role not in ('student', 'proctor', 'hod'):
             raise ValueError('role must be one of student|proctor|hod')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ('email', {'unique': True}),
+            ([('role', 1), ('proctor_email', 1), ('email', 1)], {}),  # proctor roster
+            ([('role', 1), ('email', 1)], {}),  # role lookups, batch walk by email
+        ]
@@ -0,0 +1,40 @@
+from typing import Dict, Any
+from datetime import datetime
+
+class WellnessCubeModel:
+    """Pre-aggregated stress measures by day at department, proctor and student grain.
+
+    `key` is the department name, proctor email or student email depending on
+    `grain`. Measures are additive so readings can be folded in with `$inc`.
+    """
+    collection_name = 'wellness_cube'
+    GRAINS = ('department', 'proctor', 'student')
+
+    @staticmethod
+    def schema() -> Dict[str, Any]:
+        return {
+            'grain': str,  # department|proctor|student
+            'key': str,
+            'day': str,  # YYYY-MM-DD (UTC)
+            'department': str,
+            'proctor_email': str,
+            'count': int,
+            'sum': int,
+            'high_count': int,
+            'updated_at': datetime,
+        }
+
+    @staticmethod
+    def validate(doc: Dict[str, Any]) -> None:
+        if doc.get('grain') not in WellnessCubeModel.GRAINS:
+            raise ValueError('grain must be department, proctor, or student')
+        if not isinstance(doc.get('day'), str):
+            raise ValueError('day must be a YYYY-MM-DD string')
+
+    @staticmethod
+    def index_specs():
+        return [
+            ([('grain', 1), ('key', 1), ('day', 1)], {'unique': True}),
+            ([('grain', 1), ('department', 1), ('day', 1)], {}),
+            ([('grain', 1), ('proctor_email', 1), ('day', 1)], {}),
+        ]
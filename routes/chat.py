@@ -1,15 +1,53 @@
 import logging
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from datetime import datetime
+from bson import ObjectId
 from utils.database import get_db
 from models.chat import ChatModel
-from services.ai_service import generate_mental_response, extract_sentiment, analyze_study_material
+from models.feedback_event import FeedbackEventModel
+from utils.admission import Rejected
+from utils.cooperative import offload
+from utils.idempotency import idempotent
+from utils.pagination import iter_ndjson, keyset_page
+from services import local_responder
+from services.write_behind import get_queue
+from config import Config
+from utils.alerts import send_institutional_alert
+from services.ai_service import (generate_mental_response, extract_sentiment, analyze_study_material,
+                                 answer_study_followup)
 from flask import send_from_directory
 import os
 
 chat_bp = Blueprint('chat', __name__)
 log = logging.getLogger(__name__)
 
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+EXPORT_BATCH_SIZE = 500
+FEEDBACK_MAX_BATCH = 100
+CRISIS_ALERT_SCORE = 100  # alerts carry a score; crisis language is treated as the maximum
+HISTORY_FIELDS = ('message', 'response', 'timestamp', 'sentiment')
+# API field -> stored field
+_HISTORY_SOURCE = {'message': 'message', 'response': 'response', 'timestamp': 'created_at', 'sentiment': 'sentiment'}
+
+
+def _too_busy(exc: Rejected):
+    """429 for a request that was not admitted (per-user rate or provider capacity)."""
+    message = ('You are sending messages too quickly. Please wait a moment.' if exc.reason == 'user_rate'
+               else 'AURA is very busy right now. Please try again shortly.')
+    resp = jsonify({'error': message, 'reason': exc.reason, 'retry_after': exc.retry_after_header})
+    resp.headers['Retry-After'] = exc.retry_after_header
+    return resp, 429
+
+
+def _raise_crisis_alert(user_email: str) -> None:
+    """Queue the crisis alert before admission or the model can turn the request away."""
+    try:
+        send_institutional_alert(user_email, CRISIS_ALERT_SCORE, reason='crisis')
+        log.warning(f"Crisis language from {user_email}: alert queued")
+    except Exception as exc:
+        log.error(f"Crisis alert for {user_email} could not be queued: {exc}")
+
 
 def _get_db():
     """Return DB if available; fall back to None so API keeps working without Mongo."""
@@ -22,6 +60,7 @@ def _get_db():
 
 
 @chat_bp.route('/api/chat/mental', methods=['POST'])
+@idempotent
 def api_chat_mental():
     """Process user message and return AI-generated response."""
     try:
@@ -42,10 +81,15 @@ def api_chat_mental():
         if not user_email:
             log.warning("Not logged in")
             return jsonify({'error': 'Not logged in'}), 401
-        
+
+        if local_responder.is_crisis(user_message):
+            # Crisis language always reaches the proctor, whatever happens next
+            _raise_crisis_alert(user_email)
+
         db = _get_db()
         history = []
         chats_coll = None
+        first_turn = None
         if db is not None:
             log.info("✓ Database connected")
             chats_coll = db[ChatModel.collection_name]
@@ -61,6 +105,10 @@ def api_chat_mental():
             ]
             history = db_history
             log.info(f"✓ Loaded {len(history)} history items")
+            if conversation_id:
+                # History spans all conversations; the semantic cache needs this one's first turn
+                first_turn = chats_coll.find_one({'user_email': user_email, 'type': 'mental',
+                                                  'conversation_id': conversation_id}, {'_id': 1}) is None
         else:
             log.warning("✗ Database not available - running without persistence")
 
@@ -76,26 +124,41 @@ def api_chat_mental():
                         normalized.append({'role': role, 'content': content})
                 if normalized:
                     history = normalized
+                    first_turn = False
                     log.info(f"✓ Using client-provided history ({len(history)})")
             except Exception as _:
                 pass
 
         # Generate AI response
         log.info("→ Calling generate_mental_response...")
-        ai_response = generate_mental_response(user_message, history, kind=kind, conversation_id=conversation_id)
+        reply_meta = {}
+        ai_response = generate_mental_response(user_message, history, kind=kind, conversation_id=conversation_id,
+                                               meta=reply_meta, user_email=user_email, first_turn=first_turn)
         log.info(f"✓ Got response ({len(ai_response)} chars)")
 
         # Save to database
+        sentiment = extract_sentiment(user_message)
         chat_doc = {
+            '_id': ObjectId(),  # assigned here so the reply can be rated before the write lands
             'user_email': user_email,
             'message': user_message,
             'response': ai_response,
             'type': kind or 'mental',
-            'sentiment': extract_sentiment(user_message),
+            'sentiment': sentiment,
             'created_at': datetime.utcnow(),
             'conversation_id': conversation_id or None,
+            'style': reply_meta.get('style'),
+            'provider': reply_meta.get('provider'),
+            'fast_path': bool(reply_meta.get('fast_path')),
+            'tier': reply_meta.get('tier'),
+            'model': reply_meta.get('model'),
+            'cache_similarity': reply_meta.get('cache_similarity'),
         }
-        if chats_coll is not None:
+        if chats_coll is not None and Config.CHAT_WRITE_BEHIND:
+            # Batched in the background; the response does not wait for Mongo
+            get_queue(ChatModel.collection_name).put(chat_doc)
+            log.info("✓ Queued for database")
+        elif chats_coll is not None:
             chats_coll.insert_one(chat_doc)
             log.info("✓ Saved to database")
         else:
@@ -105,10 +168,18 @@ def api_chat_mental():
         return jsonify({
             'user_message': user_message,
             'ai_response': ai_response,
-            'sentiment': extract_sentiment(user_message),
+            'sentiment': sentiment,
             'timestamp': chat_doc['created_at'].isoformat(),
+            'response_id': str(chat_doc['_id']),
+            'style': reply_meta.get('style'),
+            'provider': reply_meta.get('provider'),
+            'fast_path': bool(reply_meta.get('fast_path')),
+            'tier': reply_meta.get('tier'),
         })
     
+    except Rejected as e:
+        log.info(f"Chat request not admitted ({e.reason}) for {session.get('user_email')}")
+        return _too_busy(e)
     except Exception as e:
         log.error(f"❌ Chat error: {str(e)[:300]}")
         log.exception("Full traceback:")
@@ -119,15 +190,37 @@ def api_chat_mental():
 
 
 @chat_bp.route('/api/chat', methods=['POST'])
+@idempotent
 def api_chat_unified():
     """Unified chat endpoint for single-bot applications. Proxies to mental handler with kind support."""
     # Reuse the mental endpoint logic (it already accepts kind/context/conversation_id)
     return api_chat_mental()
 
 
+def _history_item(msg, fields=HISTORY_FIELDS):
+    item = {
+        'message': msg.get('message', ''),
+        'response': msg.get('response', ''),
+        'timestamp': msg.get('created_at').isoformat() if msg.get('created_at') else None,
+        'sentiment': msg.get('sentiment', 'neutral'),
+    }
+    return {k: v for k, v in item.items() if k in fields}
+
+
+def _history_fields():
+    requested = [f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()]
+    return tuple(f for f in requested if f in HISTORY_FIELDS) or HISTORY_FIELDS
+
+
 @chat_bp.route('/api/chat/history', methods=['GET'])
 def api_chat_history():
-    """Get chat history for current user."""
+    """Page through the user's mental chat history, newest page first.
+
+    `limit` caps the page (default 50, max 200); pass the returned
+    `next_cursor` as `before` for the next, older page. `fields` optionally
+    narrows the items to a subset of message,response,timestamp,sentiment.
+    Items within a page are oldest first so the UI can prepend them as-is.
+    """
     try:
         user_email = session.get('user_email')
         if not user_email:
@@ -135,29 +228,55 @@ def api_chat_history():
         
         db = _get_db()
         chats_coll = db[ChatModel.collection_name]
+        limit = max(1, min(HISTORY_MAX_LIMIT, request.args.get('limit', HISTORY_DEFAULT_LIMIT, type=int)))
+        fields = _history_fields()
+        projection = {_HISTORY_SOURCE[f]: 1 for f in fields}
         
-        # Fetch mental chats
-        cursor = chats_coll.find({
-            'user_email': user_email,
-            'type': 'mental',
-        }).sort('created_at', 1)
-        
-        history = [
-            {
-                'message': msg.get('message', ''),
-                'response': msg.get('response', ''),
-                'timestamp': msg.get('created_at').isoformat() if msg.get('created_at') else None,
-                'sentiment': msg.get('sentiment', 'neutral'),
-            }
-            for msg in cursor
-        ]
+        try:
+            rows, next_cursor = keyset_page(
+                chats_coll,
+                {'user_email': user_email, 'type': 'mental'},
+                limit=limit,
+                before=request.args.get('before'),
+                projection=projection,
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        rows.reverse()
         
-        return jsonify({'history': history})
+        return jsonify({
+            'history': [_history_item(msg, fields) for msg in rows],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+        })
     
     except Exception as e:
         return jsonify({'error': f'History error: {str(e)[:100]}'}), 500
 
 
+@chat_bp.route('/api/chat/export', methods=['GET'])
+def api_chat_export():
+    """Stream the user's whole mental chat history as NDJSON, oldest first."""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'error': 'Not logged in'}), 401
+    try:
+        db = get_db()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    fields = _history_fields()
+    cursor = db[ChatModel.collection_name].find(
+        {'user_email': user_email, 'type': 'mental'},
+        {_HISTORY_SOURCE[f]: 1 for f in fields},
+        batch_size=EXPORT_BATCH_SIZE,
+    ).sort([('created_at', 1), ('_id', 1)])
+    return Response(
+        stream_with_context(iter_ndjson(cursor, lambda msg: _history_item(msg, fields))),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=aura-chat-history.ndjson'},
+    )
+
+
 @chat_bp.route('/api/chat/clear', methods=['POST'])
 def api_chat_clear():
     """Clear chat history for current user."""
@@ -210,7 +329,7 @@ def upload_study_file():
         unique_filename = f"{int(time.time())}_{file.filename}"
         save_path = os.path.join(upload_dir, unique_filename)
         
-        file.save(save_path)
+        offload(file.save, save_path)
         log.info(f"✓ File uploaded: {unique_filename} by {user_email}")
         
         return jsonify({
@@ -226,6 +345,7 @@ def upload_study_file():
 
 
 @chat_bp.route('/api/study/analyze', methods=['POST'])
+@idempotent
 def api_study_analyze():
     """Analyze study query with optional file upload."""
     try:
@@ -272,43 +392,59 @@ def api_study_analyze():
             upload_dir = os.path.join('static', 'uploads')
             os.makedirs(upload_dir, exist_ok=True)
             save_path = os.path.join(upload_dir, f.filename)
-            f.save(save_path)
+            offload(f.save, save_path)
             mime = f.mimetype or ''
-            answer = analyze_study_material(prompt, save_path, mime, history=history, conversation_id=conversation_id)
+            answer = analyze_study_material(prompt, save_path, mime, history=history, conversation_id=conversation_id,
+                                            user_email=user_email)
         else:
-            # Text-only query using Gemini
-            answer = generate_mental_response(prompt, history, kind='study', conversation_id=conversation_id)
+            # Follow-up on the document cached for this conversation, else a text-only query
+            answer = answer_study_followup(prompt, history, conversation_id=conversation_id, user_email=user_email)
+            if answer is None:
+                answer = generate_mental_response(prompt, history, kind='study', conversation_id=conversation_id,
+                                                  user_email=user_email)
 
         return jsonify({'answer': answer, 'debug': debug_info})
 
+    except Rejected as e:
+        return _too_busy(e)
     except Exception as e:
         return jsonify({'error': f'Study analyze error: {str(e)[:180]}'}), 500
 
 
 @chat_bp.route('/api/chat/feedback', methods=['POST'])
 def api_chat_feedback():
-    """Capture thumbs/copy feedback; lightweight log for telemetry."""
-    try:
-        user_email = session.get('user_email')
-        if not user_email:
-            return jsonify({'error': 'Not logged in'}), 401
-
-        data = request.get_json(force=True) or {}
-        action = data.get('action', '').strip()
-        text = (data.get('text') or '').strip()
-        if not action:
-            return jsonify({'error': 'Missing action'}), 400
-
-        # Minimal log into database if available, otherwise noop
-        db = get_db()
-        if db is not None:
-            db.execute(
-                "INSERT INTO feedback (user_email, action, text) VALUES (?, ?, ?)",
-                (user_email, action, text[:500])
-            )
-            db.commit()
+    """Ingest feedback telemetry: one event object, an array, or {"events": [...]}.
+
+    Events are validated against FeedbackEventModel and buffered for a batched
+    insert; the request never waits on MongoDB. Returns 202 with the number
+    accepted and the index/reason of any rejected events.
+    """
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    data = request.get_json(force=True, silent=True)
+    events = data.get('events') if isinstance(data, dict) and 'events' in data else data
+    if isinstance(events, dict):
+        events = [events]
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'Expected an event object or a non-empty array'}), 400
+    if len(events) > FEEDBACK_MAX_BATCH:
+        return jsonify({'error': f'At most {FEEDBACK_MAX_BATCH} events per request'}), 413
+
+    now = datetime.utcnow()
+    accepted, rejected = [], []
+    for i, raw in enumerate(events):
+        try:
+            accepted.append(FeedbackEventModel.from_client(raw, user_email, now))
+        except ValueError as e:
+            rejected.append({'index': i, 'error': str(e)})
+
+    if accepted:
+        if _get_db() is None:
+            return jsonify({'error': 'Database unavailable'}), 503
+        feedback_queue = get_queue(FeedbackEventModel.collection_name)
+        for doc in accepted:
+            feedback_queue.put(doc)
+    return jsonify({'accepted': len(accepted), 'rejected': rejected}), 202
 
-        return jsonify({'ok': True})
-    except Exception as e:
-        # Do not break UX; return 200 with error info for observability
-        return jsonify({'ok': False, 'error': str(e)[:180]}), 200
@@ -1,10 +1,17 @@
-from flask import Blueprint, render_template, jsonify, session, request
+from flask import Blueprint, render_template, jsonify, session, request, Response, stream_with_context
 from utils.auth_helpers import login_required, role_required
-from utils.database import get_db
+from utils.database import get_db, get_analytics_db
+from utils import lifecycle
 from models.stress import StressModel
-from models.mood import MoodModel
 from models.grievance import GrievanceModel
+from models.proctor_note import ProctorNoteModel
+from services.alert_feed import get_feed
+from services.roster_service import fetch_roster, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.student_state import changed_since, encode_cursor, top_at_risk
+from services import feedback_stats, wellness_cube
 from datetime import datetime, timedelta
+import json
+import queue
 
 proctor_bp = Blueprint('proctor', __name__)
 
@@ -25,69 +32,149 @@ def hod_dashboard():
 @login_required
 @role_required('proctor')
 def api_students():
-    """Fetch all students with latest mood and 7-day stress trend."""
+    """Fetch assigned students with latest mood and 7-day stress trend.
+
+    Query params: sort (name|avg_stress), order (asc|desc), page, page_size.
+    With `since=<cursor>` only students whose mood or stress changed after the
+    cursor are returned (`delta: true`); every response carries a new `cursor`.
+    """
     try:
         db = get_db()
-        users = db['users']
-        stress_coll = db[StressModel.collection_name]
-        moods_coll = db[MoodModel.collection_name]
         # Privacy: Only return students assigned to the logged-in proctor
         current_proctor = session.get('user_email')
-        students = list(users.find({'role': 'student', 'proctor_email': current_proctor}))
-        result = []
-        
-        for s in students:
-            email = s.get('email')
-            name = s.get('name', 'Unknown')
-            
-            # Latest mood
-            latest_mood = moods_coll.find_one({'user_email': email}, sort=[('created_at', -1)])
-            mood = (latest_mood or {}).get('mood', 'normal')
-            
-            # Last 7 days stress
-            since = datetime.utcnow() - timedelta(days=7)
-            stress_records = list(stress_coll.find({'user_email': email, 'created_at': {'$gte': since}}).sort('created_at', 1))
-            trend = [r.get('score', 50) for r in stress_records] if stress_records else [50]
-            avg = int(sum(trend) / len(trend))
-            
-            result.append({
-                'email': email,
-                'name': name,
-                'mood': mood,
-                'avg_stress': avg,
-                'trend': trend
-            })
-        
-        return jsonify({'students': result})
+        sort = request.args.get('sort', 'name')
+        order = request.args.get('order', 'asc')
+        since = request.args.get('since')
+
+        if since:
+            try:
+                emails, cursor, truncated = changed_since(db, current_proctor, since, MAX_PAGE_SIZE)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            if truncated:
+                # Too much activity to ship as a delta; tell the client to reload
+                return jsonify({'students': [], 'cursor': cursor, 'delta': True, 'full_refresh': True})
+            students = []
+            if emails:
+                students = fetch_roster(db, current_proctor, sort=sort, order=order,
+                                        page_size=MAX_PAGE_SIZE, emails=emails)['students']
+            return jsonify({'students': students, 'cursor': cursor, 'delta': True})
+
+        # Full listings are heavy aggregations and may be served by a secondary;
+        # the cursor overlap absorbs a few seconds of replication lag.
+        cursor = encode_cursor(datetime.utcnow())
+        result = fetch_roster(
+            get_analytics_db(),
+            current_proctor,
+            sort=sort,
+            order=order,
+            page=request.args.get('page', 1, type=int),
+            page_size=request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int),
+        )
+        result['cursor'] = cursor
+        result['delta'] = False
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@proctor_bp.route('/api/proctor/at-risk', methods=['GET'])
+@login_required
+@role_required('proctor')
+def api_at_risk():
+    """Top-k assigned students by maintained risk score (latest, 7-day avg, trend)."""
+    try:
+        db = get_analytics_db()
+        k = max(1, min(100, request.args.get('k', 20, type=int)))
+        rows = top_at_risk(db, session.get('user_email'), k)
+        names = {u['email']: u.get('name', 'Unknown') for u in db['users'].find(
+            {'email': {'$in': [r['user_email'] for r in rows]}}, {'email': 1, 'name': 1})}
+        students = [{
+            'email': r['user_email'],
+            'name': names.get(r['user_email'], 'Unknown'),
+            'risk': r.get('risk'),
+            'latest_score': r.get('latest_score'),
+            'avg_stress': r.get('avg_7d'),
+            'trend': r.get('trend'),
+            'updated_at': r['risk_updated_at'].isoformat() if r.get('risk_updated_at') else None,
+        } for r in rows]
+        return jsonify({'students': students, 'k': k})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-        
+
+
+@proctor_bp.route('/api/proctor/feed', methods=['GET'])
+@login_required
+@role_required('proctor')
+def api_feed():
+    """Server-sent events for alerts, high stress and grievances of assigned students."""
+    feed = get_feed()
+    if not feed.start():
+        return jsonify({'error': 'Live feed unavailable (MongoDB replica set required)'}), 503
+
+    proctor_email = session.get('user_email')
+    q = feed.subscribe(proctor_email)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            idle = 0
+            # Ends when the worker drains; the browser reconnects to a live one
+            while not lifecycle.draining():
+                try:
+                    event = q.get(timeout=1)
+                except queue.Empty:
+                    idle += 1
+                    if idle >= 15:
+                        # Comment line keeps proxies from closing an idle connection
+                        yield ': keep-alive\n\n'
+                        idle = 0
+                    continue
+                idle = 0
+                yield f"event: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            feed.unsubscribe(proctor_email, q)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @proctor_bp.route('/api/hod/wellness', methods=['GET'])
 @login_required
 @role_required('hod')
 def api_hod_wellness():
-    """Department-wide stress trend aggregation for last 30 days."""
+    """Department-wide stress trend for the last 30 days, served from the wellness cube.
+
+    Optional `department` or `proctor` params drill down one level; the
+    `breakdown` list holds the next level's totals for the window.
+    """
     try:
-        db = get_db()
-        stress_coll = db[StressModel.collection_name]
-        since = datetime.utcnow() - timedelta(days=30)
-        
-        # Aggregate stress by date
-        pipeline = [
-            {'$match': {'created_at': {'$gte': since}}},
-            {'$group': {
-                '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
-                'avg_score': {'$avg': '$score'}
-            }},
-            {'$sort': {'_id': 1}}
-        ]
-        result = list(stress_coll.aggregate(pipeline))
-        
-        dates = [r['_id'] for r in result]
-        scores = [int(r['avg_score']) for r in result]
-        
-        return jsonify({'dates': dates, 'scores': scores})
-        
+        db = get_analytics_db()
+        days = max(1, min(365, request.args.get('days', 30, type=int)))
+        result = wellness_cube.query(
+            db,
+            days=days,
+            department=request.args.get('department') or None,
+            proctor=request.args.get('proctor') or None,
+        )
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@proctor_bp.route('/api/hod/feedback', methods=['GET'])
+@login_required
+@role_required('hod')
+def api_hod_feedback():
+    """Thumbs up/down rate of chat replies per style and provider (from feedback_daily)."""
+    try:
+        db = get_analytics_db()
+        days = max(1, min(365, request.args.get('days', 30, type=int)))
+        return jsonify(feedback_stats.query(db, days=days))
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -200,7 +287,7 @@ def api_student_detail(email):
         } for g in grievances]
 
         # Fetch proctor notes (optional)
-        notes = list(db['proctor_notes'].find({'user_email': email}).sort('created_at', -1))
+        notes = list(db[ProctorNoteModel.collection_name].find({'user_email': email}).sort('created_at', -1))
         notes_fmt = []
         for n in notes:
             proctor_doc = users.find_one({'email': n.get('proctor_email')}, {'name': 1}) or {}
@@ -249,7 +336,7 @@ def api_add_proctor_note(email):
         current_proctor = session.get('user_email')
         if profile.get('proctor_email') != current_proctor:
             return jsonify({'error': 'Forbidden'}), 403
-        db['proctor_notes'].insert_one({
+        db[ProctorNoteModel.collection_name].insert_one({
             'user_email': email,
             'note': note,
             'urgent': urgent,
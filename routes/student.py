@@ -4,6 +4,9 @@ from utils.database import get_db
 from models.mood import MoodModel
 from models.stress import StressModel
 from models.grievance import GrievanceModel
+from services.stress_service import quick_action_message, record_stress, relieved_score
+from services.offline_sync import apply_batch
+from config import Config
 from datetime import datetime, timedelta
 
 # Create the Blueprint
@@ -279,16 +282,7 @@ def quick_actions():
     try:
         data = request.get_json() or {}
         action = (data.get('action') or '').lower()
-        messages = {
-            'breathing': 'Great! Try a 1-minute box breathing now. In 4, hold 4, out 4.',
-            'mood_check': 'Mood check logged. Remember to be kind to yourself!',
-            'stretch': 'Stand up, roll your shoulders, and stretch for 30 seconds.',
-            'energy_boost': 'Time for an energy boost! Do 10 jumping jacks or walk around.',
-            'morning_motivation': 'Start your day with intention and positivity!',
-            'sleep_hygiene': 'Wind down: no screens 30 min before bed, keep it cool and dark.',
-            'wind_down': 'Time to relax. Deep breathing and gentle stretches help.',
-        }
-        msg = messages.get(action, 'Action noted. Keep going!')
+        msg = quick_action_message(action)
 
         # Log action and reduce stress score
         user_email = session.get('user_email')
@@ -301,28 +295,33 @@ def quick_actions():
         # Get current stress and reduce it based on action effectiveness
         current_stress = list(coll.find({'user_email': user_email}).sort('created_at', -1).limit(1))
         base_stress = current_stress[0]['score'] if current_stress else 50
+        new_stress = relieved_score(base_stress, action)
         
-        # Different actions reduce stress by different amounts
-        stress_reduction = {
-            'breathing': 8,
-            'mood_check': 3,
-            'stretch': 5,
-            'energy_boost': 7,
-            'morning_motivation': 4,
-            'sleep_hygiene': 6,
-            'wind_down': 10,
-        }
-        
-        reduction = stress_reduction.get(action, 3)
-        new_stress = max(0, base_stress - reduction)
-        
-        coll.insert_one({
-            'user_email': user_email,
-            'score': new_stress,
-            'source': f'quick_action:{action}',
-            'created_at': datetime.utcnow(),
-        })
+        record_stress(db, user_email, new_stress, f'quick_action:{action}')
 
         return jsonify({'message': msg, 'stress_score': new_stress})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@student_bp.route('/api/sync', methods=['POST'])
+@login_required
+def sync_events():
+    """Apply offline-queued quick actions and mood check-ins in one request.
+
+    Body: {"events": [...]}, see services.offline_sync for the event format.
+    Every event gets a result (applied, duplicate or rejected); all three are
+    final, so the client can drop them from its queue.
+    """
+    try:
+        user_email = session.get('user_email')
+        data = request.get_json(silent=True) or {}
+        events = data.get('events') if isinstance(data, dict) else None
+        if not isinstance(events, list):
+            return jsonify({'error': 'Expected {"events": [...]}'}), 400
+        if len(events) > Config.SYNC_MAX_EVENTS:
+            return jsonify({'error': f'At most {Config.SYNC_MAX_EVENTS} events per request'}), 413
+
+        return jsonify(apply_batch(get_db(), user_email, events))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
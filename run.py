@@ -1,4 +1,9 @@
+"""Development server. For production use: python aura.py serve"""
+import os
 from app import app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    debug = os.getenv('FLASK_DEBUG', '').strip().lower() in ('1', 'true', 'yes', 'on')
+    if not debug:
+        print("run.py is the development server; for production use: python aura.py serve")
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=debug)
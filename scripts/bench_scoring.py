@@ -0,0 +1,42 @@
+"""Compare scalar vs batch throughput of the stress scoring engine.
+
+Usage: python scripts/bench_scoring.py [N]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.scoring import (  # noqa: E402
+    MOOD_CODES, SENTIMENT_CODES, encode_moods, encode_sentiments, np, score_batch, score_one,
+)
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+random.seed(42)
+moods = [random.choice(MOOD_CODES + ('unknown',)) for _ in range(n)]
+sentiments = [[random.choice(SENTIMENT_CODES) for _ in range(random.randint(0, 5))] for _ in range(n)]
+activity = [random.randint(0, 10) for _ in range(n)]
+
+t0 = time.perf_counter()
+scalar = [score_one(m, s, a, weights='activity') for m, s, a in zip(moods, sentiments, activity)]
+scalar_s = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+mood_codes = encode_moods(moods)
+sent_codes = encode_sentiments(sentiments, width=5)
+encode_s = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+batch = score_batch(mood_codes, sent_codes, activity, weights='activity')
+batch_s = time.perf_counter() - t0
+
+assert [int(x) for x in batch] == scalar, 'scalar and batch results differ'
+
+print(f"backend:        {'numpy ' + np.__version__ if np is not None else 'pure python'}")
+print(f"students:       {n}")
+print(f"scalar:         {scalar_s:.3f}s  ({n / scalar_s:,.0f} scores/s)")
+print(f"batch encode:   {encode_s:.3f}s")
+print(f"batch score:    {batch_s:.4f}s  ({n / batch_s:,.0f} scores/s)")
+print(f"speedup:        {scalar_s / (encode_s + batch_s):.1f}x end-to-end, {scalar_s / batch_s:.1f}x scoring only")
@@ -0,0 +1,100 @@
+"""Replay stored chats through the semantic cache: hit rate and lookup cost.
+
+Mental chats are replayed oldest first, keeping only the first turns the
+cache sees in production: the first message of each conversation_id, and
+for chats without one, the student's first message ever. Messages the
+cache never sees in production are skipped: crisis language, local fast
+path greetings, and messages that are not cacheable. Each remaining
+message is looked up; a miss stores its recorded reply.
+
+Usage: python scripts/bench_semantic_cache.py [--limit N] [--thresholds 0.7,0.8,0.9] [--show 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from models.chat import ChatModel  # noqa: E402
+from services import local_responder, semantic_cache  # noqa: E402
+from services.ai_service import _classify_request  # noqa: E402
+from utils.database import get_db  # noqa: E402
+
+
+def load_corpus(limit: int):
+    seen, students = set(), set()
+    corpus = []
+    cursor = get_db()[ChatModel.collection_name].find(
+        {'type': 'mental'}, {'message': 1, 'response': 1, 'style': 1, 'conversation_id': 1, 'user_email': 1},
+    ).sort('created_at', 1).limit(limit)
+    for doc in cursor:
+        # Same rule as routes/chat.py: the first message of a conversation; without a
+        # conversation_id, only a student's first message ever (empty history)
+        student, conversation = doc.get('user_email'), doc.get('conversation_id')
+        first = (student, conversation) not in seen if conversation else student not in students
+        seen.add((student, conversation))
+        students.add(student)
+        if first:
+            corpus.append(doc)
+    return corpus
+
+
+def replay(corpus, threshold: float, max_entries: int, show: int) -> None:
+    cache = semantic_cache.SemanticCache(max_entries, threshold, ttl_seconds=float('inf'))
+    lookup_ns, store_ns, samples = [], [], []
+    eligible = 0
+    for doc in corpus:
+        message, reply = doc.get('message') or '', doc.get('response') or ''
+        if (not reply or local_responder.is_crisis(message) or local_responder.classify(message)
+                or not semantic_cache.cacheable(message)):
+            continue
+        eligible += 1
+        style = doc.get('style') or _classify_request(message, [], 'mental')
+        t0 = time.perf_counter_ns()
+        hit = cache.lookup(message, style)
+        lookup_ns.append(time.perf_counter_ns() - t0)
+        if hit is None:
+            t0 = time.perf_counter_ns()
+            cache.store(message, style, reply)
+            store_ns.append(time.perf_counter_ns() - t0)
+        elif len(samples) < show:
+            samples.append((hit[1], message, hit[2]))
+
+    stats = cache.stats()
+    lookup_ns.sort()
+    print(f"threshold {threshold:.2f}: eligible {eligible}, hits {stats['hits']} "
+          f"({stats['hits'] / eligible:.1%}), entries {stats['entries']}, evicted {stats['evicted']}" if eligible
+          else f"threshold {threshold:.2f}: no eligible messages")
+    if lookup_ns:
+        print(f"  lookup  mean {sum(lookup_ns) / len(lookup_ns) / 1000:.1f} us, "
+              f"p50 {lookup_ns[len(lookup_ns) // 2] / 1000:.1f} us, "
+              f"p95 {lookup_ns[int(len(lookup_ns) * 0.95)] / 1000:.1f} us")
+    if store_ns:
+        print(f"  store   mean {sum(store_ns) / len(store_ns) / 1000:.1f} us")
+    for similarity, message, matched in samples:
+        print(f"  {similarity:.2f}  {message[:60]!r}  ~  {matched[:60]!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the semantic reply cache on stored chats.')
+    parser.add_argument('--limit', type=int, default=20000, help='chats to load (oldest first)')
+    parser.add_argument('--thresholds', default=str(Config.SEMANTIC_CACHE_THRESHOLD),
+                        help='comma separated similarity thresholds to compare')
+    parser.add_argument('--max-entries', type=int, default=Config.SEMANTIC_CACHE_MAX_ENTRIES)
+    parser.add_argument('--show', type=int, default=0, help='print this many hits for review')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.limit)
+    if not corpus:
+        sys.exit('No mental chats in the database to replay.')
+    print(f"backend:  {'numpy ' + semantic_cache.np.__version__ if semantic_cache.np is not None else 'pure python'}, "
+          f"dim {semantic_cache.DIM}")
+    print(f"corpus:   {len(corpus)} first-turn messages")
+    for threshold in (float(t) for t in args.thresholds.split(',')):
+        replay(corpus, threshold, args.max_entries, args.show)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Load-test the production server configurations against a simulated LLM call.
+
+Each configuration is started with `python aura.py serve` (so gunicorn.conf.py
+and the real app factory are used) plus one extra route, /_bench/llm, that
+does BENCH_CPU_MS of CPU work and then waits BENCH_LLM_MS the way a chat
+request waits on its provider. Concurrent keep-alive clients drive it and
+throughput and latency percentiles are reported. With --drain, a batch of
+requests is left in flight, the master gets SIGTERM, and the number that
+still completed with 200 is reported.
+
+Usage: python scripts/bench_server.py [--configs gthread:8,gthread:32,gevent]
+           [--workers 2] [--concurrency 50,200] [--requests 1000]
+           [--llm-ms 1000] [--cpu-ms 2] [--drain]
+Needs gunicorn (and gevent for gevent configs); httpx is used as the client.
+"""
+import argparse
+import asyncio
+from collections import Counter
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _bench_app():
+    from app import create_app
+
+    app = create_app()
+    llm_s = float(os.getenv('BENCH_LLM_MS', '1000')) / 1000
+    cpu_s = float(os.getenv('BENCH_CPU_MS', '2')) / 1000
+
+    @app.route('/_bench/llm')
+    def bench_llm():
+        end = time.perf_counter() + cpu_s
+        while time.perf_counter() < end:
+            pass
+        time.sleep(llm_s)
+        return {'response': 'ok'}
+
+    return app
+
+
+# Imported by gunicorn as scripts.bench_server:app
+app = _bench_app() if os.getenv('AURA_BENCH_SERVER') else None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(config: str, workers: int, args) -> (subprocess.Popen, str):
+    worker_class, _, threads = config.partition(':')
+    port = _free_port()
+    env = dict(os.environ, AURA_BENCH_SERVER='1', BENCH_LLM_MS=str(args.llm_ms), BENCH_CPU_MS=str(args.cpu_ms),
+               AURA_ACCESS_LOG='/dev/null', AURA_LOG_LEVEL='warning')
+    argv = [sys.executable, os.path.join(ROOT, 'aura.py'), 'serve', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--worker-class', worker_class, '--app', 'scripts.bench_server:app']
+    if threads:
+        argv += ['--threads', threads]
+    proc = subprocess.Popen(argv, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    import httpx
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'{base}/health', timeout=2).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError(f'{config} did not start')
+
+
+async def load(base: str, concurrency: int, total: int):
+    import httpx
+    latencies, errors = [], Counter()
+    remaining = total
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get('/_bench/llm')
+                    if r.status_code != 200:
+                        errors[f'HTTP {r.status_code}'] += 1
+                        continue
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return elapsed, latencies, errors
+
+
+def pct(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float('nan')
+
+
+async def drain(proc: subprocess.Popen, base: str, in_flight: int):
+    import httpx
+    async with httpx.AsyncClient(base_url=base, timeout=120,
+                                 limits=httpx.Limits(max_connections=in_flight)) as client:
+        tasks = [asyncio.ensure_future(client.get('/_bench/llm')) for _ in range(in_flight)]
+        await asyncio.sleep(0.3)  # let them reach the workers
+        proc.send_signal(signal.SIGTERM)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    return sum(1 for r in results if not isinstance(r, Exception) and r.status_code == 200)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark gunicorn worker configurations for AURA.')
+    parser.add_argument('--configs', default='gthread:8,gthread:32,gevent',
+                        help='comma separated worker_class[:threads]')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', default='50,200', help='comma separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per concurrency level')
+    parser.add_argument('--llm-ms', type=int, default=1000, help='simulated provider wait per request')
+    parser.add_argument('--cpu-ms', type=float, default=2, help='CPU work per request')
+    parser.add_argument('--drain', action='store_true', help='also check graceful drain on SIGTERM')
+    args = parser.parse_args()
+
+    print(f"cpus {os.cpu_count()}, workers {args.workers}, llm wait {args.llm_ms} ms, cpu {args.cpu_ms} ms/request")
+    print(f"{'config':<14}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for config in args.configs.split(','):
+        proc, base = start(config, args.workers, args)
+        try:
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                elapsed, latencies, errors = asyncio.run(load(base, concurrency, args.requests))
+                print(f"{config:<14}{concurrency:>8}{len(latencies) / elapsed:>9.1f}{pct(latencies, 0.5):>9.0f}"
+                      f"{pct(latencies, 0.95):>9.0f}{pct(latencies, 0.99):>9.0f}{sum(errors.values()):>8}"
+                      + (f"  {dict(errors)}" if errors else ''))
+            if args.drain:
+                in_flight = int(args.concurrency.split(',')[0])
+                completed = asyncio.run(drain(proc, base, in_flight))
+                print(f"{config:<14} drain: {completed}/{in_flight} in-flight requests completed after SIGTERM")
+        finally:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=90)
+
+
+if __name__ == '__main__':
+    main()
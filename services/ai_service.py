@@ -1,7 +1,11 @@
 import os
+import time
 import logging
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+from utils.admission import Rejected, check_user, limit_provider
+from utils.cooperative import offload
+from services import context_cache, local_responder, model_router, semantic_cache
 
 # Use google.genai (new recommended SDK). Fallback to Groq/OpenAI if Gemini quota exhausted.
 try:
@@ -32,6 +36,39 @@ STRUCTURED_RESPONSES = os.getenv('AURA_STRUCTURED_RESPONSES', 'true').strip().lo
 REQUIRE_AI = os.getenv('AURA_REQUIRE_AI', 'false').strip().lower() == 'true'
 RESPOND_DYNAMically = os.getenv('AURA_DYNAMIC_LENGTH', 'true').strip().lower() == 'true'
 
+# Added to every prompt when the student's message contains crisis language
+CRISIS_GUIDANCE = (
+    "The student may be in crisis. Respond with warmth and without judgment, take what they said seriously, "
+    "encourage them to contact local emergency services or a crisis helpline now if they might act on it, "
+    "and to reach out to a trusted person. Ask whether they are safe right now."
+)
+
+
+def _gemini_config(tier: Dict[str, Any], **extra):
+    """GenerateContentConfig with the tier's output budget (plus any `extra` fields)."""
+    if tier.get('thinking_budget') is not None:
+        extra['thinking_config'] = types.ThinkingConfig(thinking_budget=tier['thinking_budget'])
+    return types.GenerateContentConfig(
+        temperature=tier['temperature'],
+        top_p=0.95,
+        top_k=32,
+        max_output_tokens=tier['max_tokens'],
+        **extra,
+    )
+
+
+def _gemini_usage(response) -> Dict[str, Optional[int]]:
+    usage = getattr(response, 'usage_metadata', None)
+    return {'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'output_tokens': getattr(usage, 'candidates_token_count', None),
+            'cached_tokens': getattr(usage, 'cached_content_token_count', None)}
+
+
+def _chat_usage(resp) -> Dict[str, Optional[int]]:
+    usage = getattr(resp, 'usage', None)
+    return {'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'output_tokens': getattr(usage, 'completion_tokens', None)}
+
 # Initialize Gemini client
 client = None
 if GEMINI_API_KEY and Client:
@@ -218,17 +255,83 @@ def _classify_request(user_message: str, chat_history: Optional[List[Dict[str, s
         return 'concise'
 
 
-def generate_mental_response(user_message: str, chat_history: List[Dict[str, str]] = None, kind: str = 'mental', conversation_id: str = '') -> str:
+def generate_mental_response(user_message: str, chat_history: List[Dict[str, str]] = None, kind: str = 'mental', conversation_id: str = '',
+                             meta: Optional[Dict[str, Any]] = None, user_email: str = '',
+                             first_turn: Optional[bool] = None) -> str:
     """Generate a structured, compassionate response using Gemini AI via google.genai SDK.
 
     Returns Markdown with sections: Thought, Main Response, Quick Actions, Next Step.
+    If `meta` is a dict it is filled with the chosen `style`, the `provider`
+    that produced the reply (gemini|groq|openai|local|semantic_cache),
+    `fast_path` when a trivial message was answered locally, `crisis` when
+    the message contains crisis language (the caller raises the alert), the
+    model_router `tier` and `model` used, and `cache_similarity` for a
+    reply reused from services.semantic_cache.
+
+    `user_email` is charged one admission token (utils.admission) only when
+    the reply needs a provider call; raises Rejected when the bucket is empty.
+    Crisis messages are exempt, and answered with the local crisis reply
+    when no provider slot is free.
+
+    `first_turn` says whether this is the first message of its conversation
+    (semantic cache eligibility); when None, an empty `chat_history` means it is.
     """
-    
+    if meta is None:
+        meta = {}
     style = _classify_request(user_message, chat_history, kind)
-
+    crisis = local_responder.is_crisis(user_message)
+    if crisis and style == 'ultra_brief':
+        style = 'concise'
+    meta['style'] = style
+    meta['crisis'] = crisis
+
+    if not crisis:
+        local = local_responder.respond(user_message, chat_history, kind)
+        if local is not None:
+            local_responder.record('local')
+            meta['provider'] = 'local'
+            meta['fast_path'] = True
+            return local
+
+    # First-turn paraphrases of earlier messages reuse the earlier reply
+    cache = semantic_cache.get_cache()
+    if first_turn is None:
+        first_turn = not chat_history
+    use_cache = (cache is not None and not crisis and kind == 'mental' and first_turn
+                 and semantic_cache.cacheable(user_message))
+    if use_cache:
+        hit = cache.lookup(user_message, style)
+        if hit is not None:
+            meta['provider'] = 'semantic_cache'
+            meta['cache_similarity'] = round(hit[1], 3)
+            return hit[0]
+
+    if user_email and not crisis:  # crisis messages are never rate limited
+        check_user(user_email)
+    local_responder.record('crisis' if crisis else 'model')
+    tier = model_router.route(kind, style)
+    meta['tier'] = tier['name']
+    try:
+        text = _generate_with_model(user_message, chat_history, kind, conversation_id, style, crisis, meta, tier)
+    except Rejected:
+        if not crisis:
+            raise
+        # No provider slot: a crisis message still gets the safe reply, never a 429
+        logger.warning("Crisis message not admitted to a provider; answering with the crisis reply")
+        meta['provider'] = 'local'
+        return local_responder.CRISIS_REPLY
+    if use_cache and meta.get('provider') in ('gemini', 'groq', 'openai'):
+        cache.store(user_message, style, text)
+    return text
+
+
+@limit_provider
+def _generate_with_model(user_message: str, chat_history: List[Dict[str, str]], kind: str, conversation_id: str,
+                         style: str, crisis: bool, meta: Optional[Dict[str, Any]], tier: Dict[str, Any]) -> str:
+    """Provider chain for generate_mental_response: Gemini, then the fallbacks."""
     if not client:
         logger.warning("Gemini client not available - trying fallback providers")
-        return _generate_with_fallback(user_message, chat_history, style)
+        return _generate_with_fallback(user_message, chat_history, style, meta, crisis=crisis, tier=tier)
 
     try:
         history_block = _format_history(chat_history or [])
@@ -287,47 +390,70 @@ def generate_mental_response(user_message: str, chat_history: List[Dict[str, str
     Style: warm, supportive, professional. 150–200 words total. Use simple language.
     """
 
-        response = client.models.generate_content(
-            model='models/gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
-                top_p=0.95,
-                top_k=32,
-                max_output_tokens=1024,
+        if crisis:
+            prompt += f"\n    {CRISIS_GUIDANCE}\n"
+
+        started = time.perf_counter()
+        try:
+            response = client.models.generate_content(
+                model=tier['gemini'],
+                contents=prompt,
+                config=_gemini_config(tier),
             )
-        )
-        
-        if response and hasattr(response, 'text') and response.text:
-            text = response.text.strip()
-            logger.info(f"✓ Generated response ({len(text)} chars)")
+        except Exception:
+            model_router.record(tier, 'gemini', (time.perf_counter() - started) * 1000, ok=False)
+            raise
+        text = (response.text or '').strip() if response and hasattr(response, 'text') else ''
+        model_router.record(tier, 'gemini', (time.perf_counter() - started) * 1000, **_gemini_usage(response),
+                            ok=bool(text))
+
+        if text:
+            logger.info(f"✓ Generated response ({len(text)} chars, {tier['name']} tier)")
+            if meta is not None:
+                meta['provider'] = 'gemini'
+                meta['model'] = tier['gemini']
             return text
         else:
             logger.warning("Empty response from Gemini")
-            return _generate_with_fallback(user_message, chat_history, style)
+            return _generate_with_fallback(user_message, chat_history, style, meta, crisis=crisis, tier=tier)
             
     except Exception as e:
         logger.error(f"Gemini API error: {str(e)[:300]}")
         logger.exception("Full traceback:")
-        return _generate_with_fallback(user_message, chat_history, style)
+        return _generate_with_fallback(user_message, chat_history, style, meta, crisis=crisis, tier=tier)
 
 
-def _generate_with_fallback(user_message: str, chat_history: List[Dict[str, str]] = None, style: str = 'concise') -> str:
+def _generate_with_fallback(user_message: str, chat_history: List[Dict[str, str]] = None, style: str = 'concise',
+                            meta: Optional[Dict[str, Any]] = None, crisis: bool = False,
+                            tier: Optional[Dict[str, Any]] = None) -> str:
     """Try Groq first (free), then OpenAI, then local fallback."""
+    if meta is None:
+        meta = {}
+    if tier is None:
+        tier = model_router.route('mental', style)
     
     # Try Groq first (free and fast)
     if groq_client:
         try:
-            messages = _build_chat_messages(user_message, chat_history, style)
-            resp = groq_client.chat.completions.create(
-                model='llama-3.3-70b-versatile',
-                messages=messages,
-                temperature=0.7,
-                max_tokens=600,
-            )
+            messages = _build_chat_messages(user_message, chat_history, style, crisis=crisis)
+            started = time.perf_counter()
+            try:
+                resp = groq_client.chat.completions.create(
+                    model=tier['groq'],
+                    messages=messages,
+                    temperature=tier['temperature'],
+                    max_tokens=tier['max_tokens'],
+                )
+            except Exception:
+                model_router.record(tier, 'groq', (time.perf_counter() - started) * 1000, ok=False)
+                raise
             text = (resp.choices[0].message.content or '').strip()
+            model_router.record(tier, 'groq', (time.perf_counter() - started) * 1000, **_chat_usage(resp),
+                                ok=bool(text))
             if text:
-                logger.info(f"✓ Groq (Llama) response ({len(text)} chars)")
+                logger.info(f"✓ Groq (Llama) response ({len(text)} chars, {tier['name']} tier)")
+                meta['provider'] = 'groq'
+                meta['model'] = tier['groq']
                 return text
         except Exception as ge:
             logger.warning(f"Groq error: {str(ge)[:150]}")
@@ -335,27 +461,40 @@ def _generate_with_fallback(user_message: str, chat_history: List[Dict[str, str]
     # Fallback to OpenAI
     if openai_client:
         try:
-            messages = _build_chat_messages(user_message, chat_history, style)
-            resp = openai_client.chat.completions.create(
-                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
-                messages=messages,
-                temperature=0.7,
-                max_tokens=600,
-            )
+            messages = _build_chat_messages(user_message, chat_history, style, crisis=crisis)
+            started = time.perf_counter()
+            try:
+                resp = openai_client.chat.completions.create(
+                    model=tier['openai'],
+                    messages=messages,
+                    temperature=tier['temperature'],
+                    max_tokens=tier['max_tokens'],
+                )
+            except Exception:
+                model_router.record(tier, 'openai', (time.perf_counter() - started) * 1000, ok=False)
+                raise
             text = (resp.choices[0].message.content or '').strip()
+            model_router.record(tier, 'openai', (time.perf_counter() - started) * 1000, **_chat_usage(resp),
+                                ok=bool(text))
             if text:
-                logger.info(f"✓ OpenAI fallback response ({len(text)} chars)")
+                logger.info(f"✓ OpenAI fallback response ({len(text)} chars, {tier['name']} tier)")
+                meta['provider'] = 'openai'
+                meta['model'] = tier['openai']
                 return text
         except Exception as oe:
             logger.error(f"OpenAI error: {str(oe)[:300]}")
     
     # Final fallback
+    meta['provider'] = 'local'
+    if crisis:
+        return local_responder.CRISIS_REPLY
     if REQUIRE_AI:
         return "AI is temporarily unavailable. Please try again shortly."
     return _local_fallback(user_message, style)
 
 
-def _build_chat_messages(user_message: str, chat_history: List[Dict[str, str]] = None, style: str = 'concise') -> List[Dict[str, str]]:
+def _build_chat_messages(user_message: str, chat_history: List[Dict[str, str]] = None, style: str = 'concise',
+                         crisis: bool = False) -> List[Dict[str, str]]:
     """Build messages array for OpenAI/Groq APIs."""
     if style == 'ultra_brief':
         system = (
@@ -374,6 +513,8 @@ def _build_chat_messages(user_message: str, chat_history: List[Dict[str, str]] =
             "3) a gentle follow-up question, 4) encouragement. Be warm, supportive, and practical. Aim for ~180 words."
         )
 
+    if crisis:
+        system += ' ' + CRISIS_GUIDANCE
     messages = [{ 'role': 'system', 'content': system }]
     for turn in (chat_history or [])[-8:]:
         role = 'user' if turn.get('role') == 'user' else 'assistant'
@@ -401,23 +542,9 @@ def extract_sentiment(text: str) -> str:
         return 'neutral'
 
 
-def analyze_study_material(prompt: str, file_path: str, mime_type: str = '', history: List[Dict[str, str]] = None, conversation_id: str = '') -> str:
-    """Analyze study materials with Gemini (images, PDFs, or text) and return structured Markdown.
-
-    Uses AURA Advanced Study Assistant system prompt for professional-grade analysis.
-    """
-    if not client:
-        return "AI study assistant not configured. Please set GEMINI_API_KEY or GROQ_API_KEY."
-
-    try:
-        p = Path(file_path)
-        mime = mime_type or _guess_mime(p.suffix)
-
-        history_block = _format_history(history or [])
-        user_prompt = prompt or "Please analyze this material and explain it clearly."
-
-        # AURA Advanced Study Assistant System Prompt
-        system_prompt = """You are the AURA Advanced Study Assistant. Your goal is to maximize student productivity through deep analysis and interactive learning.
+# AURA Advanced Study Assistant system prompt. Kept byte-identical across
+# requests: it is the cached (or implicitly cached) prefix of every study call.
+STUDY_SYSTEM_PROMPT = """You are the AURA Advanced Study Assistant. Your goal is to maximize student productivity through deep analysis and interactive learning.
 
 **PDF/Image Analysis:** When a file is provided, extract key concepts, definitions, and formulas. Provide a structured summary with bullet points organized by topic.
 
@@ -434,52 +561,144 @@ def analyze_study_material(prompt: str, file_path: str, mime_type: str = '', his
 - Bold important terms on first mention
 - End with actionable next steps or practice suggestions"""
 
-        if STRUCTURED_RESPONSES:
-            instruction = (
-                f"{system_prompt}\n\n"
-                f"Conversation ID: {conversation_id or 'local'}\n"
-                f"Recent conversation context:\n{history_block}\n\n"
-                f"Student request: {user_prompt}\n\n"
-                "Respond with clear, well-organized Markdown that maximizes learning value."
-            )
-        else:
-            instruction = (
-                f"{system_prompt}\n\n"
-                f"Conversation ID: {conversation_id or 'local'}\n"
-                f"Recent context:\n{history_block}\n\n"
-                f"Request: {user_prompt}\n\n"
-                "Provide a concise, well-structured response in Markdown."
-            )
 
-        if mime.startswith('image/'):
-            with open(file_path, 'rb') as f:
-                image_bytes = f.read()
-            contents = [
-                types.Part(text=instruction),
-                types.Part.from_bytes(data=image_bytes, mime_type=mime),
-            ]
-        elif mime == 'application/pdf' or p.suffix.lower() == '.pdf':
-            contents = [
-                types.Part(text=instruction),
-                types.Part.from_bytes(data=open(file_path, 'rb').read(), mime_type=mime),
-            ]
-        else:
-            contents = [types.Part(text=instruction)]
+def _study_instruction(user_prompt: str, history: List[Dict[str, str]], conversation_id: str) -> str:
+    """The per-request part of a study call (everything after the cached prefix)."""
+    history_block = _format_history(history or [])
+    if STRUCTURED_RESPONSES:
+        return (
+            f"Conversation ID: {conversation_id or 'local'}\n"
+            f"Recent conversation context:\n{history_block}\n\n"
+            f"Student request: {user_prompt}\n\n"
+            "Respond with clear, well-organized Markdown that maximizes learning value."
+        )
+    return (
+        f"Conversation ID: {conversation_id or 'local'}\n"
+        f"Recent context:\n{history_block}\n\n"
+        f"Request: {user_prompt}\n\n"
+        "Provide a concise, well-structured response in Markdown."
+    )
 
+
+def _study_generate(tier: Dict[str, Any], contents: list, **config) -> str:
+    started = time.perf_counter()
+    try:
         response = client.models.generate_content(
-            model='models/gemini-2.5-flash',
-            contents=contents
+            model=tier['gemini'],
+            contents=contents,
+            config=_gemini_config(tier, **config),
         )
+    except Exception:
+        model_router.record(tier, 'gemini', (time.perf_counter() - started) * 1000, ok=False)
+        raise
+    text = (response.text or '').strip() if response and hasattr(response, 'text') else ''
+    model_router.record(tier, 'gemini', (time.perf_counter() - started) * 1000, **_gemini_usage(response),
+                        ok=bool(text))
+    return text
+
 
-        if response and hasattr(response, 'text') and response.text:
-            return response.text.strip()
+@limit_provider
+def _study_call(tier: Dict[str, Any], instruction: str, cached_parts: list, inline_parts: Optional[list],
+                backend=None, cache_key: str = '', cache_name: Optional[str] = None) -> str:
+    """One study call, through the cached context when there is one.
+
+    `cached_parts` go with the cache, `inline_parts` (None if the context
+    only exists in the cache) replace it if the provider lost the cache.
+    """
+    if cache_name:
+        try:
+            return _study_generate(tier, cached_parts + [types.Part(text=instruction)], cached_content=cache_name)
+        except Exception as exc:
+            logger.warning(f"Cached study context {cache_name} failed, sending inline: {str(exc)[:150]}")
+            context_cache.record_error()
+            context_cache.invalidate(backend, cache_key)
+            if inline_parts is None:
+                return ''
+    return _study_generate(tier, (inline_parts or []) + [types.Part(text=instruction)],
+                           system_instruction=STUDY_SYSTEM_PROMPT)
+
+
+def analyze_study_material(prompt: str, file_path: str, mime_type: str = '', history: List[Dict[str, str]] = None,
+                           conversation_id: str = '', user_email: str = '') -> str:
+    """Analyze study materials with Gemini (images, PDFs, or text) and return structured Markdown.
+
+    Uses AURA Advanced Study Assistant system prompt for professional-grade analysis.
+    The prompt, and the document when the request belongs to a conversation,
+    are sent as a provider-side cached context (services.context_cache), so
+    follow-ups can use the document via answer_study_followup.
+    """
+    if not client:
+        return "AI study assistant not configured. Please set GEMINI_API_KEY or GROQ_API_KEY."
+
+    try:
+        p = Path(file_path)
+        mime = mime_type or _guess_mime(p.suffix)
+        user_prompt = prompt or "Please analyze this material and explain it clearly."
+        tier = model_router.route('study', 'analysis')
+        backend = context_cache.get_backend(client, types)
+
+        document = None
+        if mime.startswith('image/') or mime == 'application/pdf' or p.suffix.lower() == '.pdf':
+            data = offload(p.read_bytes)
+            document = types.Part.from_bytes(data=data, mime_type=mime)
+
+        if document is not None and user_email and conversation_id:
+            cache_key = context_cache.document_key(user_email, conversation_id)
+            cache_name = context_cache.acquire(
+                backend, cache_key, tier['gemini'],
+                lambda: (STUDY_SYSTEM_PROMPT, [types.Content(role='user', parts=[document])]),
+                context_cache.content_hash(STUDY_SYSTEM_PROMPT, mime, data),
+                user_email=user_email, conversation_id=conversation_id, mime_type=mime,
+            )
+            cached_parts = []
+        else:
+            cache_key = context_cache.prompt_key(tier['gemini'], STUDY_SYSTEM_PROMPT)
+            cache_name = context_cache.acquire(backend, cache_key, tier['gemini'], lambda: (STUDY_SYSTEM_PROMPT, []),
+                                               context_cache.content_hash(STUDY_SYSTEM_PROMPT))
+            cached_parts = [document] if document is not None else []
+        inline_parts = [document] if document is not None else []
+
+        if user_email:
+            check_user(user_email)
+        text = _study_call(tier, _study_instruction(user_prompt, history, conversation_id), cached_parts,
+                           inline_parts, backend, cache_key, cache_name)
+        if text:
+            return text
         return "Could not analyze the material. Please try again."
 
+    except Rejected:
+        raise
     except Exception as e:
         logger.error(f"Study analysis error: {str(e)[:200]}")
         return f"Error analyzing material: {str(e)[:100]}"
 
 
+def answer_study_followup(prompt: str, history: List[Dict[str, str]] = None, conversation_id: str = '',
+                          user_email: str = '') -> Optional[str]:
+    """Answer a text question against the document cached for this conversation.
+
+    Returns None when there is no live cached document (or the call fails),
+    and the caller answers without it.
+    """
+    if not client or not user_email or not conversation_id:
+        return None
+    tier = model_router.route('study', 'analysis')
+    backend = context_cache.get_backend(client, types)
+    cache_key = context_cache.document_key(user_email, conversation_id)
+    cache_name = context_cache.acquire(backend, cache_key, tier['gemini'])
+    if not cache_name:
+        return None
+    check_user(user_email)
+    try:
+        return _study_call(tier, _study_instruction(prompt, history, conversation_id), [], None,
+                           backend, cache_key, cache_name) or None
+    except Rejected:
+        raise
+    except Exception as e:
+        logger.error(f"Study follow-up error: {str(e)[:200]}")
+        return None
+
+
 def _guess_mime(ext: str) -> str:
     """Guess MIME type from file extension."""
     ext = (ext or '').lower()
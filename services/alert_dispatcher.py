@@ -0,0 +1,257 @@
+"""Background delivery of institutional alerts (transactional outbox).
+
+Request handlers only write an alert with status `pending` (see
+`utils.alerts`). A dispatcher thread per process claims pending alerts in
+batches, resolves recipients, and sends them over one reused SMTP connection,
+retrying failures with exponential backoff. Claims carry a lease so several
+processes can dispatch from the same collection without double-sending.
+
+Run standalone (e.g. alongside the nightly batch job):
+
+    python -m services.alert_dispatcher
+"""
+import os
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument
+from config import Config
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+ALERTS_COLLECTION = 'alerts'
+LEASE_SECONDS = 120
+
+
+class SMTPConnection:
+    """A single SMTP session reused across sends and reopened when it goes stale."""
+
+    def __init__(self):
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _open(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT, timeout=Config.MAIL_TIMEOUT)
+        if Config.MAIL_USE_TLS:
+            smtp.starttls()
+        if Config.MAIL_USERNAME:
+            smtp.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
+        return smtp
+
+    def _healthy(self) -> bool:
+        if self._smtp is None:
+            return False
+        if time.monotonic() - self._last_used > Config.MAIL_IDLE_SECONDS:
+            return False
+        try:
+            return self._smtp.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, msg: EmailMessage) -> None:
+        if not self._healthy():
+            self.close()
+            self._smtp = self._open()
+        try:
+            self._smtp.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # One transparent reconnect; a second failure goes to the retry path
+            self.close()
+            self._smtp = self._open()
+            self._smtp.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+        self._smtp = None
+
+
+def mail_configured() -> bool:
+    # MAIL_SERVER has a default, so it says nothing about whether mail is set up
+    return Config.ALERTS_EMAIL_ENABLED
+
+
+_REASON_TEXT = {
+    'threshold': 'Above the alert threshold',
+    'anomaly': 'Sharp rise above their usual level',
+    'crisis': 'A chat message contained crisis language (e.g. self-harm). Please contact the student promptly.',
+}
+
+
+def _message(alert: Dict[str, Any], student: Dict[str, Any], recipients: List[str]) -> EmailMessage:
+    score = alert.get('score')
+    name = student.get('name', 'student')
+    reason = alert.get('reason', 'threshold')
+    repeats = alert.get('dup_count', 0)
+    msg = EmailMessage()
+    if reason == 'crisis':
+        msg['Subject'] = f"AURA Alert: URGENT - crisis language from {name}"
+    else:
+        msg['Subject'] = f"AURA Alert: High Stress ({score}) for {name}"
+    msg['From'] = Config.MAIL_DEFAULT_SENDER or Config.MAIL_USERNAME or 'aura@localhost'
+    msg['To'] = ', '.join(recipients)
+    msg.set_content(
+        f"This is an automated alert from AURA.\n\n"
+        f"Student: {student.get('name', 'Unknown')} ({alert.get('student_email')})\n"
+        + (f"Stress score: {score}\n" if reason != 'crisis' else '')
+        + f"{_REASON_TEXT.get(reason, _REASON_TEXT['threshold'])}\n"
+        + (f"Repeated {repeats} more time(s) since this alert was raised.\n" if repeats else '')
+        + "\nPlease reach out and provide guidance."
+    )
+    return msg
+
+
+class AlertDispatcher:
+    def __init__(self):
+        self.smtp = SMTPConnection()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'sent': 0, 'logged': 0, 'retried': 0, 'failed': 0}
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                handled = self.dispatch_once()
+            except Exception as exc:
+                logger.warning(f"Alert dispatcher error: {exc}")
+                handled = 0
+            if handled == 0:
+                self._wake.wait(Config.ALERT_POLL_SECONDS)
+                self._wake.clear()
+        self.smtp.close()
+
+    def _claim(self, db) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        coll = db[ALERTS_COLLECTION]
+        claimed = []
+        for _ in range(Config.ALERT_BATCH_SIZE):
+            alert = coll.find_one_and_update(
+                {'$or': [
+                    {'status': 'pending', 'next_attempt_at': {'$not': {'$gt': now}}},
+                    {'status': 'sending', 'lease_until': {'$lt': now}},
+                ]},
+                {'$set': {'status': 'sending', 'lease_until': now + timedelta(seconds=LEASE_SECONDS)}},
+                sort=[('created_at', 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if alert is None:
+                break
+            claimed.append(alert)
+        return claimed
+
+    def dispatch_once(self) -> int:
+        """Claim and deliver one batch; returns the number of alerts handled."""
+        db = get_db()
+        batch = self._claim(db)
+        if not batch:
+            return 0
+
+        emails = list({a['student_email'] for a in batch})
+        students = {u['email']: u for u in db['users'].find(
+            {'email': {'$in': emails}}, {'email': 1, 'name': 1, 'proctor_email': 1, 'parent_email': 1})}
+        fallback_proctor = None
+
+        coll = db[ALERTS_COLLECTION]
+        for alert in batch:
+            student = students.get(alert['student_email'], {})
+            proctor_email = alert.get('proctor_email') or student.get('proctor_email')
+            if not proctor_email:
+                if fallback_proctor is None:
+                    fallback_proctor = (db['users'].find_one({'role': 'proctor'}, {'email': 1}) or {}).get('email', '')
+                proctor_email = fallback_proctor or None
+            parent_email = alert.get('parent_email') or student.get('parent_email')
+            recipients = [r for r in (proctor_email, parent_email) if r]
+
+            if not recipients or not mail_configured():
+                coll.update_one({'_id': alert['_id']}, {'$set': {
+                    'status': 'logged', 'proctor_email': proctor_email, 'parent_email': parent_email,
+                }, '$unset': {'lease_until': ''}})
+                self.stats['logged'] += 1
+                continue
+
+            try:
+                self.smtp.send(_message(alert, student, recipients))
+            except Exception as exc:
+                self._retry_later(coll, alert, exc)
+                continue
+            coll.update_one({'_id': alert['_id']}, {'$set': {
+                'status': 'sent', 'sent_at': datetime.utcnow(),
+                'proctor_email': proctor_email, 'parent_email': parent_email,
+            }, '$unset': {'lease_until': ''}})
+            self.stats['sent'] += 1
+        return len(batch)
+
+    def _retry_later(self, coll, alert: Dict[str, Any], exc: Exception) -> None:
+        attempts = int(alert.get('attempts', 0)) + 1
+        if attempts >= Config.ALERT_MAX_ATTEMPTS:
+            status, next_at = 'failed', None
+            self.stats['failed'] += 1
+            logger.error(f"Alert {alert['_id']} failed after {attempts} attempts: {exc}")
+        else:
+            delay = min(Config.ALERT_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), 3600)
+            status, next_at = 'pending', datetime.utcnow() + timedelta(seconds=delay)
+            self.stats['retried'] += 1
+            logger.warning(f"Alert {alert['_id']} send failed (attempt {attempts}), retrying in {delay}s: {exc}")
+        coll.update_one({'_id': alert['_id']}, {'$set': {
+            'status': status, 'attempts': attempts, 'next_attempt_at': next_at, 'last_error': str(exc)[:300],
+        }, '$unset': {'lease_until': ''}})
+
+
+_dispatcher: Optional[AlertDispatcher] = None
+_dispatcher_pid: Optional[int] = None
+
+
+def get_dispatcher() -> AlertDispatcher:
+    """Return this process's dispatcher, creating a fresh one after a fork."""
+    global _dispatcher, _dispatcher_pid
+    if _dispatcher is None or _dispatcher_pid != os.getpid():
+        _dispatcher = AlertDispatcher()
+        _dispatcher_pid = os.getpid()
+    return _dispatcher
+
+
+def ensure_dispatcher() -> AlertDispatcher:
+    dispatcher = get_dispatcher()
+    dispatcher.start()
+    return dispatcher
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    dispatcher = get_dispatcher()
+    logger.info("Alert dispatcher running (Ctrl+C to stop)")
+    try:
+        dispatcher._run()
+    except KeyboardInterrupt:
+        dispatcher.smtp.close()
+    logger.info(f"Alert dispatcher stopped: {dispatcher.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import os
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pymongo import errors
+from config import Config
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ('alerts', 'stress', 'grievances')
+STATE_COLLECTION = 'stream_state'
+# Source of high-stress events when readings live in a time-series collection
+STATE_COLLECTION_READINGS = 'student_state'
+
+# How long a student -> proctor assignment is trusted before re-reading users
+OWNER_CACHE_SECONDS = 300
+# Persist the resume token at most this often (seconds)
+TOKEN_FLUSH_SECONDS = 2.0
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else None
+
+
+class ProctorFeed:
+    """Fan out MongoDB change events to connected proctors.
+
+    A single change stream per process watches `alerts`, `stress` and
+    `grievances`; each event is routed only to the proctor the student is
+    assigned to (`users.proctor_email`). The resume token is persisted in
+    `stream_state` so a restart continues where the last process stopped.
+    """
+
+    def __init__(self, stream_id: str = None, stress_threshold: int = None):
+        self.stream_id = stream_id or Config.LIVE_FEED_STREAM_ID
+        self.stress_threshold = stress_threshold if stress_threshold is not None else Config.LIVE_FEED_STRESS_THRESHOLD
+        self.available: Optional[bool] = None
+        self._subscribers: Dict[str, set] = {}
+        self._owners: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Subscription management
+    # ------------------------------------------------------------------
+    def subscribe(self, proctor_email: str) -> queue.Queue:
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(proctor_email, set()).add(q)
+        return q
+
+    def unsubscribe(self, proctor_email: str, q: queue.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(proctor_email)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    self._subscribers.pop(proctor_email, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> bool:
+        """Start the watcher thread once; return False if change streams are unsupported."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return bool(self.available)
+            if self.available is False:
+                return False
+            self.available = self._supports_change_streams()
+            if not self.available:
+                logger.warning("Live feed disabled: MongoDB change streams need a replica set or sharded cluster")
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='proctor-feed', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _supports_change_streams(self) -> bool:
+        try:
+            hello = get_db().client.admin.command('hello')
+        except Exception as exc:
+            logger.warning(f"Live feed: could not inspect topology: {exc}")
+            return False
+        return bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+
+    # ------------------------------------------------------------------
+    # Change stream loop
+    # ------------------------------------------------------------------
+    def _pipeline(self):
+        if Config.READINGS_TIMESERIES:
+            # Time-series writes are not reported by change streams; follow the
+            # per-student state, whose risk fields are rewritten on every reading.
+            high_stress = {
+                'ns.coll': STATE_COLLECTION_READINGS,
+                'operationType': 'update',
+                'updateDescription.updatedFields.risk_updated_at': {'$exists': True},
+                'fullDocument.latest_score': {'$gte': self.stress_threshold},
+            }
+        else:
+            high_stress = {'ns.coll': 'stress', 'fullDocument.score': {'$gte': self.stress_threshold}}
+        return [
+            {'$match': {
+                'operationType': {'$in': ['insert', 'update', 'replace']},
+                '$or': [
+                    {'ns.coll': {'$in': ['alerts', 'grievances']}},
+                    high_stress,
+                ],
+            }},
+        ]
+
+    def _load_token(self, db):
+        doc = db[STATE_COLLECTION].find_one({'_id': self.stream_id}) or {}
+        return doc.get('resume_token')
+
+    def _save_token(self, db, token) -> None:
+        db[STATE_COLLECTION].update_one(
+            {'_id': self.stream_id},
+            {'$set': {'resume_token': token, 'updated_at': datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            db = get_db()
+            token = self._load_token(db)
+            try:
+                with db.watch(self._pipeline(), full_document='updateLookup',
+                              resume_after=token, max_await_time_ms=1000) as stream:
+                    backoff = 1.0
+                    last_flush = time.monotonic()
+                    pending_token = None
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._dispatch(db, change)
+                            pending_token = stream.resume_token
+                        if pending_token is not None and time.monotonic() - last_flush >= TOKEN_FLUSH_SECONDS:
+                            self._save_token(db, pending_token)
+                            pending_token = None
+                            last_flush = time.monotonic()
+                    if pending_token is not None:
+                        self._save_token(db, pending_token)
+            except errors.OperationFailure as exc:
+                # 286 = ChangeStreamHistoryLost: the oplog rolled past our token
+                if exc.code == 286 or 'resume' in str(exc).lower():
+                    logger.warning("Live feed: resume token expired, restarting from now")
+                    db[STATE_COLLECTION].delete_one({'_id': self.stream_id})
+                    continue
+                logger.error(f"Live feed stopped: {exc}")
+                self.available = False
+                return
+            except errors.PyMongoError as exc:
+                logger.warning(f"Live feed interrupted, retrying in {backoff:.0f}s: {exc}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def _proctor_for(self, db, student_email: str) -> Optional[str]:
+        now = time.monotonic()
+        cached = self._owners.get(student_email)
+        if cached and now - cached[1] < OWNER_CACHE_SECONDS:
+            return cached[0]
+        user = db['users'].find_one({'email': student_email}, {'proctor_email': 1}) or {}
+        proctor = user.get('proctor_email')
+        self._owners[student_email] = (proctor, now)
+        return proctor
+
+    def _dispatch(self, db, change: Dict[str, Any]) -> None:
+        event = self.to_event(change)
+        if not event:
+            return
+        proctor = self._proctor_for(db, event['student_email'])
+        if not proctor:
+            return
+        with self._lock:
+            targets = list(self._subscribers.get(proctor, ()))
+        for q in targets:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow consumer: drop the oldest event rather than block the stream
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    @staticmethod
+    def to_event(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Translate a raw change document into the JSON payload sent to proctors."""
+        coll = (change.get('ns') or {}).get('coll')
+        doc = change.get('fullDocument') or {}
+        if coll == 'alerts':
+            student = doc.get('student_email')
+            data = {'score': doc.get('score'), 'status': doc.get('status')}
+        elif coll == 'stress':
+            student = doc.get('user_email')
+            data = {'score': doc.get('score'), 'source': doc.get('source')}
+        elif coll == STATE_COLLECTION_READINGS:
+            student = doc.get('user_email')
+            data = {'score': doc.get('latest_score'), 'risk': doc.get('risk')}
+            doc = {'created_at': doc.get('risk_updated_at')}
+            coll = 'stress'
+        elif coll == 'grievances':
+            student = doc.get('user_email')
+            data = {'subject': doc.get('subject'), 'status': doc.get('status')}
+        else:
+            return None
+        if not student:
+            return None
+        return {
+            'kind': {'alerts': 'alert', 'stress': 'stress', 'grievances': 'grievance'}[coll],
+            'operation': change.get('operationType'),
+            'student_email': student,
+            'created_at': _iso(doc.get('created_at')),
+            'data': data,
+        }
+
+
+_feed: Optional[ProctorFeed] = None
+_feed_pid: Optional[int] = None
+
+
+def get_feed() -> ProctorFeed:
+    """Return this process's feed, creating a fresh one after a fork."""
+    global _feed, _feed_pid
+    if _feed is None or _feed_pid != os.getpid():
+        _feed = ProctorFeed()
+        _feed_pid = os.getpid()
+    return _feed
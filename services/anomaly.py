@@ -0,0 +1,60 @@
+"""Per-student online baseline for stress readings.
+
+Each student's state carries an exponentially weighted mean and variance of
+their scores. Updating them is O(1) per reading regardless of history length,
+and a reading is anomalous when it sits well above the student's own baseline.
+"""
+import math
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+
+
+def ewma_update(state: Dict[str, Any], score: float, alpha: float = None) -> Dict[str, Any]:
+    """Return the new `ewma_mean`/`ewma_var`/`ewma_n` fields after observing `score`."""
+    alpha = Config.STRESS_EWMA_ALPHA if alpha is None else alpha
+    n = int(state.get('ewma_n') or 0)
+    if n == 0:
+        return {'ewma_mean': float(score), 'ewma_var': 0.0, 'ewma_n': 1}
+    mean = float(state.get('ewma_mean', score))
+    var = float(state.get('ewma_var', 0.0))
+    diff = score - mean
+    incr = alpha * diff
+    return {
+        'ewma_mean': mean + incr,
+        'ewma_var': (1 - alpha) * (var + diff * incr),
+        'ewma_n': n + 1,
+    }
+
+
+def deviation(state: Dict[str, Any], score: float) -> Optional[float]:
+    """z-score of `score` against the student's baseline before this reading, if warmed up."""
+    n = int(state.get('ewma_n') or 0)
+    if n < Config.STRESS_ANOMALY_WARMUP:
+        return None
+    # Floored so a perfectly flat history still yields a (large) z-score
+    var = max(float(state.get('ewma_var') or 0.0), Config.STRESS_ANOMALY_MIN_VAR)
+    return (score - float(state['ewma_mean'])) / math.sqrt(var)
+
+
+def evaluate(state: Dict[str, Any], score: int) -> Tuple[Dict[str, Any], Optional[float], bool]:
+    """Score a reading against the prior baseline and fold it in.
+
+    Returns (fields to $set, z-score or None, is_anomaly). An anomaly needs
+    both a large z-score and a minimum absolute rise, so students with a very
+    flat history do not alert on small wobbles.
+    """
+    z = deviation(state, score)
+    rise = score - float(state.get('ewma_mean', score))
+    anomalous = z is not None and z >= Config.STRESS_ANOMALY_Z and rise >= Config.STRESS_ANOMALY_MIN_DELTA
+    fields = ewma_update(state, score)
+    fields['last_z'] = round(z, 2) if z is not None else None
+    return fields, z, anomalous
+
+
+def alert_reason(score: int, anomalous: bool, check_ceiling: bool = True) -> Optional[str]:
+    """Why a reading should alert, or None: 'anomaly' beats 'threshold'."""
+    if anomalous:
+        return 'anomaly'
+    if check_ceiling and score > Config.STRESS_ALERT_SCORE:
+        return 'threshold'
+    return None
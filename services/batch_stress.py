@@ -0,0 +1,176 @@
+"""Nightly stress computation for the whole student body.
+
+Students are processed in chunks ordered by email. For each chunk the inputs
+come from two aggregations (latest mood per user in the last 24h, last five
+mental-chat sentiments per user), results are written with one `insert_many`,
+derived state is updated in bulk and alerts are queued as `pending` rather
+than mailed inline. A checkpoint in `batch_jobs` is advanced after every chunk,
+so re-running the same job id resumes after the last completed chunk:
+
+    python -m services.batch_stress --chunk-size 500
+    python -m services.batch_stress --job-id daily-2026-10-19   # resume
+
+The per-user `$top`/`$topN` accumulators need MongoDB 5.2 or newer.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from models.chat import ChatModel
+from models.mood import MoodModel
+from models.stress import StressModel
+from services.scoring import encode_moods, encode_sentiments, score_batch
+from services.student_state import touch_students_bulk
+from services.wellness_cube import record_readings
+from services.anomaly import alert_reason
+from utils.alerts import queue_institutional_alerts
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = 'batch_jobs'
+SOURCE = 'daily_aggregate'
+RECENT_CHATS = 5
+
+
+def _latest_moods(db, emails: List[str], since: datetime) -> Dict[str, str]:
+    rows = db[MoodModel.collection_name].aggregate([
+        {'$match': {'user_email': {'$in': emails}, 'created_at': {'$gte': since}}},
+        {'$group': {'_id': '$user_email', 'mood': {'$top': {'sortBy': {'created_at': -1}, 'output': '$mood'}}}},
+    ])
+    return {r['_id']: r['mood'] for r in rows}
+
+
+def _recent_sentiments(db, emails: List[str]) -> Dict[str, List[str]]:
+    rows = db[ChatModel.collection_name].aggregate([
+        {'$match': {'user_email': {'$in': emails}, 'type': 'mental'}},
+        {'$group': {'_id': '$user_email', 'sentiments': {'$topN': {
+            'n': RECENT_CHATS,
+            'sortBy': {'created_at': -1},
+            'output': {'$ifNull': ['$sentiment', 'neutral']},
+        }}}},
+    ])
+    return {r['_id']: r['sentiments'] for r in rows}
+
+
+def _process_chunk(db, job_id: str, students: List[Dict[str, Any]], now: datetime) -> Dict[str, int]:
+    emails = [s['email'] for s in students]
+    stress = db[StressModel.collection_name]
+
+    # A crash between insert_many and the checkpoint leaves some of this chunk
+    # written; skip those students so a resume never double-inserts.
+    done = set(stress.distinct('user_email', {'batch_id': job_id, 'user_email': {'$in': emails}}))
+    todo = [s for s in students if s['email'] not in done]
+    if not todo:
+        return {'written': 0, 'alerts': 0}
+
+    moods = _latest_moods(db, emails, now - timedelta(hours=24))
+    sentiments = _recent_sentiments(db, emails)
+
+    # Score the whole chunk in one vectorized call
+    scores = score_batch(
+        encode_moods([moods.get(s['email'], 'normal') for s in todo]),
+        encode_sentiments([sentiments.get(s['email'], []) for s in todo], width=RECENT_CHATS),
+        weights='daily',
+    )
+
+    docs = []
+    alerts = []
+    for s, score in zip(todo, scores):
+        score = int(score)
+        docs.append({
+            'user_email': s['email'],
+            'score': score,
+            'source': SOURCE,
+            'batch_id': job_id,
+            'created_at': now,
+        })
+
+    stress.insert_many(docs, ordered=False)
+    users = {s['email']: s for s in todo}
+    states = touch_students_bulk(db, docs, users)
+    record_readings(db, docs, states)
+
+    for d in docs:
+        anomalous = bool((states.get(d['user_email']) or {}).get('last_anomaly'))
+        reason = alert_reason(d['score'], anomalous)
+        if reason:
+            alerts.append((users[d['user_email']], d['score'], reason))
+    queued = queue_institutional_alerts(db, alerts)
+    return {'written': len(docs), 'alerts': queued}
+
+
+def run_nightly(db, chunk_size: int = 500, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """Compute today's score for every student; resumable by `job_id`."""
+    job_id = job_id or f"daily-{datetime.utcnow():%Y-%m-%d}"
+    jobs = db[JOBS_COLLECTION]
+    job = jobs.find_one({'_id': job_id})
+    if job and job.get('status') == 'completed':
+        logger.info(f"Job {job_id} already completed")
+        return job
+    if not job:
+        job = {'_id': job_id, 'status': 'running', 'last_email': '', 'processed': 0, 'written': 0,
+               'alerts': 0, 'chunks': 0, 'started_at': datetime.utcnow()}
+        jobs.insert_one(job)
+    else:
+        jobs.update_one({'_id': job_id}, {'$set': {'status': 'running', 'resumed_at': datetime.utcnow()}})
+        logger.info(f"Resuming {job_id} after {job['last_email'] or 'start'} ({job['processed']} done)")
+
+    users = db['users']
+    # All readings of a run share one timestamp so they land on one cube day
+    now = job.get('run_at') or datetime.utcnow()
+    jobs.update_one({'_id': job_id}, {'$set': {'run_at': now}})
+    last_email = job.get('last_email', '')
+    started = time.perf_counter()
+    processed_this_run = 0
+
+    while True:
+        chunk_start = time.perf_counter()
+        students = list(users.find(
+            {'role': 'student', 'email': {'$gt': last_email}},
+            {'email': 1, 'name': 1, 'proctor_email': 1, 'department': 1, 'parent_email': 1},
+        ).sort('email', 1).limit(chunk_size))
+        if not students:
+            break
+
+        counts = _process_chunk(db, job_id, students, now)
+        last_email = students[-1]['email']
+        processed_this_run += len(students)
+        jobs.update_one({'_id': job_id}, {
+            '$set': {'last_email': last_email, 'updated_at': datetime.utcnow()},
+            '$inc': {'processed': len(students), 'written': counts['written'],
+                     'alerts': counts['alerts'], 'chunks': 1},
+        })
+        elapsed = time.perf_counter() - chunk_start
+        logger.info(f"[{job_id}] chunk of {len(students)} in {elapsed:.2f}s "
+                    f"({len(students) / elapsed if elapsed else 0:.0f} students/s), "
+                    f"{counts['alerts']} alerts queued")
+
+    total_seconds = time.perf_counter() - started
+    rate = processed_this_run / total_seconds if total_seconds else 0.0
+    jobs.update_one({'_id': job_id}, {'$set': {
+        'status': 'completed',
+        'finished_at': datetime.utcnow(),
+        'seconds': round(total_seconds, 2),
+        'students_per_second': round(rate, 1),
+    }})
+    summary = jobs.find_one({'_id': job_id})
+    logger.info(f"[{job_id}] done: {summary['processed']} students, {summary['alerts']} alerts "
+                f"queued, {rate:.0f} students/s this run")
+    return summary
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Compute daily stress scores for all students.')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--job-id', default=None, help='Re-use an id to resume an interrupted run')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run_nightly(get_db(), chunk_size=args.chunk_size, job_id=args.job_id)
+
+
+if __name__ == '__main__':
+    main()
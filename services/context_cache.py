@@ -0,0 +1,242 @@
+"""Provider-side context caching for the study assistant.
+
+The long study system prompt, and the document a student uploads in a
+study conversation, are registered once as a cached context with Gemini.
+Later requests pass the cache's handle (`cached_content`) instead of
+resending them, so the prompt tokens are billed at the cached rate and the
+model starts answering sooner. Follow-up questions in the same
+conversation can then use the document without uploading it again.
+
+Handles live in the `context_caches` collection so every worker shares
+them. A handle is refreshed (TTL extended) when it is used within
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS of expiry, and recreated once it has
+expired. Gemini refuses to cache small contexts (about 1k tokens on
+flash); such a prefix is remembered as not cacheable for
+CONTEXT_CACHE_RETRY_SECONDS and sent inline, where Gemini's implicit
+prefix caching still applies.
+
+CONTEXT_CACHE_BACKEND=fake swaps the provider for an in-memory fake that
+keeps the same bookkeeping. It is for tests only: its handles mean nothing
+to Gemini, so never set it where study requests reach the real API.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+from pymongo import errors
+from config import Config
+from models.context_cache import ContextCacheModel
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counts = {'hits': 0, 'refreshed': 0, 'created': 0, 'not_cacheable': 0, 'errors': 0}
+_fake = None
+
+
+class GenaiCacheBackend:
+    """Caches on the Gemini API (google.genai `client.caches`)."""
+
+    def __init__(self, client, types):
+        self.client = client
+        self.types = types
+
+    def create(self, model: str, system_instruction: str, contents: list, ttl_seconds: int,
+               display_name: str) -> Tuple[str, datetime]:
+        cache = self.client.caches.create(model=model, config=self.types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            contents=contents or None,
+            display_name=display_name[:128],
+            ttl=f'{ttl_seconds}s',
+        ))
+        return cache.name, _expiry(cache, ttl_seconds)
+
+    def refresh(self, name: str, ttl_seconds: int) -> datetime:
+        cache = self.client.caches.update(name=name, config=self.types.UpdateCachedContentConfig(
+            ttl=f'{ttl_seconds}s'))
+        return _expiry(cache, ttl_seconds)
+
+    def delete(self, name: str) -> None:
+        self.client.caches.delete(name=name)
+
+
+class FakeCacheBackend:
+    """In-memory stand-in for the provider, with the same expiry rules."""
+
+    def __init__(self, min_chars: int = 0):
+        self.min_chars = min_chars  # mimic the provider's minimum size
+        self.caches: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, model, system_instruction, contents, ttl_seconds, display_name):
+        size = len(system_instruction or '') + sum(len(str(c)) for c in contents or [])
+        if size < self.min_chars:
+            raise ValueError(f'Cached content is too small: {size} < {self.min_chars}')
+        name = f'cachedContents/fake-{uuid.uuid4().hex[:12]}'
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        self.caches[name] = {'model': model, 'system_instruction': system_instruction,
+                             'contents': contents, 'display_name': display_name, 'expires_at': expires_at}
+        return name, expires_at
+
+    def refresh(self, name, ttl_seconds):
+        cache = self.get(name)
+        cache['expires_at'] = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        return cache['expires_at']
+
+    def delete(self, name):
+        self.caches.pop(name, None)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        cache = self.caches.get(name)
+        if cache is None or cache['expires_at'] <= datetime.utcnow():
+            self.caches.pop(name, None)
+            raise KeyError(f'{name} not found')
+        return cache
+
+
+def _expiry(cache, ttl_seconds: int) -> datetime:
+    expire_time = getattr(cache, 'expire_time', None)
+    if expire_time is None:
+        return datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    if expire_time.tzinfo is not None:
+        expire_time = expire_time.astimezone(timezone.utc).replace(tzinfo=None)
+    return expire_time
+
+
+def get_backend(client=None, types=None):
+    """The configured backend, or None if caching is off or there is no client."""
+    global _fake
+    if not Config.CONTEXT_CACHE_ENABLED:
+        return None
+    if Config.CONTEXT_CACHE_BACKEND == 'fake':
+        with _lock:
+            if _fake is None:
+                _fake = FakeCacheBackend()
+        return _fake
+    if client is None or types is None:
+        return None
+    return GenaiCacheBackend(client, types)
+
+
+def content_hash(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def prompt_key(model: str, system_instruction: str) -> str:
+    return f'prompt:{model}:{content_hash(system_instruction)[:16]}'
+
+
+def document_key(user_email: str, conversation_id: str) -> str:
+    return f'document:{user_email}:{conversation_id}'
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counts[name] += 1
+
+
+def _collection():
+    try:
+        return get_db()[ContextCacheModel.collection_name]
+    except Exception as exc:
+        logger.warning(f"context cache disabled, database unavailable: {exc}")
+        return None
+
+
+def acquire(backend, key: str, model: str, build: Optional[Callable[[], Tuple[str, list]]] = None,
+            expected_hash: Optional[str] = None, **fields: Any) -> Optional[str]:
+    """Handle of the cached context for `key`, creating or refreshing it.
+
+    `build` returns (system_instruction, contents) and is only called when a
+    cache has to be created; without it only an existing cache is used. A
+    record whose model or content hash differs (e.g. a new document in the
+    conversation) is replaced. Returns None if the context is not cacheable
+    or the provider call failed; the caller then sends everything inline.
+    """
+    coll = _collection() if backend is not None else None
+    if coll is None:
+        return None
+    now = datetime.utcnow()
+    record = coll.find_one({'key': key})
+    if record and record['expires_at'] > now and record.get('model') == model \
+            and expected_hash in (None, record.get('content_hash')):
+        if record.get('name') is None:
+            return None  # refused recently; do not ask again until the record expires
+        if record['expires_at'] - now > timedelta(seconds=Config.CONTEXT_CACHE_REFRESH_MARGIN_SECONDS):
+            _count('hits')
+            return record['name']
+        try:
+            expires_at = backend.refresh(record['name'], Config.CONTEXT_CACHE_TTL_SECONDS)
+            coll.update_one({'_id': record['_id']}, {'$set': {'expires_at': expires_at}})
+            _count('refreshed')
+            return record['name']
+        except Exception as exc:
+            logger.warning(f"context cache {record['name']} not refreshed: {str(exc)[:150]}")
+            invalidate(backend, key, record)
+            record = None
+    if build is None:
+        return None
+    if record:
+        invalidate(backend, key, record)
+
+    system_instruction, contents = build()
+    doc = {'key': key, 'kind': key.split(':', 1)[0], 'model': model, 'content_hash': expected_hash,
+           'created_at': now, **fields}
+    started = time.perf_counter()
+    try:
+        doc['name'], doc['expires_at'] = backend.create(model, system_instruction, contents,
+                                                        Config.CONTEXT_CACHE_TTL_SECONDS, key)
+        _count('created')
+        logger.info(f"✓ context cache {doc['name']} created for {key} "
+                    f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    except Exception as exc:
+        # Usually below the provider's minimum size; remember that for a while
+        logger.info(f"context for {key} not cached: {str(exc)[:150]}")
+        _count('not_cacheable')
+        doc['name'] = None
+        doc['expires_at'] = now + timedelta(seconds=Config.CONTEXT_CACHE_RETRY_SECONDS)
+    try:
+        coll.insert_one(doc)
+    except errors.DuplicateKeyError:
+        # Another worker registered the same context first; use theirs
+        if doc['name']:
+            _delete(backend, doc['name'])
+        winner = coll.find_one({'key': key})
+        return winner.get('name') if winner else None
+    return doc['name']
+
+
+def invalidate(backend, key: str, record: Optional[Dict[str, Any]] = None) -> None:
+    """Forget `key`, deleting its provider cache (e.g. after the provider lost it)."""
+    coll = _collection()
+    if coll is None:
+        return
+    record = record or coll.find_one({'key': key})
+    if record is None:
+        return
+    coll.delete_one({'_id': record['_id']})
+    if record.get('name') and backend is not None:
+        _delete(backend, record['name'])
+
+
+def _delete(backend, name: str) -> None:
+    try:
+        backend.delete(name)
+    except Exception as exc:
+        logger.debug(f"context cache {name} not deleted: {exc}")
+
+
+def record_error() -> None:
+    _count('errors')
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_counts)
@@ -0,0 +1,91 @@
+"""Daily rollups of chat feedback by reply style and provider.
+
+Raw events are appended to `feedback_events` through the write-behind queue
+(see routes/chat.api_chat_feedback). `rollup` recomputes whole days into
+`feedback_daily` server-side, so it is idempotent and can run as often as
+needed (e.g. hourly from cron):
+
+    python -m services.feedback_stats rollup --days 2
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from models.feedback_event import FeedbackDailyModel, FeedbackEventModel
+
+logger = logging.getLogger(__name__)
+
+
+def _day_start(days_ago: int) -> datetime:
+    return (datetime.utcnow() - timedelta(days=days_ago)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup(db, days: int = 2) -> int:
+    """Recompute the last `days` days (today included); returns rows written."""
+    start = _day_start(days - 1)
+    counts = {action: {'$sum': {'$cond': [{'$eq': ['$action', action]}, 1, 0]}}
+              for action in FeedbackEventModel.ACTIONS}
+    db[FeedbackEventModel.collection_name].aggregate([
+        {'$match': {'created_at': {'$gte': start}}},
+        {'$group': {
+            '_id': {'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                    'style': '$style', 'provider': '$provider'},
+            **counts,
+        }},
+        {'$project': {
+            '_id': 0,
+            'day': '$_id.day', 'style': '$_id.style', 'provider': '$_id.provider',
+            **{action: 1 for action in FeedbackEventModel.ACTIONS},
+            'up_rate': {'$cond': [
+                {'$gt': [{'$add': ['$thumbs_up', '$thumbs_down']}, 0]},
+                {'$divide': ['$thumbs_up', {'$add': ['$thumbs_up', '$thumbs_down']}]},
+                None,
+            ]},
+            'updated_at': '$$NOW',
+        }},
+        {'$merge': {'into': FeedbackDailyModel.collection_name, 'on': ['day', 'style', 'provider'],
+                    'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ])
+    return db[FeedbackDailyModel.collection_name].count_documents({'day': {'$gte': start.strftime('%Y-%m-%d')}})
+
+
+def query(db, days: int = 30) -> Dict[str, Any]:
+    """Daily rows plus window totals per (style, provider)."""
+    start_day = _day_start(days - 1).strftime('%Y-%m-%d')
+    rows = list(db[FeedbackDailyModel.collection_name].find(
+        {'day': {'$gte': start_day}}, {'_id': 0, 'updated_at': 0}).sort('day', 1))
+    totals: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        t = totals.setdefault((r['style'], r['provider']), {'style': r['style'], 'provider': r['provider'],
+                                                           'thumbs_up': 0, 'thumbs_down': 0})
+        t['thumbs_up'] += r.get('thumbs_up', 0)
+        t['thumbs_down'] += r.get('thumbs_down', 0)
+    summary: List[Dict[str, Any]] = []
+    for t in totals.values():
+        votes = t['thumbs_up'] + t['thumbs_down']
+        summary.append({**t, 'up_rate': round(t['thumbs_up'] / votes, 3) if votes else None})
+    summary.sort(key=lambda t: (-(t['thumbs_up'] + t['thumbs_down']), t['style'], t['provider']))
+    return {'days': rows, 'summary': summary}
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Roll up chat feedback per day, style and provider.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_rollup = sub.add_parser('rollup')
+    p_rollup.add_argument('--days', type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'rollup':
+        db = get_db()
+        written = rollup(db, days=args.days)
+        logger.info(f"feedback_daily: {written} rows for the last {args.days} day(s)")
+        for t in query(db, days=args.days)['summary']:
+            logger.info(f"  {t['style']:<12} {t['provider']:<8} up {t['thumbs_up']:>5} down {t['thumbs_down']:>5} "
+                        f"rate {t['up_rate'] if t['up_rate'] is not None else '-'}")
+
+
+if __name__ == '__main__':
+    main()
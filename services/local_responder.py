@@ -0,0 +1,172 @@
+"""Local fast path for trivial chat messages.
+
+Greetings, "who are you", thanks and the like do not need an LLM. `respond`
+answers them from canned replies in microseconds, picking a variant the
+student has not just seen and acknowledging a returning conversation. Only
+whole-message matches count: "hi, I failed my exam" still goes to the model.
+
+Tiers are enabled with LOCAL_RESPONDER_TIERS (comma separated, empty
+disables the fast path). Messages with crisis language never take the fast
+path, whatever the tiers; see `is_crisis`.
+
+`stats()` reports how many replies were served locally versus by a model in
+this process (also on /health); each chat document records `fast_path`.
+"""
+import random
+import re
+import threading
+from typing import Dict, List, Optional
+from config import Config
+
+# Crisis language: always answered by a model with safety guidance, and alerted
+CRISIS_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'\bsuicid',
+    r'\bkill(ing)?\s+my\s*self\b',
+    r'\bend(ing)?\s+(my|it)\s+(life|all)\b',
+    r'\b(want|wanna|going)\s+to\s+die\b',
+    r'\bself[\s-]?harm',
+    r'\b(hurt|harm|cut)(ing)?\s+my\s*self\b',
+    r'\bno\s+(reason|point)\s+(to|in)\s+liv',
+    r'\bbetter\s+off\s+(dead|without\s+me)\b',
+    r"\b(don'?t|do\s+not)\s+want\s+to\s+(live|be\s+alive|exist)\b",
+    r'\boverdose\b',
+)]
+
+_PUNCT = re.compile(r"[^\w\s']")
+MAX_WORDS = 6
+
+INTENTS = {
+    'greeting': {
+        'hi', 'hello', 'hey', 'hiya', 'yo', 'sup', 'hi there', 'hello there', 'hey there', 'hey aura',
+        'hi aura', 'hello aura', 'good morning', 'good afternoon', 'good evening', 'morning', 'namaste',
+    },
+    'identity': {
+        'who are you', 'what are you', 'who r u', 'what r u', 'who are u', 'what is aura', "what's aura",
+        'what can you do', 'what do you do',
+    },
+    'thanks': {
+        'thanks', 'thank you', 'thx', 'ty', 'thank u', 'thanks a lot', 'thank you so much', 'thanks aura',
+        'thank you aura', 'thanks so much', 'thank you very much', 'ok thanks', 'okay thanks', 'ok thank you',
+        'appreciate it', 'that helped', 'that helps',
+    },
+    'how_are_you': {
+        'how are you', 'how r u', 'how are u', "how's it going", 'hows it going', 'how are you doing',
+        "what's up", 'whats up', 'wassup',
+    },
+    'farewell': {
+        'bye', 'goodbye', 'good night', 'goodnight', 'see you', 'see ya', 'gtg', 'talk later', 'ttyl', 'cya',
+    },
+}
+
+REPLIES = {
+    'greeting': {
+        'new': [
+            "Hi! I'm AURA. How are you feeling today?",
+            "Hello! I'm here to listen. What's on your mind?",
+            "Hey! How's your day going so far?",
+            "Hi there! How can I support you right now?",
+        ],
+        'returning': [
+            "Welcome back! How have things been since we last talked?",
+            "Hi again! How are you feeling now?",
+            "Good to see you again. What's on your mind today?",
+        ],
+    },
+    'identity': {
+        'new': [
+            "I'm AURA, a wellness companion for students. I can listen without judgment, help with stress, "
+            "anxiety and exam pressure, and suggest small practical steps. How can I support you today?",
+            "I'm AURA, an AI assistant for student wellbeing. Talk to me about stress, study pressure or how "
+            "you're feeling, and we'll work out a next step together. What's on your mind?",
+        ],
+        'returning': [
+            "Still AURA, your wellness companion. I'm here whenever you want to talk. What's on your mind?",
+            "I'm AURA, here to listen and help you find a next step. What would help right now?",
+        ],
+    },
+    'thanks': {
+        'new': [
+            "You're welcome! I'm here whenever you need me.",
+            "Glad I could help. Is there anything else on your mind?",
+            "Anytime! Take care of yourself.",
+            "Happy to help. How are you feeling now?",
+        ],
+    },
+    'how_are_you': {
+        'new': [
+            "I'm here and ready to listen, thanks for asking! How are *you* doing today?",
+            "Doing well, thank you! More importantly, how are you feeling?",
+            "All good on my side. What about you, how's today been?",
+        ],
+    },
+    'farewell': {
+        'new': [
+            "Take care! I'm here whenever you want to talk.",
+            "Bye for now. Be kind to yourself today.",
+            "See you soon! Remember to take a break and breathe.",
+        ],
+    },
+}
+
+CRISIS_REPLY = (
+    "I'm really sorry you're feeling this way, and I'm glad you told me. You don't have to go through this alone.\n\n"
+    "• If you might act on these thoughts or are in danger, please call your local emergency number now.\n"
+    "• Reach out to someone you trust, a friend, family member or your proctor, and let them know how you feel.\n"
+    "• You can also contact a crisis helpline; they are free, confidential and available any time.\n\n"
+    "Can you tell me if you're safe right now?"
+)
+
+_lock = threading.Lock()
+_counts = {'local': 0, 'model': 0, 'crisis': 0}
+
+
+def is_crisis(message: str) -> bool:
+    return any(p.search(message or '') for p in CRISIS_PATTERNS)
+
+
+def _normalise(message: str) -> str:
+    return ' '.join(_PUNCT.sub(' ', (message or '').lower()).split())
+
+
+def enabled_tiers() -> List[str]:
+    return [t.strip() for t in Config.LOCAL_RESPONDER_TIERS.split(',') if t.strip() in INTENTS]
+
+
+def classify(message: str) -> Optional[str]:
+    """The fast-path intent of a whole message, or None."""
+    text = _normalise(message)
+    if not text or len(text.split()) > MAX_WORDS:
+        return None
+    for intent in enabled_tiers():
+        if text in INTENTS[intent]:
+            return intent
+    return None
+
+
+def respond(message: str, history: Optional[List[Dict[str, str]]] = None, kind: str = 'mental') -> Optional[str]:
+    """A local reply for a trivial message, or None if a model should answer."""
+    if kind != 'mental' or is_crisis(message):
+        return None
+    intent = classify(message)
+    if intent is None:
+        return None
+    history = history or []
+    variants = REPLIES[intent]
+    pool = variants['returning'] if history and 'returning' in variants else variants['new']
+    # Do not repeat anything AURA said in the recent turns
+    recent = {t.get('content', '').strip() for t in history[-8:] if t.get('role') == 'assistant'}
+    fresh = [r for r in pool if r not in recent] or pool
+    return random.choice(fresh)
+
+
+def record(served_by: str) -> None:
+    """Count one reply: 'local', 'model' or 'crisis' (model, with alert)."""
+    with _lock:
+        _counts[served_by] += 1
+
+
+def stats() -> Dict[str, float]:
+    with _lock:
+        counts = dict(_counts)
+    total = sum(counts.values())
+    return {**counts, 'local_fraction': round(counts['local'] / total, 3) if total else 0.0}
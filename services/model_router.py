@@ -0,0 +1,138 @@
+"""Model routing for AI replies: which model and output budget per (kind, style).
+
+A one-sentence `ultra_brief` reply does not need the same model or a
+1024-token budget as a structured study answer. ROUTES maps
+`kind:style` to a tier; a tier names the model for each provider and its
+output budget (dicts with gemini, groq, openai, max_tokens, temperature,
+thinking_budget):
+
+    brief     mental ultra_brief      small/fast models, 160 tokens
+    standard  mental concise          small/fast models, 400 tokens
+    deep      structured, study       full models, 1024 tokens
+    analysis  study file analysis     full model, 4096 tokens
+
+Lookups fall back from `kind:style` to `kind:*` to `*:*`. Both tables can
+be overridden with MODEL_ROUTING, a JSON object merged over the defaults:
+
+    MODEL_ROUTING='{"routes": {"mental:concise": "brief"},
+                    "tiers": {"deep": {"gemini": "models/gemini-2.5-pro"}}}'
+
+`record` keeps per-tier, per-provider call counts, latency and token usage
+(prompt, output, and prompt tokens served from a context cache)
+for this process; `stats()` is reported on /health.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Gemini 2.5 thinking tokens count against max_tokens: thinking_budget 0 turns
+# thinking off, None keeps the model default
+TIERS: Dict[str, Dict[str, Any]] = {
+    'brief': {'gemini': 'models/gemini-2.5-flash-lite', 'groq': 'llama-3.1-8b-instant', 'openai': 'gpt-4o-mini',
+              'max_tokens': 160, 'temperature': 0.7, 'thinking_budget': 0},
+    'standard': {'gemini': 'models/gemini-2.5-flash-lite', 'groq': 'llama-3.1-8b-instant', 'openai': 'gpt-4o-mini',
+                 'max_tokens': 400, 'temperature': 0.7, 'thinking_budget': 0},
+    'deep': {'gemini': 'models/gemini-2.5-flash', 'groq': 'llama-3.3-70b-versatile', 'openai': 'gpt-4o-mini',
+             'max_tokens': 1024, 'temperature': 0.7, 'thinking_budget': None},
+    'analysis': {'gemini': 'models/gemini-2.5-flash', 'groq': 'llama-3.3-70b-versatile', 'openai': 'gpt-4o-mini',
+                 'max_tokens': 4096, 'temperature': 0.7, 'thinking_budget': None},
+}
+
+ROUTES: Dict[str, str] = {
+    'mental:ultra_brief': 'brief',
+    'mental:concise': 'standard',
+    'mental:structured': 'deep',
+    'study:*': 'deep',
+    'study:analysis': 'analysis',
+    '*:*': 'standard',
+}
+
+LATENCY_SAMPLES = 200  # per tier/provider, for the p95
+
+_tiers: Optional[Dict[str, Dict[str, Any]]] = None
+_routes: Optional[Dict[str, str]] = None
+_load_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats: Dict[tuple, Dict[str, Any]] = {}
+
+
+def _load() -> None:
+    global _tiers, _routes
+    tiers = {name: dict(tier, name=name) for name, tier in TIERS.items()}
+    routes = dict(ROUTES)
+    # OPENAI_MODEL predates the routing table and still applies to every tier
+    if os.getenv('OPENAI_MODEL'):
+        for tier in tiers.values():
+            tier['openai'] = os.getenv('OPENAI_MODEL')
+    raw = Config.MODEL_ROUTING.strip()
+    if raw:
+        try:
+            override = json.loads(raw)
+            for name, fields in (override.get('tiers') or {}).items():
+                tiers[name] = {**tiers.get(name, tiers['standard']), **fields, 'name': name}
+            routes.update(override.get('routes') or {})
+        except (ValueError, TypeError, AttributeError) as exc:
+            logger.error(f"MODEL_ROUTING ignored, invalid: {exc}")
+            tiers = {name: dict(tier, name=name) for name, tier in TIERS.items()}
+            routes = dict(ROUTES)
+    unknown = {r for r in routes.values() if r not in tiers}
+    if unknown:
+        logger.error(f"MODEL_ROUTING routes to unknown tiers {sorted(unknown)}; using 'standard' for them")
+        routes = {k: (v if v in tiers else 'standard') for k, v in routes.items()}
+    _tiers, _routes = tiers, routes
+
+
+def route(kind: str, style: str) -> Dict[str, Any]:
+    """The tier for a reply of this kind and style."""
+    if _tiers is None:
+        with _load_lock:
+            if _tiers is None:
+                _load()
+    for key in (f'{kind}:{style}', f'{kind}:*', '*:*'):
+        if key in _routes:
+            return _tiers[_routes[key]]
+    return _tiers['standard']
+
+
+def record(tier: Dict[str, Any], provider: str, latency_ms: float, prompt_tokens: Optional[int] = None,
+           output_tokens: Optional[int] = None, cached_tokens: Optional[int] = None, ok: bool = True) -> None:
+    """Count one provider call for `tier`."""
+    with _stats_lock:
+        s = _stats.get((tier['name'], provider))
+        if s is None:
+            s = _stats[(tier['name'], provider)] = {'calls': 0, 'errors': 0, 'latency_ms_total': 0.0,
+                                                 'latencies': deque(maxlen=LATENCY_SAMPLES),
+                                                 'prompt_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0}
+        s['calls'] += 1
+        if not ok:
+            s['errors'] += 1
+        s['latency_ms_total'] += latency_ms
+        s['latencies'].append(latency_ms)
+        s['prompt_tokens'] += prompt_tokens or 0
+        s['output_tokens'] += output_tokens or 0
+        s['cached_tokens'] += cached_tokens or 0
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """{tier: {provider: {calls, errors, avg/p95 latency, avg tokens}}}."""
+    out: Dict[str, Dict[str, Any]] = {}
+    with _stats_lock:
+        items = [(k, dict(v, latencies=sorted(v['latencies']))) for k, v in _stats.items()]
+    for (tier, provider), s in items:
+        calls, lat = s['calls'], s['latencies']
+        out.setdefault(tier, {})[provider] = {
+            'calls': calls,
+            'errors': s['errors'],
+            'avg_latency_ms': round(s['latency_ms_total'] / calls, 1),
+            'p95_latency_ms': round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 1),
+            'avg_prompt_tokens': round(s['prompt_tokens'] / calls, 1),
+            'avg_output_tokens': round(s['output_tokens'] / calls, 1),
+            'avg_cached_tokens': round(s['cached_tokens'] / calls, 1),
+        }
+    return out
@@ -0,0 +1,207 @@
+"""Apply a batch of offline-queued quick actions and mood check-ins.
+
+The client queues events while offline and posts them in one request:
+
+    {"events": [
+        {"key": "<uuid>", "kind": "quick_action", "action": "breathing", "ts": 1718000000000},
+        {"key": "<uuid>", "kind": "mood", "mood": "calm", "intensity": 4, "ts": "2024-06-10T08:00:00Z"}
+    ]}
+
+Each event carries a client-generated idempotency key. Keys are claimed in
+`sync_receipts` (unique per user) before anything is written, so a batch that
+is retried, or flushed from two tabs at once, is applied exactly once; a
+replayed key gets the stored result back with status `duplicate`.
+
+Events are applied in array order: quick actions chain from the student's
+latest stored stress score, as they would have online. Readings keep the
+client's timestamp. Writes cost a fixed number of round-trips per batch: one
+insert per collection, one student_state update and one wellness cube
+bulk_write, however many events the batch holds.
+
+A receipt stays `pending` until its batch is written. If a request dies in
+between, the key is re-applied by the next retry after CLAIM_LEASE.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument, UpdateOne, errors
+from config import Config
+from models.mood import MoodModel
+from models.stress import StressModel
+from models.sync_receipt import SyncReceiptModel
+from services.anomaly import alert_reason
+from services.stress_service import quick_action_message, relieved_score
+from services.student_state import touch_student_batch
+from services.wellness_cube import record_readings
+from utils.alerts import send_institutional_alert
+
+CLAIM_LEASE = timedelta(minutes=2)
+MAX_KEY_LENGTH = 64
+DEFAULT_STRESS = 50
+
+
+def _parse_ts(value: Any, now: datetime) -> datetime:
+    if value is None:
+        return now
+    if isinstance(value, (int, float)):
+        at = datetime.utcfromtimestamp(value / 1000.0)  # JS Date.now()
+    elif isinstance(value, str):
+        try:
+            at = datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            raise ValueError('ts must be epoch milliseconds or ISO-8601')
+    else:
+        raise ValueError('ts must be epoch milliseconds or ISO-8601')
+    if at < now - timedelta(days=Config.SYNC_MAX_AGE_DAYS):
+        raise ValueError(f'event is older than {Config.SYNC_MAX_AGE_DAYS} days')
+    return min(at, now)  # device clocks run fast
+
+
+def parse_event(raw: Any, now: datetime) -> Dict[str, Any]:
+    """Normalise one client event; raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError('event must be an object')
+    key = raw.get('key')
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f'key must be a string of 1-{MAX_KEY_LENGTH} characters')
+    kind = raw.get('kind')
+    event = {'key': key, 'kind': kind, 'at': _parse_ts(raw.get('ts'), now)}
+    if kind == 'quick_action':
+        action = str(raw.get('action') or '').lower()
+        if not action:
+            raise ValueError('quick_action needs an action')
+        event['action'] = action
+    elif kind == 'mood':
+        event['mood'] = str(raw.get('mood') or '').lower()
+        event['intensity'] = raw.get('intensity', 5)
+        MoodModel.validate(event)
+        if not event['mood']:
+            raise ValueError('mood check-in needs a mood')
+    else:
+        raise ValueError('kind must be one of ' + '|'.join(SyncReceiptModel.KINDS))
+    return event
+
+
+def _claim(db, user_email: str, events: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """Insert pending receipts; returns the events this request now owns."""
+    if not events:
+        return []
+    coll = db[SyncReceiptModel.collection_name]
+    docs = [{'user_email': user_email, 'key': e['key'], 'kind': e['kind'], 'client_ts': e['at'],
+             'status': 'pending', 'created_at': now} for e in events]
+    try:
+        coll.insert_many(docs, ordered=False)
+        return events
+    except errors.BulkWriteError as exc:
+        # Another request claimed some keys between our lookup and this insert
+        errs = exc.details.get('writeErrors', [])
+        hard = [e for e in errs if e.get('code') != 11000]
+        if hard:
+            raise
+        lost = {e['index'] for e in errs}
+        return [e for i, e in enumerate(events) if i not in lost]
+
+
+def _reclaim(db, user_email: str, key: str, now: datetime) -> bool:
+    """Take over a receipt whose batch never finished; True if this request owns it now."""
+    doc = db[SyncReceiptModel.collection_name].find_one_and_update(
+        {'user_email': user_email, 'key': key, 'status': 'pending', 'created_at': {'$lt': now - CLAIM_LEASE}},
+        {'$set': {'created_at': now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc is not None
+
+
+def apply_batch(db, user_email: str, raw_events: List[Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Apply events in order; returns per-event results plus the latest stress score."""
+    now = now or datetime.utcnow()
+    results: List[Dict[str, Any]] = [{} for _ in raw_events]
+    parsed: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    for i, raw in enumerate(raw_events):
+        try:
+            event = parse_event(raw, now)
+        except ValueError as e:
+            key = raw.get('key') if isinstance(raw, dict) else None
+            results[i] = {'key': key, 'status': 'rejected', 'error': str(e)}
+            continue
+        if event['key'] in seen:
+            results[i] = {'key': event['key'], 'status': 'duplicate', 'same_as': seen[event['key']]}
+            continue
+        seen[event['key']] = i
+        event['index'] = i
+        parsed.append(event)
+
+    # Keys applied by an earlier request are answered from their receipts
+    receipts = {r['key']: r for r in db[SyncReceiptModel.collection_name].find(
+        {'user_email': user_email, 'key': {'$in': [e['key'] for e in parsed]}})}
+    fresh = []
+    for e in parsed:
+        r = receipts.get(e['key'])
+        if r is None:
+            fresh.append(e)
+        elif r.get('status') == 'pending' and _reclaim(db, user_email, e['key'], now):
+            e['reclaimed'] = True
+            fresh.append(e)
+        else:
+            results[e['index']] = {'key': e['key'], 'status': 'duplicate', 'result': r.get('result')}
+    owned = _claim(db, user_email, [e for e in fresh if not e.get('reclaimed')], now)
+    owned += [e for e in fresh if e.get('reclaimed')]
+    owned.sort(key=lambda e: e['index'])
+    owned_keys = {e['key'] for e in owned}
+    for e in fresh:
+        if e['key'] not in owned_keys:
+            results[e['index']] = {'key': e['key'], 'status': 'duplicate', 'result': None}
+
+    stress_score = _apply(db, user_email, owned, results)
+    return {
+        'results': results,
+        'applied': sum(1 for r in results if r.get('status') == 'applied'),
+        'duplicates': sum(1 for r in results if r.get('status') == 'duplicate'),
+        'rejected': sum(1 for r in results if r.get('status') == 'rejected'),
+        'stress_score': stress_score,
+    }
+
+
+def _apply(db, user_email: str, events: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Optional[int]:
+    if not events:
+        return None
+    stress_docs, mood_docs = [], []
+    score = None
+    if any(e['kind'] == 'quick_action' for e in events):
+        latest = db[StressModel.collection_name].find_one(
+            {'user_email': user_email}, {'score': 1}, sort=[('created_at', -1)])
+        score = latest['score'] if latest else DEFAULT_STRESS
+
+    for e in events:
+        if e['kind'] == 'quick_action':
+            score = relieved_score(score, e['action'])
+            stress_docs.append({'user_email': user_email, 'score': score,
+                                'source': f"quick_action:{e['action']}", 'created_at': e['at']})
+            result = {'message': quick_action_message(e['action']), 'stress_score': score}
+        else:
+            mood_docs.append({'user_email': user_email, 'mood': e['mood'], 'intensity': e['intensity'],
+                              'created_at': e['at']})
+            result = {'mood': e['mood']}
+        results[e['index']] = {'key': e['key'], 'status': 'applied', 'result': result}
+
+    if stress_docs:
+        db[StressModel.collection_name].insert_many(stress_docs)
+    if mood_docs:
+        db[MoodModel.collection_name].insert_many(mood_docs)
+
+    # Derived state once for the whole batch
+    readings = sorted(({'score': d['score'], 'at': d['created_at']} for d in stress_docs), key=lambda r: r['at'])
+    mood_at = max((d['created_at'] for d in mood_docs), default=None)
+    state = touch_student_batch(db, user_email, readings, mood_at=mood_at)
+    if stress_docs:
+        record_readings(db, stress_docs, {user_email: state})
+        reason = alert_reason(score, bool(state.get('last_anomaly')), check_ceiling=False)
+        if reason:
+            send_institutional_alert(user_email, score, reason=reason)
+
+    db[SyncReceiptModel.collection_name].bulk_write([
+        UpdateOne({'user_email': user_email, 'key': e['key']},
+                  {'$set': {'status': 'applied', 'result': results[e['index']]['result']}})
+        for e in events
+    ], ordered=False)
+    return score
@@ -0,0 +1,219 @@
+"""Retention for collections that would otherwise grow forever.
+
+Each policy either archives or expires a collection:
+
+* archive: documents older than N days are appended to a compressed NDJSON
+  file per month (`<RETENTION_ARCHIVE_DIR>/<collection>/<YYYY-MM>.ndjson.gz`
+  or `.zst`) and then deleted, so the working set stays the recent window.
+* ttl: a TTL index lets MongoDB delete old operational records itself.
+  Collections with a model declare their TTL index in `index_specs()`
+  instead (feedback_events, sync_receipts), so it is built with the others.
+
+    python -m services.retention run [--dry-run]
+    python -m services.retention restore --collection chats [--month 2025-01]
+
+Documents are written in canonical Extended JSON, so ObjectIds, dates and
+number types survive a restore. Each batch is flushed to disk before its
+documents are deleted; a crash in between can only leave a duplicate in the
+archive, which restore skips. Restored documents older than the window are
+archived again on the next run.
+
+Deleting from a time-series collection by time needs MongoDB 7.0; on older
+servers set `expireAfterSeconds` on the collection instead (collMod).
+"""
+import argparse
+import gzip
+import io
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from pymongo import errors
+from config import Config
+from models import AlertModel, ChatModel, MoodModel, StressModel
+from utils.database import ensure_index, is_timeseries
+
+# Optional zstd compression
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+
+
+def policies() -> Dict[str, Dict[str, Any]]:
+    """Per-collection retention, read from Config at call time."""
+    return {
+        ChatModel.collection_name: {'archive_days': Config.RETENTION_CHATS_DAYS, 'time_field': 'created_at'},
+        StressModel.collection_name: {'archive_days': Config.RETENTION_READINGS_DAYS, 'time_field': 'created_at'},
+        MoodModel.collection_name: {'archive_days': Config.RETENTION_READINGS_DAYS, 'time_field': 'created_at'},
+        AlertModel.collection_name: {
+            'archive_days': Config.RETENTION_ALERTS_DAYS,
+            'time_field': 'created_at',
+            # Never archive alerts that are still waiting to be delivered
+            'filter': {'status': {'$in': ['sent', 'logged', 'failed']}},
+        },
+        'batch_jobs': {'ttl_days': Config.RETENTION_JOBS_DAYS, 'time_field': 'started_at'},
+    }
+
+
+def _extension() -> str:
+    if Config.RETENTION_COMPRESSION == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('RETENTION_COMPRESSION=zstd needs the zstandard package')
+        return '.ndjson.zst'
+    return '.ndjson.gz'
+
+
+def archive_path(collection: str, month: str, ext: Optional[str] = None) -> str:
+    return os.path.join(Config.RETENTION_ARCHIVE_DIR, collection, f"{month}{ext or _extension()}")
+
+
+def _append(path: str, docs: List[Dict[str, Any]]) -> None:
+    """Append one compressed member/frame; concatenated members read back as one stream."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = ''.join(json_util.dumps(d, json_options=CANONICAL_JSON_OPTIONS) + '\n' for d in docs).encode('utf-8')
+    with open(path, 'ab') as raw:
+        if path.endswith('.zst'):
+            raw.write(zstandard.ZstdCompressor(level=10).compress(payload))
+        else:
+            raw.write(gzip.compress(payload, compresslevel=6))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _read(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'rb') as raw:
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f'{path} is zstd-compressed; install the zstandard package')
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = gzip.GzipFile(fileobj=raw)
+        for line in io.TextIOWrapper(stream, encoding='utf-8'):
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def _months(start: datetime, end: datetime) -> Iterator[datetime]:
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        yield month
+        month = _next_month(month)
+
+
+def archive_collection(db, name: str, policy: Dict[str, Any], now: datetime, dry_run: bool = False) -> int:
+    """Move documents older than the policy window into monthly archive files."""
+    field = policy['time_field']
+    cutoff = now - timedelta(days=policy['archive_days'])
+    base = {**policy.get('filter', {}), field: {'$lt': cutoff}}
+    coll = db[name]
+    oldest = coll.find_one(base, {field: 1}, sort=[(field, 1)])
+    if not oldest:
+        return 0
+
+    moved = 0
+    for month in _months(oldest[field], cutoff):
+        query = {**policy.get('filter', {}), field: {'$gte': month, '$lt': min(_next_month(month), cutoff)}}
+        if dry_run:
+            moved += coll.count_documents(query)
+            continue
+        path = archive_path(name, month.strftime('%Y-%m'))
+        while True:
+            batch = list(coll.find(query).sort(field, 1).limit(BATCH_SIZE))
+            if not batch:
+                break
+            _append(path, batch)
+            coll.delete_many({'_id': {'$in': [d['_id'] for d in batch]}})
+            moved += len(batch)
+        logger.info(f"{name}: archived through {month:%Y-%m} ({moved} so far)")
+    return moved
+
+
+def ensure_ttl(db, name: str, policy: Dict[str, Any]) -> None:
+    ensure_index(db[name], policy['time_field'], {'expireAfterSeconds': int(policy['ttl_days'] * 86400)})
+
+
+def run(db, dry_run: bool = False, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Apply every policy once; returns documents archived (or due, with dry_run) per collection."""
+    now = now or datetime.utcnow()
+    result = {}
+    for name, policy in policies().items():
+        if policy.get('ttl_days'):
+            if not dry_run:
+                ensure_ttl(db, name, policy)
+        elif policy.get('archive_days'):
+            try:
+                result[name] = archive_collection(db, name, policy, now, dry_run=dry_run)
+            except errors.OperationFailure as exc:
+                if not is_timeseries(db, name):
+                    raise
+                logger.warning(f"{name}: time-series delete by time needs MongoDB 7.0+ "
+                               f"(use collMod expireAfterSeconds instead): {exc}")
+    return result
+
+
+def restore(db, name: str, month: Optional[str] = None) -> int:
+    """Load archived documents back into `name`, skipping ones already present."""
+    folder = os.path.join(Config.RETENTION_ARCHIVE_DIR, name)
+    if not os.path.isdir(folder):
+        return 0
+    files = sorted(f for f in os.listdir(folder) if f.endswith(('.ndjson.gz', '.ndjson.zst'))
+                   and (month is None or f.startswith(month)))
+    coll = db[name]
+    restored = 0
+    for filename in files:
+        batch = []
+        for doc in _read(os.path.join(folder, filename)):
+            batch.append(doc)
+            if len(batch) >= BATCH_SIZE:
+                restored += _insert_new(coll, batch)
+                batch = []
+        if batch:
+            restored += _insert_new(coll, batch)
+        logger.info(f"{name}: restored {filename}")
+    return restored
+
+
+def _insert_new(coll, docs: List[Dict[str, Any]]) -> int:
+    # Checked explicitly rather than via duplicate-key errors: time-series
+    # collections do not enforce _id uniqueness.
+    present = {d['_id'] for d in coll.find({'_id': {'$in': [d['_id'] for d in docs]}}, {'_id': 1})}
+    fresh = list({d['_id']: d for d in docs if d['_id'] not in present}.values())
+    if fresh:
+        coll.insert_many(fresh, ordered=False)
+    return len(fresh)
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Archive or expire old data.')
+    parser.add_argument('command', choices=['run', 'restore'])
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--collection', default=None)
+    parser.add_argument('--month', default=None, help='YYYY-MM, restore a single month')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db = get_db()
+    if args.command == 'run':
+        for name, count in run(db, dry_run=args.dry_run).items():
+            print(f"{name}: {count} {'due for archive' if args.dry_run else 'archived'}")
+    else:
+        if not args.collection:
+            parser.error('restore needs --collection')
+        print(f"{args.collection}: {restore(db, args.collection, args.month)} restored")
+
+
+if __name__ == '__main__':
+    main()
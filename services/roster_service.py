@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from models.mood import MoodModel
+from models.stress import StressModel
+
+SORT_FIELDS = {
+    'name': 'name',
+    'avg_stress': 'avg_stress',
+    'email': 'email',
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+TREND_DAYS = 7
+
+
+def roster_pipeline(proctor_email: str, sort: str = 'name', order: str = 'asc', skip: int = 0,
+                    limit: int = DEFAULT_PAGE_SIZE, emails: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Build the proctor roster (latest mood + 7-day stress trend) as one aggregation on `users`.
+
+    Both per-student lookups run server-side as `$lookup` sub-pipelines, so the
+    cost is one round-trip regardless of roster size. Sorting and pagination
+    happen after the trend is computed so `avg_stress` ordering is global.
+    """
+    since = datetime.utcnow() - timedelta(days=TREND_DAYS)
+    match: Dict[str, Any] = {'role': 'student', 'proctor_email': proctor_email}
+    if emails is not None:
+        match['email'] = {'$in': list(emails)}
+
+    direction = -1 if order == 'desc' else 1
+    sort_field = SORT_FIELDS.get(sort, 'name')
+    sort_spec = {sort_field: direction}
+    if sort_field != 'email':
+        sort_spec['email'] = 1  # stable tie-breaker across pages
+
+    return [
+        {'$match': match},
+        {'$project': {'_id': 0, 'email': 1, 'name': {'$ifNull': ['$name', 'Unknown']}}},
+        {'$lookup': {
+            'from': MoodModel.collection_name,
+            'let': {'email': '$email'},
+            'pipeline': [
+                {'$match': {'$expr': {'$eq': ['$user_email', '$$email']}}},
+                {'$sort': {'created_at': -1}},
+                {'$limit': 1},
+                {'$project': {'_id': 0, 'mood': 1}},
+            ],
+            'as': 'latest_mood',
+        }},
+        {'$lookup': {
+            'from': StressModel.collection_name,
+            'let': {'email': '$email'},
+            'pipeline': [
+                {'$match': {'$expr': {'$and': [
+                    {'$eq': ['$user_email', '$$email']},
+                    {'$gte': ['$created_at', since]},
+                ]}}},
+                {'$sort': {'created_at': 1}},
+                {'$project': {'_id': 0, 'score': 1}},
+            ],
+            'as': 'stress_records',
+        }},
+        {'$addFields': {
+            'mood': {'$ifNull': [{'$arrayElemAt': ['$latest_mood.mood', 0]}, 'normal']},
+            'trend': {'$cond': [
+                {'$gt': [{'$size': '$stress_records'}, 0]},
+                {'$map': {'input': '$stress_records', 'as': 'r', 'in': {'$ifNull': ['$$r.score', 50]}}},
+                [50],
+            ]},
+        }},
+        {'$addFields': {'avg_stress': {'$toInt': {'$floor': {'$avg': '$trend'}}}}},
+        {'$project': {'latest_mood': 0, 'stress_records': 0}},
+        {'$facet': {
+            'students': [{'$sort': sort_spec}, {'$skip': max(0, skip)}, {'$limit': max(1, limit)}],
+            'total': [{'$count': 'n'}],
+        }},
+    ]
+
+
+def fetch_roster(db, proctor_email: str, sort: str = 'name', order: str = 'asc', page: int = 1,
+                 page_size: int = DEFAULT_PAGE_SIZE, emails: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Run the roster pipeline and return `{'students', 'total', 'page', 'page_size'}`."""
+    page = max(1, page)
+    page_size = max(1, min(MAX_PAGE_SIZE, page_size))
+    pipeline = roster_pipeline(proctor_email, sort=sort, order=order,
+                               skip=(page - 1) * page_size, limit=page_size, emails=emails)
+    rows = list(db['users'].aggregate(pipeline))
+    facet = rows[0] if rows else {'students': [], 'total': []}
+    total = facet['total'][0]['n'] if facet.get('total') else 0
+    return {
+        'students': facet.get('students', []),
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+    }
@@ -0,0 +1,153 @@
+"""Single stress scoring engine shared by every code path.
+
+score = w_mood * mood_score + w_sentiment * mean(sentiment_scores) + w_activity * activity_score
+
+`score_batch` works on integer-coded arrays and is vectorized with NumPy when
+it is installed (pure Python otherwise). `score_one` is the scalar wrapper used
+by request handlers; both produce identical results
+(see scripts/bench_scoring.py for a throughput comparison).
+"""
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+from config import Config
+
+# Optional NumPy acceleration
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MOOD_CODES = ('happy', 'calm', 'normal', 'sad', 'anxious', 'stressed', 'angry')
+MOOD_SCORES = (20, 30, 40, 65, 70, 75, 80)
+SENTIMENT_CODES = ('positive', 'neutral', 'negative', 'anxious')
+SENTIMENT_SCORES = (30, 50, 75, 85)
+
+UNKNOWN = -1  # unknown mood / missing sentiment slot
+UNKNOWN_MOOD_SCORE = 50
+NO_SENTIMENT_SCORE = 50
+DEFAULT_ACTIVITY = 5
+
+MOOD_BASELINE = dict(zip(MOOD_CODES, MOOD_SCORES))
+SENTIMENT_SCORE = dict(zip(SENTIMENT_CODES, SENTIMENT_SCORES))
+
+# Named weight profiles. 'daily' is the daily aggregate (mood + chat sentiment);
+# 'activity' also accounts for self-reported activity level (0-10).
+WEIGHT_PROFILES: Dict[str, Dict[str, float]] = {
+    'daily': {'mood': 0.6, 'sentiment': 0.4, 'activity': 0.0},
+    'activity': {'mood': 0.4, 'sentiment': 0.3, 'activity': 0.3},
+}
+
+
+def _load_overrides() -> None:
+    """Apply Config.STRESS_WEIGHTS, e.g. {"daily": {"mood": 0.5, "sentiment": 0.5}}."""
+    raw = Config.STRESS_WEIGHTS.strip()
+    if not raw:
+        return
+    try:
+        profiles = {}
+        for name, fields in json.loads(raw).items():
+            if name not in WEIGHT_PROFILES:
+                raise ValueError(f"unknown profile {name!r}")
+            unknown = set(fields) - set(WEIGHT_PROFILES[name])
+            if unknown:
+                raise ValueError(f"unknown weights {sorted(unknown)} for {name!r}")
+            weights = {**WEIGHT_PROFILES[name], **{k: float(v) for k, v in fields.items()}}
+            if any(v < 0 for v in weights.values()) or not sum(weights.values()):
+                raise ValueError(f"weights for {name!r} must be non-negative and not all zero")
+            profiles[name] = weights
+    except (ValueError, TypeError, AttributeError) as exc:
+        logger.error(f"STRESS_WEIGHTS ignored, invalid: {exc}")
+        return
+    WEIGHT_PROFILES.update(profiles)
+
+
+_load_overrides()
+
+
+def resolve_weights(weights=None) -> Dict[str, float]:
+    if weights is None:
+        return WEIGHT_PROFILES['daily']
+    if isinstance(weights, str):
+        return WEIGHT_PROFILES[weights]
+    return {'mood': 0.0, 'sentiment': 0.0, 'activity': 0.0, **weights}
+
+
+def encode_moods(moods: Sequence[Optional[str]]) -> List[int]:
+    index = {m: i for i, m in enumerate(MOOD_CODES)}
+    return [index.get(m, UNKNOWN) for m in moods]
+
+
+def encode_sentiments(rows: Sequence[Sequence[Optional[str]]], width: int = 5) -> List[List[int]]:
+    """Encode per-student sentiment lists into a fixed-width, UNKNOWN-padded matrix."""
+    index = {s: i for i, s in enumerate(SENTIMENT_CODES)}
+    out = []
+    for row in rows:
+        codes = [index.get(s or 'neutral', index['neutral']) for s in list(row)[:width]]
+        out.append(codes + [UNKNOWN] * (width - len(codes)))
+    return out
+
+
+def score_batch(mood_codes, sentiment_codes, activity_levels=None, weights=None):
+    """Score many students at once.
+
+    mood_codes: shape (n,) ints into MOOD_CODES, UNKNOWN for unknown moods.
+    sentiment_codes: shape (n, k) ints into SENTIMENT_CODES, UNKNOWN-padded.
+    activity_levels: shape (n,) 0-10 (higher = healthier); defaults to 5.
+    Returns an int array (or list without NumPy) of 0-100 scores.
+    """
+    w = resolve_weights(weights)
+    if np is None:
+        return _score_batch_python(mood_codes, sentiment_codes, activity_levels, w)
+
+    moods = np.asarray(mood_codes, dtype=np.int16)
+    n = moods.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.int16)
+    mood_lut = np.asarray(MOOD_SCORES + (UNKNOWN_MOOD_SCORE,), dtype=np.float64)
+    mood_score = mood_lut[np.where(moods < 0, len(MOOD_SCORES), moods)]
+
+    sent = np.asarray(sentiment_codes, dtype=np.int16).reshape(n, -1)
+    sent_lut = np.asarray(SENTIMENT_SCORES + (0,), dtype=np.float64)
+    present = sent >= 0
+    counts = present.sum(axis=1)
+    totals = sent_lut[np.where(present, sent, len(SENTIMENT_SCORES))].sum(axis=1)
+    sentiment_score = np.where(counts > 0, np.rint(totals / np.maximum(counts, 1)), NO_SENTIMENT_SCORE)
+
+    if activity_levels is None:
+        activity = np.full(n, DEFAULT_ACTIVITY, dtype=np.float64)
+    else:
+        activity = np.clip(np.asarray(activity_levels, dtype=np.float64), 0, 10)
+    activity_score = 100 - activity * 10
+
+    raw = w['mood'] * mood_score + w['sentiment'] * sentiment_score + w['activity'] * activity_score
+    return np.clip(np.rint(raw), 0, 100).astype(np.int16)
+
+
+def _score_batch_python(mood_codes, sentiment_codes, activity_levels, w) -> List[int]:
+    scores = []
+    for i, code in enumerate(mood_codes):
+        mood_score = MOOD_SCORES[code] if 0 <= code < len(MOOD_SCORES) else UNKNOWN_MOOD_SCORE
+        present = [SENTIMENT_SCORES[c] for c in sentiment_codes[i] if c >= 0]
+        sentiment_score = int(round(sum(present) / len(present))) if present else NO_SENTIMENT_SCORE
+        level = DEFAULT_ACTIVITY if activity_levels is None else max(0, min(10, activity_levels[i]))
+        activity_score = 100 - level * 10
+        raw = w['mood'] * mood_score + w['sentiment'] * sentiment_score + w['activity'] * activity_score
+        scores.append(max(0, min(100, int(round(raw)))))
+    return scores
+
+
+def score_one(mood: Optional[str], sentiments: Sequence[Optional[str]] = (),
+              activity_level: Optional[int] = None, weights=None) -> int:
+    """Scalar wrapper over the batch engine for a single student.
+
+    Runs the pure-Python kernel directly: for one row, NumPy array setup costs
+    more than the arithmetic it would save.
+    """
+    sentiments = list(sentiments or [])
+    moods = encode_moods([mood])
+    sent = encode_sentiments([sentiments], width=max(1, len(sentiments)))
+    activity = None if activity_level is None else [activity_level]
+    return int(_score_batch_python(moods, sent, activity, resolve_weights(weights))[0])
@@ -0,0 +1,215 @@
+"""Approximate response cache for first-turn mental-wellness messages.
+
+Many openers are paraphrases ("so stressed about exams", "exam stress is
+killing me") that an exact-match cache misses. Messages are embedded as
+hashed n-gram vectors (word unigrams and bigrams plus character 3-5 grams,
+signed feature hashing into DIM buckets, L2-normalised), so no model or
+network call is needed. The nearest stored message by cosine similarity is
+a hit when it reaches SEMANTIC_CACHE_THRESHOLD, was answered in the same
+reply style, and agrees on negation ("I'm not stressed" never matches
+"I'm stressed").
+
+Only first turns are looked up or stored: the first message of a
+conversation (by conversation_id; without one, a student's first message
+ever). Crisis messages never are, and only replies from a model are stored. Messages that may carry personal details
+(digits, @, capitalised names mid-sentence) are not cached, and a hit needs
+the same capitalised words at sentence starts ("Rahul broke up with me"
+never matches "Priya broke up with me"), so one student's reply is never
+reused with another student's details in it.
+
+The index is in memory, per process: at most SEMANTIC_CACHE_MAX_ENTRIES,
+least recently used evicted first, entries dropped after
+SEMANTIC_CACHE_TTL_SECONDS. NumPy makes a lookup one matrix-vector product;
+without it a sparse pure-Python scan is used. See
+scripts/bench_semantic_cache.py for hit rate and lookup cost on the stored
+chats.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+# Optional NumPy acceleration
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIM = 1024
+MAX_WORDS = 30
+
+_WORD = re.compile(r"[a-z']+")
+_NEGATIONS = {'not', 'no', 'never', "don't", 'dont', "can't", 'cant', 'cannot', "isn't", 'isnt', "won't",
+              'wont', "didn't", 'didnt', "doesn't", 'doesnt', 'nothing', 'nobody', 'without'}
+_PRIVATE = re.compile(r"[\d@]|(?<=[a-z,;] )(?!I\b|I')[A-Z][a-z]+")
+_CAPITALISED = re.compile(r"(^|[.!?]\s*)?\b([A-Z][A-Za-z']*)")
+# Words that start a sentence without being a name
+_OPENERS = {'hi', 'hey', 'hello', 'why', 'how', 'what', 'when', 'where', 'who', 'can', 'could', 'should',
+            'would', 'will', 'do', 'does', 'did', 'today', 'tonight', 'lately', 'recently', 'everything',
+            'everyone', 'nothing', 'nobody', 'exams', 'exam', 'school', 'college', 'work', 'life', 'help',
+            'please', 'sometimes', 'honestly', 'yesterday', 'this', 'that', 'there', 'we', 'you', 'been',
+            'ok', 'okay', 'thanks', 'sorry', 'but', 'if', 'all', 'still', 'ive', 'ill', 'id'}
+_STOP = {'i', 'im', 'am', 'is', 'are', 'a', 'an', 'the', 'so', 'really', 'very', 'me', 'my', 'it', 'to',
+         'and', 'of', 'just', 'about', 'feel', 'feeling', 'like', 'be'}
+
+
+def _stem(word: str) -> str:
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix) and not word.endswith('ss'):
+            return word[:-len(suffix)]
+    return word
+
+
+def features(message: str) -> Dict[int, float]:
+    """Sparse signed feature-hash vector of `message`, L2-normalised."""
+    words = [w.replace("'", '') for w in _WORD.findall((message or '').lower())]
+    content = [_stem(w) for w in words if w and w not in _STOP]
+    grams: List[str] = [f'w:{w}' for w in content]
+    grams += [f'b:{a}_{b}' for a, b in zip(content, content[1:])]
+    for w in content:
+        padded = f'<{w}>'
+        for n in (3, 4, 5):
+            grams += [f'c:{padded[i:i + n]}' for i in range(len(padded) - n + 1)]
+    vec: Dict[int, float] = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode('utf-8'))
+        weight = 2.0 if gram[0] == 'w' else 1.0
+        bucket = h % DIM
+        vec[bucket] = vec.get(bucket, 0.0) + (weight if h & 0x80000000 else -weight)
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items() if v} if norm else {}
+
+
+def _negated(message: str) -> bool:
+    words = set(_WORD.findall((message or '').lower()))
+    return bool(words & _NEGATIONS)
+
+
+def _names(message: str) -> frozenset:
+    """Capitalised words that may be names; a sentence-initial one unless it is a common word."""
+    names = set()
+    for m in _CAPITALISED.finditer(message or ''):
+        word = m.group(2)
+        bare = word.lower().replace("'", '')
+        if word == 'I' or word.startswith("I'"):
+            continue
+        if m.group(1) is not None and (bare in _STOP or bare in _NEGATIONS or bare in _OPENERS):
+            continue
+        names.add(word)
+    return frozenset(names)
+
+
+def cacheable(message: str) -> bool:
+    """Short, with nothing that looks like a personal detail."""
+    words = (message or '').split()
+    return 0 < len(words) <= MAX_WORDS and not _PRIVATE.search(message)
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        # slot -> entry; LRU order is the OrderedDict order
+        self._entries: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._free = list(range(max_entries - 1, -1, -1))  # pops lowest first
+        self._high = 0  # slots >= this have never been used
+        self._matrix = np.zeros((max_entries, DIM), dtype=np.float32) if np is not None else None
+        self.counts = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0, 'expired': 0}
+
+    def _dense(self, vec: Dict[int, float]):
+        dense = np.zeros(DIM, dtype=np.float32)
+        if vec:
+            dense[list(vec)] = list(vec.values())
+        return dense
+
+    def _drop(self, slot: int) -> None:
+        self._entries.pop(slot)
+        if self._matrix is not None:
+            self._matrix[slot] = 0
+        self._free.append(slot)
+
+    def lookup(self, message: str, style: str) -> Optional[Tuple[str, float, str]]:
+        """(stored reply, similarity, stored message) of the nearest match, or None."""
+        vec = features(message)
+        if not vec:
+            return None
+        negated = _negated(message)
+        names = _names(message)
+        now = time.monotonic()
+        with self._lock:
+            if self._matrix is not None:
+                sims = self._matrix[:self._high] @ self._dense(vec)
+                top = np.argpartition(sims, -8)[-8:] if len(sims) > 8 else np.arange(len(sims))
+                scored = sorted(((int(s), float(sims[s])) for s in top if sims[s] >= self.threshold),
+                                key=lambda x: -x[1])
+            else:
+                scored = sorted(((slot, sum(v * e['vec'].get(k, 0.0) for k, v in vec.items()))
+                                 for slot, e in self._entries.items()), key=lambda x: -x[1])[:8]
+                scored = [(slot, sim) for slot, sim in scored if sim >= self.threshold]
+            for slot, sim in scored:
+                entry = self._entries.get(slot)
+                if entry is None:
+                    continue
+                if now - entry['stored_at'] > self.ttl:
+                    self._drop(slot)
+                    self.counts['expired'] += 1
+                    continue
+                if entry['style'] != style or entry['negated'] != negated or entry['names'] != names:
+                    continue
+                self._entries.move_to_end(slot)
+                entry['hits'] += 1
+                self.counts['hits'] += 1
+                return entry['reply'], sim, entry['message']
+            self.counts['misses'] += 1
+        return None
+
+    def store(self, message: str, style: str, reply: str) -> None:
+        vec = features(message)
+        if not vec or not reply:
+            return
+        with self._lock:
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.counts['evicted'] += 1
+            slot = self._free.pop()
+            self._high = max(self._high, slot + 1)
+            self._entries[slot] = {'message': message, 'style': style, 'reply': reply, 'negated': _negated(message),
+                                   'names': _names(message), 'vec': vec, 'stored_at': time.monotonic(), 'hits': 0}
+            if self._matrix is not None:
+                self._matrix[slot] = self._dense(vec)
+            self.counts['stored'] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self.counts)
+            size = len(self._entries)
+        looked_up = counts['hits'] + counts['misses']
+        return {**counts, 'entries': size, 'threshold': self.threshold,
+                'hit_rate': round(counts['hits'] / looked_up, 3) if looked_up else 0.0}
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SemanticCache]:
+    global _cache
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache(Config.SEMANTIC_CACHE_MAX_ENTRIES, Config.SEMANTIC_CACHE_THRESHOLD,
+                                   Config.SEMANTIC_CACHE_TTL_SECONDS)
+        return _cache
+
+
+def stats() -> Optional[Dict[str, float]]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
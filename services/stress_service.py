@@ -1,28 +1,76 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 from utils.database import get_db
 from models.mood import MoodModel
 from models.stress import StressModel
 from models.chat import ChatModel
 from utils.alerts import send_institutional_alert
+from services.student_state import touch_student
+from services.wellness_cube import record_reading
+from services.scoring import MOOD_BASELINE, SENTIMENT_SCORE, score_one
+from services.anomaly import alert_reason
 
 
-MOOD_BASELINE = {
-    'happy': 20,
-    'calm': 30,
-    'normal': 40,
-    'sad': 65,
-    'anxious': 70,
-    'stressed': 75,
-    'angry': 80,
+# Quick actions (breathing, stretch, ...) and how many points each takes off
+# the student's latest stress score. Shared by the single-action endpoint and
+# offline batch sync.
+QUICK_ACTION_MESSAGES = {
+    'breathing': 'Great! Try a 1-minute box breathing now. In 4, hold 4, out 4.',
+    'mood_check': 'Mood check logged. Remember to be kind to yourself!',
+    'stretch': 'Stand up, roll your shoulders, and stretch for 30 seconds.',
+    'energy_boost': 'Time for an energy boost! Do 10 jumping jacks or walk around.',
+    'morning_motivation': 'Start your day with intention and positivity!',
+    'sleep_hygiene': 'Wind down: no screens 30 min before bed, keep it cool and dark.',
+    'wind_down': 'Time to relax. Deep breathing and gentle stretches help.',
 }
-
-SENTIMENT_SCORE = {
-    'positive': 30,
-    'neutral': 50,
-    'negative': 75,
-    'anxious': 85,
+QUICK_ACTION_RELIEF = {
+    'breathing': 8,
+    'mood_check': 3,
+    'stretch': 5,
+    'energy_boost': 7,
+    'morning_motivation': 4,
+    'sleep_hygiene': 6,
+    'wind_down': 10,
 }
+DEFAULT_RELIEF = 3
+
+
+def quick_action_message(action: str) -> str:
+    return QUICK_ACTION_MESSAGES.get(action, 'Action noted. Keep going!')
+
+
+def relieved_score(base: int, action: str) -> int:
+    """Stress score after a quick action, starting from `base`."""
+    return max(0, base - QUICK_ACTION_RELIEF.get(action, DEFAULT_RELIEF))
+
+
+def daily_score(mood_key: str, sentiments: List[str]) -> int:
+    """Weighted average of the mood baseline (0.6) and mean chat sentiment (0.4)."""
+    return score_one(mood_key, sentiments, weights='daily')
+
+
+def record_stress(db, user_email: str, score: int, source: str, check_ceiling: bool = False) -> dict:
+    """Insert a stress reading, update the student's derived state and alert if needed.
+
+    All stress writes go through here so per-student state stays in step
+    with the raw readings. Any reading far above the student's own EWMA
+    baseline alerts; `check_ceiling` also alerts on the absolute
+    STRESS_ALERT_SCORE (used for daily aggregates, not quick actions).
+    """
+    stress_doc = {
+        'user_email': user_email,
+        'score': score,
+        'source': source,
+        'created_at': datetime.utcnow(),
+    }
+    db[StressModel.collection_name].insert_one(stress_doc)
+    state = touch_student(db, user_email, 'stress', at=stress_doc['created_at'], score=score)
+    record_reading(db, stress_doc, state)
+
+    reason = alert_reason(score, bool(state.get('last_anomaly')), check_ceiling)
+    if reason:
+        send_institutional_alert(user_email, score, reason=reason)
+    return stress_doc
 
 
 def calculate_daily_stress(user_email: str) -> int:
@@ -33,33 +81,16 @@ def calculate_daily_stress(user_email: str) -> int:
     db = get_db()
     moods = db[MoodModel.collection_name]
     chats = db[ChatModel.collection_name]
-    stress_coll = db[StressModel.collection_name]
 
     # Latest mood in last 24h
     since = datetime.utcnow() - timedelta(hours=24)
     latest_mood = moods.find_one({'user_email': user_email, 'created_at': {'$gte': since}}, sort=[('created_at', -1)])
     mood_key = (latest_mood or {}).get('mood', 'normal')
-    mood_score = MOOD_BASELINE.get(mood_key, 50)
 
     # Average sentiment over last 5 chats
     recent_chats = list(chats.find({'user_email': user_email, 'type': 'mental'}).sort('created_at', -1).limit(5))
-    if recent_chats:
-        scores = [SENTIMENT_SCORE.get(c.get('sentiment', 'neutral'), 50) for c in recent_chats]
-        sentiment_avg = int(round(sum(scores) / len(scores)))
-    else:
-        sentiment_avg = 50
-
-    final_score = int(round(mood_score * 0.6 + sentiment_avg * 0.4))
-
-    stress_doc = {
-        'user_email': user_email,
-        'score': final_score,
-        'source': 'daily_aggregate',
-        'created_at': datetime.utcnow(),
-    }
-    stress_coll.insert_one(stress_doc)
+    final_score = daily_score(mood_key, [c.get('sentiment', 'neutral') for c in recent_chats])
 
-    if final_score > 80:
-        send_institutional_alert(user_email, final_score)
+    record_stress(db, user_email, final_score, 'daily_aggregate', check_ceiling=True)
 
     return final_score
@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne, errors
+from models.student_state import StudentStateModel
+from services.anomaly import evaluate
+
+# Writers stamp `updated_at` with their own clock just before the write lands, so
+# a reader's cursor is moved back by this much to avoid missing in-flight writes.
+# Clients may see a student twice; merging deltas by email makes that harmless.
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+# Stress readings kept on the state document for risk ranking
+RECENT_LIMIT = 50
+RISK_WINDOW = timedelta(days=7)
+
+# Readings are folded into the baseline with a write guarded on `ewma_n`; a
+# concurrent reading for the same student makes it re-read and fold again
+FOLD_ATTEMPTS = 10
+
+
+def touch_student(db, user_email: str, changed: str = 'stress', at: Optional[datetime] = None,
+                  score: Optional[int] = None) -> Dict[str, Any]:
+    """Bump the student's `updated_at` after a mood or stress write.
+
+    `changed` is 'stress' or 'mood' and also records `last_<changed>_at`.
+    When a stress `score` is given it is appended to the capped `recent`
+    window, the risk ranking is recomputed and the EWMA baseline is updated;
+    `last_anomaly` on the returned state says whether the reading deviated
+    sharply from that baseline. The proctor
+    assignment and department are copied from `users` on every touch, so a
+    reassignment shows up with the student's next reading. Returns the
+    updated state document.
+    """
+    now = at or datetime.utcnow()
+    coll = db[StudentStateModel.collection_name]
+    fields = {'updated_at': now, f'last_{changed}_at': now, **_assignment(db, user_email)}
+    if score is not None:
+        return _fold(coll, user_email, fields, [{'score': score, 'at': now}])
+    return coll.find_one_and_update({'user_email': user_email}, {'$set': fields}, upsert=True,
+                                    return_document=ReturnDocument.AFTER)
+
+
+def _assignment(db, user_email: str) -> Dict[str, Any]:
+    """The student's current proctor and department from `users` (one indexed read)."""
+    user = db['users'].find_one({'email': user_email}, {'proctor_email': 1, 'department': 1}) or {}
+    return {'proctor_email': user.get('proctor_email'), 'department': user.get('department')}
+
+
+def sync_proctor(db, user_email: str) -> None:
+    """Copy a reassignment made directly in `users` onto the student's state.
+
+    Touches refresh the assignment anyway; call this after an out-of-band
+    change (an admin edit or import) so the student moves to the new
+    proctor's ranking and delta feed without waiting for their next reading.
+    """
+    db[StudentStateModel.collection_name].update_one(
+        {'user_email': user_email},
+        {'$set': {**_assignment(db, user_email), 'updated_at': datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def _fold(coll, user_email: str, fields: Dict[str, Any], readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Append `readings` to `recent` and fold them into the baseline in one write.
+
+    The baseline is read-modify-write, so the write only lands while
+    `ewma_n` still has the value it was derived from (every fold bumps it);
+    otherwise the state is read again and the readings folded onto it.
+    """
+    for _ in range(FOLD_ATTEMPTS):
+        state = coll.find_one({'user_email': user_email}) or {}
+        update = _fold_update(state, fields, readings)
+        try:
+            # No match for an existing student means an insert, which the unique index refuses
+            folded = coll.find_one_and_update({'user_email': user_email, 'ewma_n': state.get('ewma_n')}, update,
+                                              upsert=True, return_document=ReturnDocument.AFTER)
+        except errors.DuplicateKeyError:
+            folded = None
+        if folded is not None:
+            return folded
+    raise RuntimeError(f'student_state for {user_email} kept changing; readings not folded')
+
+
+def _fold_update(state: Dict[str, Any], fields: Dict[str, Any], readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The `$set` that appends `readings` to `state` and applies the derived fields."""
+    recent = ((state.get('recent') or []) + [{'score': r['score'], 'at': r['at']} for r in readings])[-RECENT_LIMIT:]
+    derived = _derive_from_readings({**state, 'recent': recent}, readings)
+    return {'$set': {**fields, 'recent': recent, **derived}}
+
+
+def _derive_from_readings(state: Dict[str, Any], readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold several readings (oldest first) into the baseline, rank on the last one.
+
+    `last_anomaly` is set if any of them deviated from the baseline as it
+    stood when that reading arrived.
+    """
+    baseline = dict(state)
+    anomalous = False
+    for r in readings:
+        ewma_fields, _, flagged = evaluate(baseline, r['score'])
+        baseline.update(ewma_fields)
+        anomalous = anomalous or flagged
+    last = readings[-1]
+    derived = compute_risk(last['score'], state.get('recent') or [], last['at'])
+    derived.update({k: baseline[k] for k in ewma_fields})
+    derived['last_anomaly'] = anomalous
+    return derived
+
+
+def touch_student_batch(db, user_email: str, readings: List[Dict[str, Any]],
+                        mood_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """`touch_student` for a batch of one student's events in a single write.
+
+    `readings` are {'score', 'at'} stress readings, oldest first; `mood_at`
+    is the time of the latest mood check-in in the batch, if any. All
+    readings are pushed to `recent` at once and the baseline is folded
+    through them in order, so the result matches calling `touch_student`
+    once per reading. Returns the updated state document.
+    """
+    now = datetime.utcnow()
+    coll = db[StudentStateModel.collection_name]
+    fields: Dict[str, Any] = {'updated_at': now, **_assignment(db, user_email)}
+    if readings:
+        fields['last_stress_at'] = readings[-1]['at']
+    if mood_at is not None:
+        fields['last_mood_at'] = mood_at
+    if readings:
+        return _fold(coll, user_email, fields, readings)
+    return coll.find_one_and_update({'user_email': user_email}, {'$set': fields}, upsert=True,
+                                    return_document=ReturnDocument.AFTER)
+
+
+def touch_students_bulk(db, docs: List[Dict[str, Any]], users: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Batch form of `touch_student` for stress readings (one per student).
+
+    `users` maps email -> user document; its proctor and department are
+    copied onto the state as in `touch_student`. Each student's reading is
+    folded with the same `ewma_n` guard as `_fold`; the few that lose to a
+    concurrent reading are folded again one by one. Costs two round-trips
+    regardless of batch size when nothing races. Returns email -> state.
+    """
+    if not docs:
+        return {}
+    coll = db[StudentStateModel.collection_name]
+    latest = {d['user_email']: d for d in docs}
+    current = {st['user_email']: st for st in coll.find({'user_email': {'$in': list(latest)}})}
+    folds = {}
+    for email, d in latest.items():
+        user = users.get(email) or {}
+        fields = {'updated_at': d['created_at'], 'last_stress_at': d['created_at'],
+                  'proctor_email': user.get('proctor_email'), 'department': user.get('department')}
+        state = current.get(email) or {}
+        folds[email] = (fields, state.get('ewma_n'), _fold_update(state, fields, [_reading(d)]))
+
+    try:
+        result = coll.bulk_write([UpdateOne({'user_email': email, 'ewma_n': n}, update, upsert=True)
+                                  for email, (_, n, update) in folds.items()], ordered=False)
+        raced = result.matched_count + result.upserted_count < len(folds)
+    except errors.BulkWriteError:
+        raced = True  # a concurrent first reading created the document first
+
+    states = {email: {**current.get(email, {}), 'user_email': email, **update['$set']}
+              for email, (_, _, update) in folds.items()}
+    if raced:
+        # An update that did not land wrote nothing, so its reading is missing from `recent`
+        for st in coll.find({'user_email': {'$in': list(folds)}}):
+            email = st['user_email']
+            if _reading(latest[email], stored=True) in st.get('recent') or []:
+                states[email] = st
+            else:
+                states[email] = _fold(coll, email, folds[email][0], [_reading(latest[email])])
+    return states
+
+
+def _reading(doc: Dict[str, Any], stored: bool = False) -> Dict[str, Any]:
+    """A stress document as a `recent` entry; `stored` truncates `at` to MongoDB's milliseconds."""
+    at = doc['created_at']
+    if stored:
+        at = at.replace(microsecond=at.microsecond // 1000 * 1000)
+    return {'score': doc['score'], 'at': at}
+
+
+def compute_risk(latest: int, recent: List[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+    """Blend latest score, 7-day average and trend direction into a 0-100 risk.
+
+    Trend is the latest score against the 7-day average: a student climbing
+    above their own week ranks higher than one holding steady at the same level.
+    """
+    cutoff = now - RISK_WINDOW
+    window = [r['score'] for r in recent if r.get('at') and r['at'] >= cutoff]
+    avg = sum(window) / len(window) if window else float(latest)
+    delta = latest - avg
+    trend_score = max(0.0, min(100.0, 50 + 2 * delta))
+    risk = 0.5 * latest + 0.3 * avg + 0.2 * trend_score
+    if delta > 5:
+        trend = 'up'
+    elif delta < -5:
+        trend = 'down'
+    else:
+        trend = 'stable'
+    return {
+        'risk': round(risk, 1),
+        'latest_score': latest,
+        'avg_7d': round(avg, 1),
+        'trend': trend,
+        'risk_updated_at': now,
+    }
+
+
+def top_at_risk(db, proctor_email: str, k: int) -> List[Dict[str, Any]]:
+    """Top-k students for a proctor by risk, answered from the (proctor_email, risk) index."""
+    return list(db[StudentStateModel.collection_name].find(
+        {'proctor_email': proctor_email, 'risk': {'$exists': True}},
+        {'_id': 0, 'user_email': 1, 'risk': 1, 'latest_score': 1, 'avg_7d': 1, 'trend': 1, 'risk_updated_at': 1},
+    ).sort('risk', -1).limit(k))
+
+
+def encode_cursor(ts: datetime) -> str:
+    """Opaque cursor: milliseconds since epoch as a string."""
+    return str(int((ts - datetime(1970, 1, 1)).total_seconds() * 1000))
+
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        return datetime(1970, 1, 1) + timedelta(milliseconds=int(cursor))
+    except (TypeError, ValueError):
+        raise ValueError('invalid cursor')
+
+
+def changed_since(db, proctor_email: str, cursor: str, limit: int) -> Tuple[List[str], str, bool]:
+    """Return (emails changed since `cursor`, next cursor, truncated).
+
+    `truncated` is True when more than `limit` students changed; callers should
+    fall back to a full refresh in that case.
+    """
+    since = decode_cursor(cursor) - CURSOR_OVERLAP
+    next_cursor = encode_cursor(datetime.utcnow())
+    rows = list(db[StudentStateModel.collection_name].find(
+        {'proctor_email': proctor_email, 'updated_at': {'$gte': since}},
+        {'_id': 0, 'user_email': 1},
+    ).limit(limit + 1))
+    emails = [r['user_email'] for r in rows]
+    return emails[:limit], next_cursor, len(emails) > limit
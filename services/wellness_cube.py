@@ -0,0 +1,205 @@
+"""Maintain and query the day x department/proctor/student wellness cube.
+
+Readings are folded in incrementally by `record_reading` on every stress write.
+`rebuild` recomputes a date range from raw readings (nightly compaction, or to
+backfill after a schema change):
+
+    python -m services.wellness_cube rebuild --days 30
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from models.stress import StressModel
+from models.wellness_cube import WellnessCubeModel
+
+logger = logging.getLogger(__name__)
+
+HIGH_STRESS_SCORE = 80
+UNASSIGNED = 'unassigned'
+
+
+def _day(ts: datetime) -> str:
+    return ts.strftime('%Y-%m-%d')
+
+
+def record_reading(db, doc: Dict[str, Any], state: Optional[Dict[str, Any]] = None) -> None:
+    """Fold one stress reading into all three grains in a single round-trip.
+
+    `state` is the student's state document (for proctor/department); it is
+    looked up from `users` when not supplied.
+    """
+    record_readings(db, [doc], {doc['user_email']: state} if state else None)
+
+
+def record_readings(db, docs: List[Dict[str, Any]], states: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    """Fold many readings into the cube with one `bulk_write`."""
+    if not docs:
+        return
+    states = dict(states or {})
+    missing = {d['user_email'] for d in docs} - set(states)
+    if missing:
+        for u in db['users'].find({'email': {'$in': list(missing)}}, {'email': 1, 'proctor_email': 1, 'department': 1}):
+            states[u['email']] = u
+
+    incs: Dict[tuple, Dict[str, Any]] = {}
+    for d in docs:
+        st = states.get(d['user_email']) or {}
+        department = st.get('department') or UNASSIGNED
+        proctor = st.get('proctor_email') or UNASSIGNED
+        day = _day(d['created_at'])
+        score = int(d.get('score', 50))
+        for grain, key in (('department', department), ('proctor', proctor), ('student', d['user_email'])):
+            slot = incs.setdefault((grain, key, day), {
+                'department': department,
+                'proctor_email': UNASSIGNED if grain == 'department' else proctor,
+                'count': 0, 'sum': 0, 'high_count': 0,
+            })
+            slot['count'] += 1
+            slot['sum'] += score
+            slot['high_count'] += 1 if score >= HIGH_STRESS_SCORE else 0
+
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {'grain': grain, 'key': key, 'day': day},
+            {
+                '$inc': {'count': v['count'], 'sum': v['sum'], 'high_count': v['high_count']},
+                '$set': {'department': v['department'], 'proctor_email': v['proctor_email'], 'updated_at': now},
+            },
+            upsert=True,
+        )
+        for (grain, key, day), v in incs.items()
+    ]
+    db[WellnessCubeModel.collection_name].bulk_write(ops, ordered=False)
+
+
+def rebuild(db, days: int = 30) -> Dict[str, int]:
+    """Recompute the cube for the last `days` days from raw readings.
+
+    Runs entirely server-side: raw readings are grouped into the student grain
+    and the student grain is rolled up into proctor and department grains.
+    Writes that land while this runs may be double-counted for the current
+    day, so schedule it off-peak.
+    """
+    start = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_day = _day(start)
+    cube = db[WellnessCubeModel.collection_name]
+    cube.delete_many({'day': {'$gte': start_day}})
+
+    db[StressModel.collection_name].aggregate([
+        {'$match': {'created_at': {'$gte': start}}},
+        {'$group': {
+            '_id': {'user_email': '$user_email',
+                    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}}},
+            'count': {'$sum': 1},
+            'sum': {'$sum': {'$ifNull': ['$score', 50]}},
+            'high_count': {'$sum': {'$cond': [{'$gte': ['$score', HIGH_STRESS_SCORE]}, 1, 0]}},
+        }},
+        {'$lookup': {'from': 'users', 'localField': '_id.user_email', 'foreignField': 'email', 'as': 'user'}},
+        {'$project': {
+            '_id': 0,
+            'grain': 'student',
+            'key': '$_id.user_email',
+            'day': '$_id.day',
+            'department': {'$ifNull': [{'$arrayElemAt': ['$user.department', 0]}, UNASSIGNED]},
+            'proctor_email': {'$ifNull': [{'$arrayElemAt': ['$user.proctor_email', 0]}, UNASSIGNED]},
+            'count': 1, 'sum': 1, 'high_count': 1,
+            'updated_at': '$$NOW',
+        }},
+        {'$merge': {'into': WellnessCubeModel.collection_name, 'on': ['grain', 'key', 'day'],
+                    'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ])
+
+    for grain, key_field in (('proctor', '$proctor_email'), ('department', '$department')):
+        cube.aggregate([
+            {'$match': {'grain': 'student', 'day': {'$gte': start_day}}},
+            {'$group': {
+                '_id': {'key': key_field, 'day': '$day'},
+                'department': {'$first': '$department'},
+                'proctor_email': {'$first': '$proctor_email'},
+                'count': {'$sum': '$count'},
+                'sum': {'$sum': '$sum'},
+                'high_count': {'$sum': '$high_count'},
+            }},
+            {'$project': {
+                '_id': 0, 'grain': grain, 'key': '$_id.key', 'day': '$_id.day',
+                'department': 1, 'proctor_email': 1 if grain == 'proctor' else UNASSIGNED,
+                'count': 1, 'sum': 1, 'high_count': 1, 'updated_at': '$$NOW',
+            }},
+            {'$merge': {'into': WellnessCubeModel.collection_name, 'on': ['grain', 'key', 'day'],
+                        'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+        ])
+
+    return {grain: cube.count_documents({'grain': grain, 'day': {'$gte': start_day}})
+            for grain in WellnessCubeModel.GRAINS}
+
+
+def query(db, days: int = 30, department: Optional[str] = None, proctor: Optional[str] = None) -> Dict[str, Any]:
+    """Daily series plus a per-child breakdown one level below the selection.
+
+    No filter: series over all departments, broken down by department.
+    `department`: series for that department, broken down by proctor.
+    `proctor`: series for that proctor, broken down by student.
+    """
+    start_day = _day(datetime.utcnow() - timedelta(days=days))
+    if proctor:
+        series_match = {'grain': 'proctor', 'key': proctor}
+        child_match = {'grain': 'student', 'proctor_email': proctor}
+        level = 'student'
+    elif department:
+        series_match = {'grain': 'department', 'key': department}
+        child_match = {'grain': 'proctor', 'department': department}
+        level = 'proctor'
+    else:
+        series_match = {'grain': 'department'}
+        child_match = {'grain': 'department'}
+        level = 'department'
+
+    cube = db[WellnessCubeModel.collection_name]
+    series = list(cube.aggregate([
+        {'$match': {**series_match, 'day': {'$gte': start_day}}},
+        {'$group': {'_id': '$day', 'count': {'$sum': '$count'}, 'sum': {'$sum': '$sum'},
+                    'high_count': {'$sum': '$high_count'}}},
+        {'$sort': {'_id': 1}},
+    ]))
+    children = list(cube.aggregate([
+        {'$match': {**child_match, 'day': {'$gte': start_day}}},
+        {'$group': {'_id': '$key', 'count': {'$sum': '$count'}, 'sum': {'$sum': '$sum'},
+                    'high_count': {'$sum': '$high_count'}}},
+        {'$sort': {'high_count': -1, '_id': 1}},
+    ]))
+
+    return {
+        'dates': [r['_id'] for r in series],
+        'scores': [int(r['sum'] / r['count']) if r['count'] else 0 for r in series],
+        'counts': [r['count'] for r in series],
+        'high_counts': [r['high_count'] for r in series],
+        'level': level,
+        'breakdown': [{
+            'key': r['_id'],
+            'avg_score': int(r['sum'] / r['count']) if r['count'] else 0,
+            'count': r['count'],
+            'high_count': r['high_count'],
+        } for r in children],
+    }
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Maintain the HOD wellness cube.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_rebuild = sub.add_parser('rebuild', help='Recompute the cube from raw stress readings')
+    p_rebuild.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'rebuild':
+        counts = rebuild(get_db(), days=args.days)
+        logger.info(f"Wellness cube rebuilt for {args.days} days: {counts}")
+
+
+if __name__ == '__main__':
+    main()
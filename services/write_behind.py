@@ -0,0 +1,213 @@
+"""Write-behind batching for append-only documents (chat turns, telemetry).
+
+Request handlers `put()` a document and return immediately; a background
+thread per collection drains the queue with one `insert_many` every
+`batch_size` documents or `flush_ms` milliseconds, whichever comes first.
+
+Durability: a document is acknowledged to the client before it is in MongoDB.
+Anything still queued is flushed at interpreter exit, but a hard crash
+(SIGKILL, OOM) loses at most the current queue depth. Failed inserts are
+retried with backoff and keep their place; while MongoDB is slow the queue
+fills, and once it is full `put()` waits up to `put_timeout_ms` and then
+writes synchronously in the caller, so memory stays bounded and load is
+pushed back onto requests instead of being dropped. `stats()` reports depth,
+throughput and how often each of these paths was taken.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from pymongo import errors
+from config import Config
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_SECONDS = 5.0
+
+
+class WriteBehindQueue:
+    def __init__(self, collection_name: str, batch_size: int = None, flush_ms: int = None,
+                 max_queue: int = None, put_timeout_ms: int = None):
+        self.collection_name = collection_name
+        self.batch_size = batch_size or Config.WRITE_BEHIND_BATCH_SIZE
+        self.flush_ms = flush_ms if flush_ms is not None else Config.WRITE_BEHIND_FLUSH_MS
+        self.put_timeout = (put_timeout_ms if put_timeout_ms is not None else Config.WRITE_BEHIND_PUT_TIMEOUT_MS) / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue or Config.WRITE_BEHIND_MAX_QUEUE)
+        self._idle = threading.Condition()
+        self._in_flight = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {
+            'enqueued': 0, 'written': 0, 'batches': 0, 'retries': 0,
+            'sync_writes': 0, 'failed': 0,
+        }
+        self.last_batch_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def put(self, doc: Dict[str, Any]) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put(doc, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: the writer is behind, so this request pays for its own write
+            get_db()[self.collection_name].insert_one(doc)
+            self._count('sync_writes')
+            return
+        self._count('enqueued')
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.collection_name}",
+                                                daemon=True)
+                self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_ms / 1000.0
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            with self._idle:
+                self._in_flight = len(batch)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            with self._idle:
+                self._in_flight = 0
+                self._idle.notify_all()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        delay = 0.1
+        while True:
+            started = time.perf_counter()
+            try:
+                get_db()[self.collection_name].insert_many(batch, ordered=False)
+                self.last_batch_ms = (time.perf_counter() - started) * 1000
+                self._count('written', len(batch))
+                self._count('batches')
+                return
+            except errors.BulkWriteError as exc:
+                # Keep what landed; duplicate keys from a retried batch are fine
+                details = exc.details or {}
+                self._count('written', details.get('nInserted', 0))
+                hard = [e for e in details.get('writeErrors', []) if e.get('code') != 11000]
+                if hard:
+                    self._count('failed', len(hard))
+                    logger.error(f"write-behind {self.collection_name}: {len(hard)} documents rejected: "
+                                 f"{hard[0].get('errmsg')}")
+                return
+            except Exception as exc:
+                if self._stop.is_set() and delay >= MAX_RETRY_SECONDS:
+                    self._count('failed', len(batch))
+                    logger.error(f"write-behind {self.collection_name}: dropping {len(batch)} documents "
+                                 f"at shutdown: {exc}")
+                    return
+                self._count('retries')
+                logger.warning(f"write-behind {self.collection_name}: insert failed, retrying in {delay:.1f}s: {exc}")
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    # ------------------------------------------------------------------
+    # Lifecycle and observability
+    # ------------------------------------------------------------------
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is written; False on timeout."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            # unfinished_tasks also covers a batch taken off the queue but not yet written
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(min(remaining, 0.1))
+        return True
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._queue.empty()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'collection': self.collection_name,
+            'durability': 'buffered',
+            'depth': self._queue.qsize(),
+            'in_flight': self._in_flight,
+            'capacity': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'flush_ms': self.flush_ms,
+            'last_batch_ms': round(self.last_batch_ms, 1),
+            **counters,
+        }
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_pid: Optional[int] = None
+_registry_lock = threading.Lock()
+
+
+def get_queue(collection_name: str) -> WriteBehindQueue:
+    """Return this process's queue for a collection, creating fresh ones after a fork."""
+    global _queues, _queues_pid
+    with _registry_lock:
+        if _queues_pid != os.getpid():
+            _queues = {}
+            _queues_pid = os.getpid()
+        if collection_name not in _queues:
+            _queues[collection_name] = WriteBehindQueue(collection_name)
+        return _queues[collection_name]
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    if _queues_pid != os.getpid():
+        return []
+    return [q.stats() for q in list(_queues.values())]
+
+
+@atexit.register
+def stop_all() -> None:
+    """Flush and stop this process's queues (at exit, or on worker shutdown)."""
+    if _queues_pid != os.getpid():
+        return
+    for q in list(_queues.values()):
+        if not q.stop(timeout=Config.WRITE_BEHIND_SHUTDOWN_SECONDS):
+            logger.error(f"write-behind {q.collection_name}: {q.stats()['depth']} documents not flushed at exit")
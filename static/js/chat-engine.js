@@ -25,6 +25,11 @@ let currentChatId = null;
 let chats = [];
 const LS_CHATS = 'aura_mental_chats';
 
+// Server-side history, paged with keyset cursors (see /api/chat/history)
+const SAVED_HISTORY_ID = '__saved__';
+const HISTORY_PAGE_SIZE = 30;
+const savedHistory = { cursor: null, hasMore: true, loading: false };
+
 // ============================================
 // INITIALIZATION
 // ============================================
@@ -81,6 +86,15 @@ function setupEventListeners() {
     els.zenBtn.addEventListener('click', toggleZenMode);
   }
   
+  // Infinite scroll: fetch older saved messages near the top
+  if (els.chatMessages) {
+    els.chatMessages.addEventListener('scroll', () => {
+      if (currentChatId === SAVED_HISTORY_ID && els.chatMessages.scrollTop < 80) {
+        loadOlderHistory();
+      }
+    });
+  }
+  
   // Listen for theme changes
   window.addEventListener('themechange', (e) => {
     console.log('Theme changed to:', e.detail.theme);
@@ -103,7 +117,7 @@ async function handleSendMessage(e) {
   if (!message) return;
   
   // Create new chat on first message
-  if (!currentChatId) {
+  if (!currentChatId || currentChatId === SAVED_HISTORY_ID) {
     const chat = createChat(message);
     currentChatId = chat.id;
   }
@@ -127,9 +141,11 @@ async function handleSendMessage(e) {
   const loadingId = showLoading();
   
   try {
-    const response = await fetch('/api/chat/mental', {
+    // One key per message: retries after a dropped connection are answered
+    // from the first attempt instead of calling the model again
+    const response = await fetchWithRetry('/api/chat/mental', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Idempotency-Key': newIdempotencyKey() },
       body: JSON.stringify({
         message,
         conversation_id: currentChatId,
@@ -137,6 +153,13 @@ async function handleSendMessage(e) {
       signal: requestAbortController?.signal,
     });
     
+    if (response.status === 429) {
+      // Rate limited or AURA is at capacity: say so instead of a generic error
+      const busy = await response.json().catch(() => ({}));
+      removeLoadingById(loadingId);
+      appendMessage(busy.error || 'AURA is busy right now. Please try again shortly.', 'bot');
+      return;
+    }
     if (!response.ok) {
       throw new Error(`HTTP ${response.status}`);
     }
@@ -145,7 +168,11 @@ async function handleSendMessage(e) {
     removeLoadingById(loadingId);
     
     const reply = data.ai_response || data.reply || data.message || 'No response from AI.';
-    appendMessage(reply, 'bot');
+    appendMessage(reply, 'bot', data.response_id ? {
+      response_id: data.response_id,
+      style: data.style,
+      provider: data.provider,
+    } : null);
     addMessageToChat(currentChatId, 'bot', reply);
     
   } catch (error) {
@@ -166,6 +193,26 @@ async function handleSendMessage(e) {
   }
 }
 
+function newIdempotencyKey() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+// Retry network failures and 409 (original still running) with the same key
+async function fetchWithRetry(url, options, attempts = 3) {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(url, options);
+      if (response.status !== 409 || attempt >= attempts) return response;
+      const wait = Number(response.headers.get('Retry-After')) || 2;
+      await new Promise(resolve => setTimeout(resolve, wait * 1000));
+    } catch (error) {
+      if (error.name === 'AbortError' || attempt >= attempts) throw error;
+      await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+    }
+  }
+}
+
 // Update send button disabled state
 function updateSendButtonState() {
   if (els.sendBtn) {
@@ -177,9 +224,7 @@ function updateSendButtonState() {
 // ============================================
 // MESSAGE RENDERING
 // ============================================
-function appendMessage(text, role) {
-  if (!els.chatMessages) return;
-  
+function buildMessageBlock(text, role) {
   const block = document.createElement('div');
   block.className = `message-block ${role}-msg`;
   
@@ -206,6 +251,16 @@ function appendMessage(text, role) {
   }
   
   block.appendChild(content);
+  return block;
+}
+
+function appendMessage(text, role, replyMeta = null) {
+  if (!els.chatMessages) return;
+  
+  const block = buildMessageBlock(text, role);
+  if (replyMeta) {
+    block.appendChild(buildFeedbackBar(replyMeta));
+  }
   els.chatMessages.appendChild(block);
   
   // Enhanced auto-scroll to bottom - ensures latest message is always visible
@@ -230,6 +285,77 @@ function appendMessage(text, role) {
   });
 }
 
+// ============================================
+// FEEDBACK TELEMETRY
+// ============================================
+// Events are batched client-side and posted to /api/chat/feedback every
+// few seconds (or once enough pile up); anything left is sent with
+// sendBeacon when the page is hidden so closing the tab does not lose it.
+const FEEDBACK_FLUSH_MS = 5000;
+const FEEDBACK_MAX_PENDING = 20;
+const feedbackQueue = [];
+let feedbackTimer = null;
+
+function buildFeedbackBar(meta) {
+  const bar = document.createElement('div');
+  bar.className = 'feedback-bar';
+  [['thumbs_up', '👍', 'Helpful'], ['thumbs_down', '👎', 'Not helpful']].forEach(([action, icon, label]) => {
+    const btn = document.createElement('button');
+    btn.type = 'button';
+    btn.className = 'feedback-btn';
+    btn.textContent = icon;
+    btn.title = label;
+    btn.setAttribute('aria-label', label);
+    btn.addEventListener('click', () => {
+      if (bar.dataset.rated) return;
+      bar.dataset.rated = action;
+      btn.classList.add('selected');
+      bar.querySelectorAll('button').forEach(b => { b.disabled = true; });
+      recordFeedback(action, meta);
+    });
+    bar.appendChild(btn);
+  });
+  return bar;
+}
+
+function recordFeedback(action, meta) {
+  feedbackQueue.push({
+    action,
+    response_id: meta.response_id,
+    style: meta.style,
+    provider: meta.provider,
+    ts: Date.now(),
+  });
+  if (feedbackQueue.length >= FEEDBACK_MAX_PENDING) {
+    flushFeedback();
+  } else if (!feedbackTimer) {
+    feedbackTimer = setTimeout(flushFeedback, FEEDBACK_FLUSH_MS);
+  }
+}
+
+function flushFeedback(useBeacon = false) {
+  clearTimeout(feedbackTimer);
+  feedbackTimer = null;
+  if (!feedbackQueue.length) return;
+  const events = feedbackQueue.splice(0, feedbackQueue.length);
+  const body = JSON.stringify({ events });
+  if (useBeacon && navigator.sendBeacon) {
+    navigator.sendBeacon('/api/chat/feedback', new Blob([body], { type: 'application/json' }));
+    return;
+  }
+  fetch('/api/chat/feedback', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body,
+    keepalive: true,
+  }).catch(err => console.warn('Feedback not sent:', err));
+}
+
+document.addEventListener('visibilitychange', () => {
+  if (document.visibilityState === 'hidden') flushFeedback(true);
+});
+window.addEventListener('pagehide', () => flushFeedback(true));
+
 function showLoading() {
   if (!els.chatMessages) return null;
   
@@ -400,13 +526,71 @@ function renderWelcome() {
   });
 }
 
+// ============================================
+// SAVED HISTORY (server, infinite scroll)
+// ============================================
+function openSavedHistory() {
+  currentChatId = SAVED_HISTORY_ID;
+  savedHistory.cursor = null;
+  savedHistory.hasMore = true;
+  if (els.chatMessages) els.chatMessages.innerHTML = '';
+  if (els.welcomeState) els.welcomeState.style.display = 'none';
+  renderHistory();
+  loadOlderHistory();
+}
+
+async function loadOlderHistory() {
+  if (savedHistory.loading || !savedHistory.hasMore || !els.chatMessages) return;
+  savedHistory.loading = true;
+  const firstPage = savedHistory.cursor === null;
+  try {
+    let url = `/api/chat/history?limit=${HISTORY_PAGE_SIZE}`;
+    if (savedHistory.cursor) url += `&before=${encodeURIComponent(savedHistory.cursor)}`;
+    const res = await fetch(url);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const data = await res.json();
+    if (currentChatId !== SAVED_HISTORY_ID) return;  // user navigated away
+
+    // Items are oldest first; prepend the page while keeping the viewport still
+    const frag = document.createDocumentFragment();
+    (data.history || []).forEach(h => {
+      if (h.message) frag.appendChild(buildMessageBlock(h.message, 'user'));
+      if (h.response) frag.appendChild(buildMessageBlock(h.response, 'bot'));
+    });
+    const prevHeight = els.chatMessages.scrollHeight;
+    els.chatMessages.insertBefore(frag, els.chatMessages.firstChild);
+    els.chatMessages.scrollTop = firstPage
+      ? els.chatMessages.scrollHeight
+      : els.chatMessages.scrollTop + (els.chatMessages.scrollHeight - prevHeight);
+
+    savedHistory.cursor = data.next_cursor;
+    savedHistory.hasMore = !!data.has_more;
+    if (firstPage && !(data.history || []).length) {
+      appendMessage('No saved messages yet.', 'bot');
+    }
+  } catch (e) {
+    console.error('Failed to load saved history:', e);
+  } finally {
+    savedHistory.loading = false;
+  }
+}
+
 function renderHistory() {
   if (!els.historyList) return;
   
   els.historyList.innerHTML = '';
   
+  const saved = document.createElement('div');
+  saved.className = 'history-item' + (currentChatId === SAVED_HISTORY_ID ? ' active' : '');
+  saved.innerHTML = `
+      <span class="history-item-icon">🗂️</span>
+      <span class="history-item-text">All saved messages</span>
+    `;
+  saved.addEventListener('click', openSavedHistory);
+  els.historyList.appendChild(saved);
+  
   if (chats.length === 0) {
-    els.historyList.innerHTML = '<div class="history-empty">No conversations yet</div>';
+    els.historyList.insertAdjacentHTML('beforeend', '<div class="history-empty">No conversations yet</div>');
     return;
   }
   
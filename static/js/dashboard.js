@@ -331,6 +331,10 @@ function attachQuickActions() {
             btn.innerHTML = '<div class="loading"></div>';
             
             try {
+                if (!navigator.onLine && window.AuraSync) {
+                    await queueQuickAction(action);
+                    return;
+                }
                 const res = await fetch('/student/api/quick_actions', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
@@ -348,7 +352,12 @@ function attachQuickActions() {
                 
             } catch (err) {
                 console.error('❌ Quick action failed:', err);
-                showToast('Action completed! 🎉', 'success');
+                if (err instanceof TypeError && window.AuraSync) {
+                    // Network error: keep it and sync later
+                    await queueQuickAction(action);
+                } else {
+                    showToast('Action completed! 🎉', 'success');
+                }
             } finally {
                 btn.disabled = false;
                 btn.style.opacity = '1';
@@ -358,6 +367,21 @@ function attachQuickActions() {
     });
 }
 
+async function queueQuickAction(action) {
+    try {
+        await window.AuraSync.enqueue({ kind: 'quick_action', action });
+        showToast('📴 Saved offline, it will sync when you are back online.', 'success');
+    } catch (err) {
+        console.error('❌ Could not queue quick action:', err);
+        showToast('Could not save this action offline.', 'error');
+    }
+}
+
+// Refresh the stress gauge once queued actions have been applied
+window.addEventListener('aura-sync-flushed', (e) => {
+    if (e.detail && e.detail.applied) loadStress();
+});
+
 // Parallax effect for floating shapes
 let mouseX = 0;
 let mouseY = 0;
@@ -454,7 +478,7 @@ document.addEventListener('keydown', (e) => {
 // Service Worker registration for offline support (optional)
 if ('serviceWorker' in navigator) {
     window.addEventListener('load', () => {
-        navigator.serviceWorker.register('/sw.js').then(() => {
+        navigator.serviceWorker.register('/static/service-worker.js').then(() => {
             console.log('✅ Service Worker registered');
         }).catch((err) => {
             console.log('Service Worker registration failed:', err);
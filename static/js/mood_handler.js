@@ -6,18 +6,12 @@
  */
 async function updateMood(mood) {
     try {
-        // Send mood to backend
-        const response = await fetch('/student/api/mood', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ mood: mood })
-        });
-
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}`);
+        // Queue the check-in; it is posted to /student/api/sync right away
+        // when online, or later by the service worker when offline
+        if (!window.AuraSync) {
+            throw new Error('offline_sync.js is not loaded');
         }
-
-        const data = await response.json();
+        await window.AuraSync.enqueue({ kind: 'mood', mood: mood });
         
         // Store theme in localStorage for persistence
         localStorage.setItem('aura_theme', mood);
@@ -0,0 +1,107 @@
+// ============================================
+// AURA OFFLINE SYNC - queued quick actions & mood check-ins
+// ============================================
+// Events are stored in IndexedDB with a client-generated key and posted to
+// /student/api/sync in batches. The server applies each key once, so a batch
+// can be retried freely. Pages flush when they come back online; where
+// Background Sync is supported the service worker also flushes after the tab
+// is closed. This file is loaded by pages and by the service worker
+// (importScripts), so it must not touch the DOM.
+(function (root) {
+  const DB_NAME = 'aura-sync';
+  const STORE = 'events';
+  const SYNC_TAG = 'aura-sync';
+  const SYNC_URL = '/student/api/sync';
+  const MAX_BATCH = 100;  // matches SYNC_MAX_EVENTS on the server
+
+  let flushing = null;
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, 1);
+      req.onupgradeneeded = () => {
+        req.result.createObjectStore(STORE, { keyPath: 'seq', autoIncrement: true });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  function withStore(mode, fn) {
+    return openDb().then(db => new Promise((resolve, reject) => {
+      const tx = db.transaction(STORE, mode);
+      const req = fn(tx.objectStore(STORE));
+      tx.oncomplete = () => { db.close(); resolve(req ? req.result : undefined); };
+      tx.onerror = () => { db.close(); reject(tx.error); };
+    }));
+  }
+
+  function newKey() {
+    if (root.crypto && root.crypto.randomUUID) return root.crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+  }
+
+  // Queue an event ({kind: 'quick_action', action} or {kind: 'mood', mood, intensity})
+  async function enqueue(event) {
+    const record = { ...event, key: newKey(), ts: Date.now() };
+    await withStore('readwrite', store => store.add(record));
+    requestFlush();
+    return record.key;
+  }
+
+  function pending() {
+    return withStore('readonly', store => store.count());
+  }
+
+  function requestFlush() {
+    if (root.navigator && root.navigator.serviceWorker && root.document) {
+      root.navigator.serviceWorker.ready
+        .then(reg => reg.sync && reg.sync.register(SYNC_TAG))
+        .catch(() => {});
+    }
+    if (!root.navigator || root.navigator.onLine !== false) {
+      flush().catch(err => console.warn('[AuraSync] flush deferred:', err.message));
+    }
+  }
+
+  // Post queued events oldest first; resolves with the last server response.
+  // Rejects (leaving the queue intact) if the network or server fails.
+  function flush() {
+    if (!flushing) {
+      flushing = flushAll().finally(() => { flushing = null; });
+    }
+    return flushing;
+  }
+
+  async function flushAll() {
+    let last = null;
+    for (;;) {
+      const queued = await withStore('readonly', store => store.getAll(null, MAX_BATCH));
+      if (!queued.length) return last;
+
+      const res = await fetch(SYNC_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'same-origin',
+        body: JSON.stringify({ events: queued.map(({ seq, ...event }) => event) }),
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      last = await res.json();
+
+      // applied, duplicate and rejected are all final
+      const done = queued.filter((_, i) => last.results && last.results[i] && last.results[i].status);
+      await withStore('readwrite', store => { done.forEach(e => store.delete(e.seq)); });
+      if (root.dispatchEvent && root.CustomEvent && root.document) {
+        root.dispatchEvent(new CustomEvent('aura-sync-flushed', { detail: last }));
+      }
+      if (done.length < queued.length) return last;
+    }
+  }
+
+  if (root.document) {
+    root.addEventListener('online', () => requestFlush());
+    pending().then(n => { if (n) requestFlush(); }).catch(() => {});
+  }
+
+  root.AuraSync = { enqueue, flush, pending, SYNC_TAG };
+})(typeof self !== 'undefined' ? self : this);
@@ -262,8 +262,10 @@ async function handleStudySendMessage(e) {
     console.log('🚀 Sending request to /api/study/analyze');
     console.log('📝 Prompt:', userText);
     
-    const response = await fetch('/api/study/analyze', {
+    // One key per question so a retried upload is not analyzed twice
+    const response = await fetchWithRetry('/api/study/analyze', {
       method: 'POST',
+      headers: { 'Idempotency-Key': newIdempotencyKey() },
       body: formData,
       signal: requestAbortController.signal
     });
@@ -317,6 +319,26 @@ async function handleStudySendMessage(e) {
   }
 }
 
+function newIdempotencyKey() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+// Retry network failures and 409 (original still running) with the same key
+async function fetchWithRetry(url, options, attempts = 3) {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(url, options);
+      if (response.status !== 409 || attempt >= attempts) return response;
+      const wait = Number(response.headers.get('Retry-After')) || 2;
+      await new Promise(resolve => setTimeout(resolve, wait * 1000));
+    } catch (error) {
+      if (error.name === 'AbortError' || attempt >= attempts) throw error;
+      await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+    }
+  }
+}
+
 // ============================================
 // TYPEWRITER EFFECT FOR AI RESPONSES
 // ============================================
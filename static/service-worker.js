@@ -1,12 +1,15 @@
 // AURA Service Worker - Offline Support for Relaxation Features
-const CACHE_NAME = 'aura-offline-v1';
+importScripts('/static/js/offline_sync.js');
+
+const CACHE_NAME = 'aura-offline-v2';
 const OFFLINE_URLS = [
     '/student/relax',
     '/static/css/global.css',
     '/static/css/style.css',
     '/static/js/theme.js',
     '/static/js/main.js',
-    '/static/js/mood_handler.js'
+    '/static/js/mood_handler.js',
+    '/static/js/offline_sync.js'
 ];
 
 // Install event - cache critical resources
@@ -71,6 +74,14 @@ self.addEventListener('fetch', (event) => {
     }
 });
 
+// Background Sync - post quick actions / mood check-ins queued while offline
+self.addEventListener('sync', (event) => {
+    if (event.tag === AuraSync.SYNC_TAG) {
+        // A rejection makes the browser retry the sync later
+        event.waitUntil(AuraSync.flush());
+    }
+});
+
 // Message event - allow clients to communicate with service worker
 self.addEventListener('message', (event) => {
     if (event.data.action === 'skipWaiting') {
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from config import Config
+from models.context_cache import ContextCacheModel
+from services import context_cache
+from services.context_cache import FakeCacheBackend, acquire, invalidate
+
+MODEL = 'models/gemini-2.5-flash'
+KEY = 'prompt:test:0001'
+PROMPT = 'You are a study assistant. ' * 40
+
+
+@pytest.fixture
+def coll(monkeypatch):
+    db = mongomock.MongoClient()['aura_test']
+    coll = db[ContextCacheModel.collection_name]
+    coll.create_index('key', unique=True)
+    monkeypatch.setattr(context_cache, 'get_db', lambda: db)
+    monkeypatch.setattr(Config, 'CONTEXT_CACHE_TTL_SECONDS', 1800)
+    monkeypatch.setattr(Config, 'CONTEXT_CACHE_REFRESH_MARGIN_SECONDS', 300)
+    monkeypatch.setattr(Config, 'CONTEXT_CACHE_RETRY_SECONDS', 3600)
+    return coll
+
+
+class Builds:
+    """`build` callback that counts how often a cache had to be created."""
+
+    def __init__(self, prompt=PROMPT):
+        self.prompt = prompt
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.prompt, []
+
+
+def test_created_once_then_hit(coll):
+    backend, build = FakeCacheBackend(), Builds()
+
+    name = acquire(backend, KEY, MODEL, build)
+
+    assert name in backend.caches
+    assert acquire(backend, KEY, MODEL, build) == name
+    assert build.calls == 1
+
+
+def test_refreshed_when_used_within_margin(coll):
+    backend = FakeCacheBackend()
+    name = acquire(backend, KEY, MODEL, Builds())
+    soon = datetime.utcnow() + timedelta(seconds=60)
+    coll.update_one({'key': KEY}, {'$set': {'expires_at': soon}})
+    backend.caches[name]['expires_at'] = soon
+
+    assert acquire(backend, KEY, MODEL, Builds()) == name
+
+    assert coll.find_one({'key': KEY})['expires_at'] > soon + timedelta(seconds=1000)
+    assert backend.caches[name]['expires_at'] > soon + timedelta(seconds=1000)
+
+
+def test_provider_losing_the_cache_recreates_it(coll):
+    backend, build = FakeCacheBackend(), Builds()
+    name = acquire(backend, KEY, MODEL, build)
+    coll.update_one({'key': KEY}, {'$set': {'expires_at': datetime.utcnow() + timedelta(seconds=60)}})
+    del backend.caches[name]
+
+    new_name = acquire(backend, KEY, MODEL, build)
+
+    assert new_name != name and new_name in backend.caches
+    assert build.calls == 2
+
+
+def test_not_cacheable_is_not_retried_until_the_window_ends(coll):
+    backend, build = FakeCacheBackend(min_chars=10_000), Builds()
+
+    assert acquire(backend, KEY, MODEL, build) is None
+    assert acquire(backend, KEY, MODEL, build) is None
+    assert build.calls == 1
+    assert coll.find_one({'key': KEY})['name'] is None
+
+    # Retry window over (the TTL index would have removed the record by now)
+    coll.update_one({'key': KEY}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    backend.min_chars = 0
+
+    name = acquire(backend, KEY, MODEL, build)
+    assert name in backend.caches
+    assert build.calls == 2
+    assert coll.count_documents({'key': KEY}) == 1
+
+
+def test_losing_the_create_race_uses_the_winner(coll):
+    backend = FakeCacheBackend()
+    winner, _ = backend.create(MODEL, PROMPT, [], 1800, KEY)
+
+    def build():
+        # Another worker registers the same context while this one is creating
+        coll.insert_one({'key': KEY, 'kind': 'prompt', 'model': MODEL, 'name': winner,
+                         'expires_at': datetime.utcnow() + timedelta(seconds=1800)})
+        return PROMPT, []
+
+    assert acquire(backend, KEY, MODEL, build) == winner
+    assert list(backend.caches) == [winner]  # the loser's provider cache was deleted
+    assert coll.count_documents({'key': KEY}) == 1
+
+
+def test_changed_content_replaces_the_cache(coll):
+    backend = FakeCacheBackend()
+    old = acquire(backend, KEY, MODEL, Builds(), expected_hash='a')
+
+    new = acquire(backend, KEY, MODEL, Builds(), expected_hash='b')
+
+    assert new != old
+    assert list(backend.caches) == [new]
+    assert coll.find_one({'key': KEY})['content_hash'] == 'b'
+
+
+def test_invalidate_forgets_the_record_and_the_provider_cache(coll):
+    backend = FakeCacheBackend()
+    name = acquire(backend, KEY, MODEL, Builds())
+
+    invalidate(backend, KEY)
+
+    assert coll.find_one({'key': KEY}) is None
+    assert name not in backend.caches
+    assert acquire(backend, KEY, MODEL) is None  # without build only an existing cache is used
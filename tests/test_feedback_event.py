@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+
+from models.feedback_event import FeedbackEventModel
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def test_feedback_on_cached_reply_is_accepted():
+    # /api/chat/mental reports provider 'semantic_cache' for replies served from the cache
+    raw = {'action': 'thumbs_up', 'style': 'concise', 'provider': 'semantic_cache', 'response_id': 'abc'}
+
+    doc = FeedbackEventModel.from_client(raw, 'a@x.edu', NOW)
+
+    assert doc['provider'] == 'semantic_cache'
+    assert doc['user_email'] == 'a@x.edu'
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        FeedbackEventModel.from_client({'action': 'copy', 'provider': 'bard'}, 'a@x.edu', NOW)
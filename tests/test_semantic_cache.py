@@ -0,0 +1,21 @@
+from services.semantic_cache import SemanticCache, cacheable
+
+HEARTBREAK = "Rahul broke up with me last night and I feel completely heartbroken and lost"
+
+
+def test_leading_name_is_not_served_to_another_student():
+    other = HEARTBREAK.replace('Rahul', 'Priya')
+    assert cacheable(HEARTBREAK) and cacheable(other)
+
+    cache = SemanticCache(max_entries=10, threshold=0.8, ttl_seconds=3600)
+    cache.store(HEARTBREAK, 'concise', "Rahul leaving must hurt.")
+
+    assert cache.lookup(other, 'concise') is None
+    assert cache.lookup(HEARTBREAK, 'concise')[0] == "Rahul leaving must hurt."
+
+
+def test_common_sentence_opener_still_matches():
+    cache = SemanticCache(max_entries=10, threshold=0.8, ttl_seconds=3600)
+    cache.store("so stressed about exams", 'concise', "Exams are a lot.")
+
+    assert cache.lookup("So stressed about exams", 'concise') is not None
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from models.student_state import StudentStateModel
+from services import student_state
+from services.student_state import touch_student, touch_student_batch, touch_students_bulk
+
+EMAIL = 's@x.edu'
+T0 = datetime(2026, 10, 19, 9, 0)
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient()['aura_test']
+    db[StudentStateModel.collection_name].create_index('user_email', unique=True)
+    db['users'].insert_one({'email': EMAIL, 'proctor_email': 'p@x.edu', 'department': 'cs'})
+    return db
+
+
+def race_once(monkeypatch, concurrent):
+    """Run `concurrent` between the first fold's read and its write."""
+    fold_update = student_state._fold_update
+    pending = [concurrent]
+
+    def racing(state, fields, readings):
+        update = fold_update(state, fields, readings)
+        if pending:
+            pending.pop()()
+        return update
+
+    monkeypatch.setattr(student_state, '_fold_update', racing)
+
+
+def test_concurrent_readings_are_both_folded(db, monkeypatch):
+    touch_student(db, EMAIL, score=40, at=T0)
+    race_once(monkeypatch, lambda: touch_student(db, EMAIL, score=80, at=T0 + timedelta(minutes=1)))
+
+    state = touch_student(db, EMAIL, score=60, at=T0 + timedelta(minutes=2))
+
+    assert state['ewma_n'] == 3
+    assert [r['score'] for r in state['recent']] == [40, 80, 60]
+
+
+def test_concurrent_first_readings_create_one_document(db, monkeypatch):
+    race_once(monkeypatch, lambda: touch_student(db, EMAIL, score=30, at=T0))
+
+    state = touch_student_batch(db, EMAIL, [{'score': 50, 'at': T0 + timedelta(minutes=1)}])
+
+    assert state['ewma_n'] == 2
+    assert db[StudentStateModel.collection_name].count_documents({}) == 1
+
+
+def test_bulk_refolds_only_the_reading_that_lost(db):
+    other = 'o@x.edu'
+    touch_student(db, EMAIL, score=40, at=T0)
+    touch_student(db, other, score=40, at=T0)
+    docs = [{'user_email': EMAIL, 'score': 70, 'created_at': T0 + timedelta(hours=1)},
+            {'user_email': other, 'score': 70, 'created_at': T0 + timedelta(hours=1)}]
+    coll = db[StudentStateModel.collection_name]
+    find = coll.find
+
+    def racing_find(*args, **kwargs):
+        coll.find = find
+        rows = list(find(*args, **kwargs))
+        touch_student(db, EMAIL, score=20, at=T0 + timedelta(minutes=30))  # lands after the batch read
+        return rows
+
+    coll.find = racing_find
+    states = touch_students_bulk(db, docs, {})
+
+    assert states[EMAIL]['ewma_n'] == 3 and states[other]['ewma_n'] == 2
+    assert [r['score'] for r in coll.find_one({'user_email': EMAIL})['recent']] == [40, 20, 70]
+    assert [r['score'] for r in coll.find_one({'user_email': other})['recent']] == [40, 70]
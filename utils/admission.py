@@ -0,0 +1,281 @@
+"""Admission control for LLM-backed endpoints, shared by all worker processes.
+
+Two limits, both kept in a small SQLite file so every gunicorn worker (and
+every thread in it) sees the same counters:
+
+* per-user token bucket: each chat/study request that needs a provider call
+  (not local fast-path or semantic-cache replies) costs one token; a user
+  holds at most ADMISSION_USER_BURST tokens, refilled at
+  ADMISSION_USER_RATE_PER_MIN. An empty bucket is an immediate 429 with
+  the time until the next token as Retry-After.
+* global provider slots: at most ADMISSION_MAX_CONCURRENT provider calls run
+  at once across the deployment. Up to ADMISSION_MAX_WAITING further calls
+  wait (polling) for up to ADMISSION_MAX_WAIT_SECONDS; beyond that, or on
+  timeout, the caller gets a 429 straight away instead of tying up a thread.
+
+Slots are leases: a worker killed mid-call frees its slot after
+ADMISSION_SLOT_LEASE_SECONDS. If the SQLite file cannot be used the limiter
+logs and lets requests through rather than failing them. Each transaction
+runs through utils.cooperative.offload, so under gevent a busy SQLite lock
+never blocks the worker's other requests; waiting for a slot is a plain
+(cooperative) sleep between transactions.
+
+    from utils.admission import Rejected, check_user, provider_slot
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Optional
+from config import Config
+from utils.cooperative import offload
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.05
+BUCKET_IDLE_SECONDS = 86400  # idle buckets are full again; drop their rows
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (user TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS waiters (id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; `retry_after` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    def __init__(self, path: str, user_rate_per_min: float, user_burst: int, max_concurrent: int,
+                 max_waiting: int, max_wait_seconds: float, lease_seconds: float):
+        self.path = path
+        self.rate = user_rate_per_min / 60.0
+        self.burst = float(user_burst)
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait_seconds
+        self.lease = lease_seconds
+        self._local = threading.local()
+        offload(lambda: self._conn().executescript(_SCHEMA))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _in_transaction(self, fn):
+        with self._transaction() as conn:
+            return fn(conn)
+
+    def _run(self, fn):
+        """`fn(conn)` in one transaction, off the event loop under gevent."""
+        return offload(self._in_transaction, fn)
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str) -> None:
+        conn.execute('INSERT INTO counters (name, value) VALUES (?, 1) '
+                     'ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,))
+
+    # ------------------------------------------------------------------
+    # Per-user token bucket
+    # ------------------------------------------------------------------
+    def check_user(self, user: str) -> None:
+        """Take one token for `user` or raise Rejected."""
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE user = ?', (user,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            admitted = tokens >= 1
+            if admitted:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (user, tokens, updated) VALUES (?, ?, ?)',
+                         (user, tokens, now))
+            self._count(conn, 'user_admitted' if admitted else 'user_rejected')
+            if random.random() < 0.01:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - BUCKET_IDLE_SECONDS,))
+            return admitted, tokens
+
+        admitted, tokens = self._run(take)
+        if not admitted:
+            raise Rejected('user_rate', (1 - tokens) / self.rate if self.rate else 60.0)
+
+    # ------------------------------------------------------------------
+    # Global provider slots
+    # ------------------------------------------------------------------
+    def _try_acquire(self, conn: sqlite3.Connection, now: float) -> Optional[int]:
+        conn.execute('DELETE FROM slots WHERE expires < ?', (now,))
+        in_use = conn.execute('SELECT COUNT(*) FROM slots').fetchone()[0]
+        if in_use >= self.max_concurrent:
+            return None
+        return conn.execute('INSERT INTO slots (pid, expires) VALUES (?, ?)',
+                            (os.getpid(), now + self.lease)).lastrowid
+
+    def acquire_slot(self) -> int:
+        """Return a slot id, waiting in the bounded queue if needed; raises Rejected."""
+        now = time.time()
+
+        def first(conn):
+            slot = self._try_acquire(conn, now)
+            if slot is not None:
+                self._count(conn, 'slot_immediate')
+                return slot, None
+            conn.execute('DELETE FROM waiters WHERE expires < ?', (now,))
+            waiting = conn.execute('SELECT COUNT(*) FROM waiters').fetchone()[0]
+            if waiting >= self.max_waiting:
+                self._count(conn, 'slot_rejected_full')
+                return None, None
+            return None, conn.execute('INSERT INTO waiters (pid, expires) VALUES (?, ?)',
+                                      (os.getpid(), now + self.max_wait + 1)).lastrowid
+
+        def retry(conn):
+            slot = self._try_acquire(conn, time.time())
+            if slot is not None:
+                self._count(conn, 'slot_waited')
+            return slot
+
+        slot, waiter = self._run(first)
+        if slot is not None:
+            return slot
+        if waiter is None:
+            raise Rejected('busy', self.max_wait)
+
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(POLL_SECONDS)
+                slot = self._run(retry)
+                if slot is not None:
+                    return slot
+            self._run(lambda conn: self._count(conn, 'slot_rejected_timeout'))
+            raise Rejected('busy', self.max_wait)
+        finally:
+            self._run(lambda conn: conn.execute('DELETE FROM waiters WHERE id = ?', (waiter,)))
+
+    def release_slot(self, slot: int) -> None:
+        self._run(lambda conn: conn.execute('DELETE FROM slots WHERE id = ?', (slot,)))
+
+    @contextmanager
+    def slot(self):
+        slot = self.acquire_slot()
+        try:
+            yield
+        finally:
+            self.release_slot(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        return offload(self._stats)
+
+    def _stats(self) -> Dict[str, Any]:
+        now = time.time()
+        conn = self._conn()
+        return {
+            'slots_in_use': conn.execute('SELECT COUNT(*) FROM slots WHERE expires >= ?', (now,)).fetchone()[0],
+            'waiting': conn.execute('SELECT COUNT(*) FROM waiters WHERE expires >= ?', (now,)).fetchone()[0],
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            **{name: value for name, value in conn.execute('SELECT name, value FROM counters')},
+        }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_pid: Optional[int] = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> Optional[AdmissionController]:
+    """This process's controller (SQLite handles are not shared across fork), or None if disabled."""
+    global _controller, _controller_pid
+    if not Config.ADMISSION_ENABLED:
+        return None
+    with _controller_lock:
+        if _controller_pid != os.getpid():
+            _controller = AdmissionController(
+                Config.ADMISSION_DB_PATH,
+                user_rate_per_min=Config.ADMISSION_USER_RATE_PER_MIN,
+                user_burst=Config.ADMISSION_USER_BURST,
+                max_concurrent=Config.ADMISSION_MAX_CONCURRENT,
+                max_waiting=Config.ADMISSION_MAX_WAITING,
+                max_wait_seconds=Config.ADMISSION_MAX_WAIT_SECONDS,
+                lease_seconds=Config.ADMISSION_SLOT_LEASE_SECONDS,
+            )
+            _controller_pid = os.getpid()
+        return _controller
+
+
+def check_user(user: str) -> None:
+    """Charge one request to `user`'s bucket; raises Rejected when it is empty."""
+    try:
+        controller = get_controller()
+        if controller is not None:
+            controller.check_user(user)
+    except sqlite3.Error as exc:
+        logger.warning(f"admission: user check skipped ({exc})")
+
+
+@contextmanager
+def provider_slot():
+    """Hold one global provider slot for the duration of the block."""
+    try:
+        controller = get_controller()
+        slot = controller.acquire_slot() if controller is not None else None
+    except sqlite3.Error as exc:
+        logger.warning(f"admission: provider slot skipped ({exc})")
+        controller, slot = None, None
+    try:
+        yield
+    finally:
+        if slot is not None:
+            try:
+                controller.release_slot(slot)
+            except sqlite3.Error as exc:
+                logger.warning(f"admission: slot {slot} not released, lease will expire ({exc})")
+
+
+def limit_provider(fn):
+    """Decorator: run `fn` inside a provider slot."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with provider_slot():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def stats() -> Optional[Dict[str, Any]]:
+    try:
+        controller = get_controller()
+        return controller.stats() if controller is not None else None
+    except sqlite3.Error as exc:
+        return {'error': str(exc)}
@@ -1,53 +1,85 @@
-from flask import current_app
-from flask_mail import Message
 from utils.database import get_db
-from datetime import datetime
+from config import Config
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
 
 
-def send_institutional_alert(student_email: str, score: int) -> None:
-    """Send alert to proctor and parent if configured, and log to DB."""
+def _dedupe_filter(student_emails, now: datetime) -> Dict[str, Any]:
+    return {
+        'student_email': student_emails if isinstance(student_emails, str) else {'$in': list(student_emails)},
+        'created_at': {'$gte': now - timedelta(minutes=Config.ALERT_DEDUP_WINDOW_MINUTES)},
+        'status': {'$in': ['pending', 'sending', 'sent', 'logged']},
+    }
+
+
+def send_institutional_alert(student_email: str, score: int, reason: str = 'threshold') -> None:
+    """Queue an alert for the student's proctor and parent; delivery happens in the background.
+
+    `reason` is 'threshold' (absolute ceiling), 'anomaly' (sharp rise over
+    the student's own baseline) or 'crisis' (crisis language in chat). A
+    repeat alert for the same student inside ALERT_DEDUP_WINDOW_MINUTES is
+    folded into the existing one; crisis alerts only fold into crisis alerts
+    so they are never hidden behind an earlier stress alert.
+    """
     db = get_db()
-    users = db['users']
     alerts = db['alerts']
+    now = datetime.utcnow()
 
-    student = users.find_one({'email': student_email}) or {}
-    # Pick first proctor as fallback
-    proctor = users.find_one({'role': 'proctor'}) or {}
-
-    recipients = []
-    if proctor.get('email'):
-        recipients.append(proctor['email'])
-    if student.get('parent_email'):
-        recipients.append(student['parent_email'])
+    dedupe = _dedupe_filter(student_email, now)
+    if reason == 'crisis':
+        dedupe['reason'] = 'crisis'
+    existing = alerts.find_one_and_update(
+        dedupe,
+        {'$inc': {'dup_count': 1}, '$max': {'score': score}, '$set': {'last_seen_at': now}},
+        sort=[('created_at', -1)],
+    )
+    if existing is not None:
+        return
 
-    # Log alert regardless of mail availability
     alerts.insert_one({
         'student_email': student_email,
         'score': score,
-        'proctor_email': proctor.get('email'),
-        'parent_email': student.get('parent_email'),
-        'created_at': datetime.utcnow(),
-        'status': 'sent' if recipients else 'logged',
+        'reason': reason,
+        'created_at': now,
+        'status': 'pending',
+        'attempts': 0,
     })
 
-    if not recipients:
-        return
+    from services.alert_dispatcher import ensure_dispatcher
+    ensure_dispatcher().wake()
 
-    mail_ext = current_app.extensions.get('mail') if current_app else None
-    if not mail_ext:
-        return
 
-    subject = f"AURA Alert: High Stress ({score}) for {student.get('name','student')}"
-    body = (
-        f"This is an automated alert from AURA.\n\n"
-        f"Student: {student.get('name','Unknown')} ({student_email})\n"
-        f"Stress score: {score}\n\n"
-        f"Please reach out and provide guidance."
-    )
+def queue_institutional_alerts(db, items: List[Tuple[Dict[str, Any], int, str]]) -> int:
+    """Record alerts as `pending` for later delivery instead of mailing inline.
+
+    `items` is a list of (student user document, score, reason). Used by batch jobs,
+    where sending mail per student would serialize the whole run on SMTP.
+    Students already alerted inside the dedupe window are folded into their
+    existing alert. Returns the number of new alerts.
+    """
+    if not items:
+        return 0
+    now = datetime.utcnow()
+    alerts = db['alerts']
+    emails = [student.get('email') for student, _, _ in items]
+    recent = set(alerts.distinct('student_email', _dedupe_filter(emails, now)))
+    if recent:
+        alerts.update_many(_dedupe_filter(recent, now), {'$inc': {'dup_count': 1}, '$set': {'last_seen_at': now}})
 
-    msg = Message(subject=subject, recipients=recipients, body=body)
-    try:
-        mail_ext.send(msg)
-    except Exception:
-        # Fail silently; alert already logged in DB
-        pass
+    docs = []
+    for student, score, reason in items:
+        if student.get('email') in recent:
+            continue
+        docs.append({
+            'student_email': student.get('email'),
+            'score': score,
+            'reason': reason,
+            'proctor_email': student.get('proctor_email'),
+            'parent_email': student.get('parent_email'),
+            'created_at': now,
+            'status': 'pending',
+            'attempts': 0,
+        })
+    if docs:
+        alerts.insert_many(docs, ordered=False)
+    return len(docs)
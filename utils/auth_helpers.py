@@ -2,14 +2,15 @@ import bcrypt
 from functools import wraps
 from flask import session, redirect, url_for, flash
 from typing import Callable
+from utils.cooperative import offload
 
 def verify_password(hashed_password: str, password: str) -> bool:
-    """Verify a password against a bcrypt hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """Verify a password against a bcrypt hash (off the event loop under gevent)."""
+    return offload(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def hash_password(password: str) -> str:
-    """Hash a password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Hash a password using bcrypt (off the event loop under gevent)."""
+    return offload(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def login_required(f: Callable) -> Callable:
     """Decorator to protect routes that require authentication."""
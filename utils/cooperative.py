@@ -0,0 +1,54 @@
+"""Cooperative (gevent) serving support.
+
+Under a gevent worker (`gunicorn -k gevent`) the process is monkey-patched:
+sockets, time.sleep, threading and queue yield to other greenlets. pymongo,
+the google-genai, Groq and OpenAI clients (httpx) and SMTP then need no
+changes, and one worker holds as many in-flight LLM calls and SSE feeds as
+it has memory for instead of one per thread.
+
+What does not yield is CPU- or disk-bound C code: bcrypt, file reads and
+writes, SQLite. `offload` runs those on gevent's native thread pool
+(COOPERATIVE_THREADPOOL_SIZE threads) so they do not stall every other
+request in the worker. Without gevent it simply calls the function.
+
+    from utils.cooperative import offload
+    ok = offload(bcrypt.checkpw, password, hashed)
+"""
+from typing import Any, Callable, Dict, TypeVar
+from config import Config
+
+# Optional: only present where the gevent worker is used
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:
+    gevent = None
+    monkey = None
+
+T = TypeVar('T')
+
+
+def cooperative() -> bool:
+    """True when running in a gevent-patched process."""
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def _pool():
+    pool = gevent.get_hub().threadpool
+    if pool.maxsize != Config.COOPERATIVE_THREADPOOL_SIZE:
+        pool.maxsize = Config.COOPERATIVE_THREADPOOL_SIZE
+    return pool
+
+
+def offload(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking `fn` off the event loop (gevent) or inline (threads)."""
+    if cooperative():
+        return _pool().apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def describe() -> Dict[str, Any]:
+    if not cooperative():
+        return {'mode': 'threads'}
+    pool = _pool()
+    return {'mode': 'gevent', 'threadpool_size': pool.maxsize, 'threadpool_busy': len(pool)}
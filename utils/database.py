@@ -1,12 +1,116 @@
+import os
 import ssl
+import logging
+import threading
 from typing import Any, Dict
-from pymongo import MongoClient, ASCENDING, errors
+from pymongo import MongoClient, ASCENDING, ReadPreference, errors
+from pymongo.monitoring import ConnectionPoolListener
 from datetime import datetime
 from config import Config
-from models import UserModel, ChatModel, MoodModel, StressModel
+from models import (
+    UserModel, ChatModel, MoodModel, StressModel, StudentStateModel, WellnessCubeModel,
+    GrievanceModel, AlertModel, ProctorNoteModel, FeedbackEventModel, FeedbackDailyModel,
+    SyncReceiptModel, IdempotencyKeyModel, ContextCacheModel,
+)
 
+# Models whose indexes are managed here and by `python -m utils.indexes`
+MANAGED_MODELS = (
+    UserModel, ChatModel, MoodModel, StressModel, StudentStateModel, WellnessCubeModel,
+    GrievanceModel, AlertModel, ProctorNoteModel, FeedbackEventModel, FeedbackDailyModel,
+    SyncReceiptModel, IdempotencyKeyModel, ContextCacheModel,
+)
+
+logger = logging.getLogger(__name__)
+
+# One client per process. A MongoClient must not cross a fork, so the client is
+# built lazily on first use and discarded in forked children (see _reset_after_fork).
 client: MongoClient | None = None
 db = None
+_client_pid: int | None = None
+_indexes_ready = False
+_lock = threading.Lock()
+
+
+class PoolStats(ConnectionPoolListener):
+    """Counts connection pool activity for this process's client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.peak_in_use = 0
+        self.peak_waiting = 0
+        self.checkouts = 0
+        self.wait_timeouts = 0
+        self.checkout_errors = 0
+        self.cleared = 0
+
+    def _bump(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+    def pool_cleared(self, event):
+        self._bump(cleared=1)
+
+    def connection_created(self, event):
+        self._bump(open=1)
+
+    def connection_closed(self, event):
+        self._bump(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._bump(waiting=1)
+
+    def connection_checked_out(self, event):
+        self._bump(waiting=-1, in_use=1, checkouts=1)
+
+    def connection_check_out_failed(self, event):
+        if event.reason == 'timeout':
+            self._bump(waiting=-1, wait_timeouts=1)
+        else:
+            self._bump(waiting=-1, checkout_errors=1)
+
+    def connection_checked_in(self, event):
+        self._bump(in_use=-1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        max_size = Config.MONGODB_MAX_POOL_SIZE or None
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'max_pool_size': max_size,
+                'open': self.open,
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'peak_in_use': self.peak_in_use,
+                'peak_waiting': self.peak_waiting,
+                'saturation': round(self.in_use / max_size, 3) if max_size else None,
+                'checkouts': self.checkouts,
+                'wait_timeouts': self.wait_timeouts,
+                'checkout_errors': self.checkout_errors,
+                'pool_cleared': self.cleared,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def _timeout(ms: int):
+    # 0 in Config means "no timeout"; pymongo expects None for that
+    return ms or None
+
 
 def _build_client() -> MongoClient:
     if not Config.MONGODB_URI:
@@ -18,38 +122,106 @@ def _build_client() -> MongoClient:
             Config.MONGODB_URI,
             **({'tls': tls} if tls else {}),
             serverSelectionTimeoutMS=5000,
+            maxPoolSize=Config.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=Config.MONGODB_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=_timeout(Config.MONGODB_WAIT_QUEUE_TIMEOUT_MS),
+            socketTimeoutMS=_timeout(Config.MONGODB_SOCKET_TIMEOUT_MS),
+            connectTimeoutMS=_timeout(Config.MONGODB_CONNECT_TIMEOUT_MS),
+            event_listeners=[pool_stats],
         )
         # Trigger server selection to validate connection
         client.admin.command('ping')
         return client
     except errors.ServerSelectionTimeoutError as e:
+        client.close()
         raise RuntimeError(f'MongoDB connection timeout: {e}')
     except Exception as e:
         raise RuntimeError(f'Failed to connect to MongoDB: {e}')
 
+
+def _reset_after_fork() -> None:
+    """Drop the parent's client in a forked child; the next get_db() builds a new one.
+
+    The parent's sockets are shared with the child, so the client is abandoned
+    rather than closed.
+    """
+    global client, db, _client_pid, _lock
+    client = None
+    db = None
+    _client_pid = None
+    _lock = threading.Lock()
+    pool_stats.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client() -> MongoClient:
+    """Return this process's MongoClient, creating it on first use."""
+    global client, db, _client_pid, _indexes_ready
+    if client is not None and _client_pid == os.getpid():
+        return client
+    with _lock:
+        if client is None or _client_pid != os.getpid():
+            client = _build_client()
+            db = client[Config.MONGODB_DB_NAME]
+            _client_pid = os.getpid()
+            if not _indexes_ready:
+                _ensure_indexes(db)
+                _indexes_ready = True
+    return client
+
+
+def index_keys(field):
+    """Normalize an index_specs() key (field name or compound key list)."""
+    return field if isinstance(field, list) else [(field, ASCENDING)]
+
+
+def is_timeseries(database, name: str) -> bool:
+    info = next(iter(database.list_collections(filter={'name': name})), None)
+    return bool(info) and info.get('type') == 'timeseries'
+
+
+def _ensure_collection(database, model) -> None:
+    """Create time-series collections up front; create_index would make a plain one."""
+    options = model.timeseries_options() if hasattr(model, 'timeseries_options') else None
+    if not options:
+        return
+    if model.collection_name not in database.list_collection_names():
+        database.create_collection(model.collection_name, timeseries=options)
+    elif not is_timeseries(database, model.collection_name):
+        logger.warning(f"'{model.collection_name}' is a regular collection but READINGS_TIMESERIES is on; "
+                       f"run: python -m utils.timeseries migrate")
+
+
+def ensure_index(coll, field, options: Dict[str, Any]) -> None:
+    """create_index; a TTL index whose window changed is moved to the new one (collMod)."""
+    keys = index_keys(field)
+    try:
+        coll.create_index(keys, **options)
+    except errors.OperationFailure as exc:
+        if exc.code != 85:  # IndexOptionsConflict: same keys, different options
+            raise
+        if 'expireAfterSeconds' not in options:
+            logger.warning(f"{coll.name}: index {keys} exists with different options: {exc}")
+            return
+        try:
+            coll.database.command('collMod', coll.name, index={
+                'keyPattern': dict(keys), 'expireAfterSeconds': options['expireAfterSeconds']})
+        except errors.OperationFailure as mod_exc:
+            # Turning a plain index into a TTL index needs MongoDB 5.1+
+            logger.error(f"{coll.name}: could not set expireAfterSeconds on {keys} ({mod_exc}); "
+                         f"drop the index and restart to rebuild it")
+
+
 def _ensure_indexes(database) -> None:
-    models = [UserModel, ChatModel, MoodModel, StressModel]
-    for model in models:
+    """Create every declared index that is missing (no-op for existing ones)."""
+    for model in MANAGED_MODELS:
+        _ensure_collection(database, model)
         coll = database[model.collection_name]
-        # Common indexes
-        if hasattr(model, 'index_specs'):
-            for field, options in model.index_specs():
-                coll.create_index([(field, ASCENDING)], **options)
-        else:
-            # Default indexes per model
-            if model is UserModel:
-                coll.create_index([('email', ASCENDING)], unique=True)
-                coll.create_index([('created_at', ASCENDING)])
-            elif model is ChatModel:
-                coll.create_index([('user_email', ASCENDING)])
-                coll.create_index([('type', ASCENDING)])
-                coll.create_index([('created_at', ASCENDING)])
-            elif model is MoodModel:
-                coll.create_index([('user_email', ASCENDING)])
-                coll.create_index([('created_at', ASCENDING)])
-            elif model is StressModel:
-                coll.create_index([('user_email', ASCENDING)])
-                coll.create_index([('created_at', ASCENDING)])
+        for field, options in model.index_specs():
+            ensure_index(coll, field, options)
 
 def seed_demo_data(database) -> Dict[str, Any]:
     from utils.auth_helpers import hash_password
@@ -152,21 +324,44 @@ def create_demo_users(database) -> int:
     return inserted
 
 def init_db(app=None):
-    global client, db
-    client = _build_client()
-    db = client[Config.MONGODB_DB_NAME]
-    _ensure_indexes(db)
+    """Connect and ensure indexes. Optional: get_db() does this lazily per process."""
+    get_client()
     return db
 
 
 def get_db():
     """Return an active database connection, initializing if needed."""
-    global db, client
-    if db is not None:
+    if db is not None and _client_pid == os.getpid():
         return db
-    # Attempt to initialize if not already done
     try:
-        init_db()
+        get_client()
         return db
     except Exception as exc:
         raise RuntimeError(f'Database connection failed: {exc}')
+
+
+_READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST,
+}
+
+
+def get_analytics_db():
+    """Database handle for dashboard aggregations.
+
+    Uses MONGODB_ANALYTICS_READ_PREFERENCE (secondaryPreferred by default) so
+    heavy HOD/proctor reads can be served by secondaries; on a standalone
+    server this behaves like get_db(). Reads may lag the primary slightly.
+    """
+    name = Config.MONGODB_ANALYTICS_READ_PREFERENCE
+    pref = _READ_PREFERENCES.get(name)
+    if pref is None:
+        raise RuntimeError(f'Unknown MONGODB_ANALYTICS_READ_PREFERENCE: {name}')
+    return get_db().with_options(read_preference=pref)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return pool_stats.snapshot()
@@ -0,0 +1,157 @@
+"""Idempotency-Key support for expensive POST endpoints (LLM calls).
+
+Clients send a unique `Idempotency-Key` header per logical request and reuse
+it on retries. Decorated views then behave as follows:
+
+* first request: the key is recorded as `in_progress` and the view runs; the
+  response is stored and the key marked `completed`.
+* duplicate while the first is still running: held until it finishes (up to
+  IDEMPOTENCY_WAIT_SECONDS), then answered with the stored response; on
+  timeout, 409 with Retry-After.
+* duplicate after completion: the stored response is replayed with an
+  `Idempotent-Replayed: true` header; the view does not run again.
+* same key with a different body or endpoint: 422.
+
+A 5xx, a 429 (not admitted, see utils.admission) or an exception releases
+the key so the client can retry for real. If a worker dies mid-request its
+key is taken over once `lease_until` passes. Records expire after
+IDEMPOTENCY_TTL_HOURS via a TTL index. Requests without the header, without
+a session, or while MongoDB is down run as before.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Any, Dict, Optional
+from flask import g, jsonify, make_response, request, session
+from pymongo import ReturnDocument, errors
+from config import Config
+from models.idempotency_key import IdempotencyKeyModel
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 128
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode('utf-8'))
+    if request.mimetype == 'multipart/form-data':
+        # The boundary differs on every retry, so hash the parsed parts instead
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"{name}={value}\n".encode('utf-8'))
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"{name}:{upload.filename}\n".encode('utf-8'))
+            for chunk in iter(lambda: upload.stream.read(65536), b''):
+                digest.update(chunk)
+            upload.stream.seek(0)
+    else:
+        # Cached, so the view can still call get_json afterwards
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(record: Dict[str, Any]):
+    stored = record['response']
+    resp = make_response(stored['body'], stored['status_code'])
+    resp.mimetype = stored.get('mimetype') or 'application/json'
+    resp.headers['Idempotent-Replayed'] = 'true'
+    return resp
+
+
+def _claim(coll, user_email: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Record the key as in progress; returns the existing record if it was taken."""
+    now = datetime.utcnow()
+    try:
+        coll.insert_one({
+            'user_email': user_email, 'key': key, 'fingerprint': fingerprint,
+            'status': 'in_progress', 'created_at': now,
+            'lease_until': now + timedelta(seconds=Config.IDEMPOTENCY_LEASE_SECONDS),
+            'expires_at': now + timedelta(hours=Config.IDEMPOTENCY_TTL_HOURS),
+        })
+        return None
+    except errors.DuplicateKeyError:
+        return coll.find_one({'user_email': user_email, 'key': key}) or {'status': 'released'}
+
+
+def _take_over(coll, user_email: str, key: str) -> bool:
+    """Claim a key whose holder's lease ran out (or that was released meanwhile)."""
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=Config.IDEMPOTENCY_LEASE_SECONDS)
+    doc = coll.find_one_and_update(
+        {'user_email': user_email, 'key': key, 'status': 'in_progress', 'lease_until': {'$lt': now}},
+        {'$set': {'lease_until': lease}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc is not None
+
+
+def _wait(coll, user_email: str, key: str) -> Optional[Dict[str, Any]]:
+    """Poll until the key completes, is released or its lease expires; None on timeout."""
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.1
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        record = coll.find_one({'user_email': user_email, 'key': key})
+        if record is None or record['status'] == 'completed' or record['lease_until'] < datetime.utcnow():
+            return record or {'status': 'released'}
+    return None
+
+
+def idempotent(view):
+    """Decorator for POST views; see the module docstring."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER, '').strip()
+        user_email = session.get('user_email')
+        if not key or not user_email or g.get('idempotency_key'):
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+        try:
+            coll = get_db()[IdempotencyKeyModel.collection_name]
+        except Exception as exc:
+            logger.warning(f"idempotency disabled, database unavailable: {exc}")
+            return view(*args, **kwargs)
+
+        fingerprint = _fingerprint()
+        existing = _claim(coll, user_email, key, fingerprint)
+        while existing is not None:
+            if existing.get('fingerprint') not in (None, fingerprint):
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+            if existing['status'] == 'completed':
+                return _replay(existing)
+            if existing['status'] == 'released':
+                existing = _claim(coll, user_email, key, fingerprint)
+                continue
+            if existing['lease_until'] < datetime.utcnow() and _take_over(coll, user_email, key):
+                break
+            existing = _wait(coll, user_email, key)
+            if existing is None:
+                resp = jsonify({'error': 'The original request is still being processed'})
+                resp.headers['Retry-After'] = '2'
+                return resp, 409
+
+        g.idempotency_key = key
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except Exception:
+            coll.delete_one({'user_email': user_email, 'key': key, 'status': 'in_progress'})
+            raise
+        if resp.status_code >= 500 or resp.status_code == 429 or resp.is_streamed:
+            coll.delete_one({'user_email': user_email, 'key': key, 'status': 'in_progress'})
+            return resp
+        coll.update_one({'user_email': user_email, 'key': key}, {
+            '$set': {'status': 'completed', 'response': {
+                'status_code': resp.status_code,
+                'mimetype': resp.mimetype,
+                'body': resp.get_data(as_text=True),
+            }},
+            '$unset': {'lease_until': ''},
+        })
+        return resp
+    return wrapper
@@ -0,0 +1,208 @@
+"""Index migration and verification for the collections in MANAGED_MODELS.
+
+Models declare their indexes in `index_specs()`. This command builds what is
+missing, drops indexes no model declares any more (e.g. the old single-field
+`user_email_1` that a compound index now covers), and checks with `explain`
+that every query registered in ROUTE_QUERIES is served by an index:
+
+    python -m utils.indexes plan       # show what would change
+    python -m utils.indexes migrate    # build, then drop superseded
+    python -m utils.indexes verify     # explain every route query, fail on COLLSCAN
+
+On MongoDB 4.2+ index builds no longer hold an exclusive lock for their whole
+duration, so building on a live deployment is safe; `background` is still
+passed for older servers.
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from bson import ObjectId
+from utils.database import MANAGED_MODELS, index_keys
+
+logger = logging.getLogger(__name__)
+
+# Representative shape of each query issued by routes/ and the services they
+# call. Values are placeholders; only the plan shape matters to explain().
+_EMAIL = 'student@aura.edu'
+_PROCTOR = 'proctor@aura.edu'
+_SINCE = datetime(2000, 1, 1)
+
+ROUTE_QUERIES: List[Dict[str, Any]] = [
+    {'name': 'auth.login', 'collection': 'users', 'filter': {'email': _EMAIL}},
+    {'name': 'proctor.roster', 'collection': 'users',
+     'filter': {'role': 'student', 'proctor_email': _PROCTOR}},
+    {'name': 'proctor.roster.mood_lookup', 'collection': 'moods',
+     'filter': {'user_email': _EMAIL}, 'sort': [('created_at', -1)], 'limit': 1},
+    {'name': 'proctor.roster.stress_lookup', 'collection': 'stress',
+     'filter': {'user_email': _EMAIL, 'created_at': {'$gte': _SINCE}}, 'sort': [('created_at', 1)]},
+    {'name': 'proctor.grievances', 'collection': 'grievances',
+     'filter': {'status': {'$in': ['pending', 'in_progress']}}, 'sort': [('created_at', -1)]},
+    {'name': 'proctor.student_detail.chats', 'collection': 'chats',
+     'filter': {'user_email': _EMAIL, 'type': 'mental'}, 'sort': [('created_at', -1)], 'limit': 10},
+    {'name': 'proctor.student_detail.grievances', 'collection': 'grievances',
+     'filter': {'user_email': _EMAIL}, 'sort': [('created_at', -1)]},
+    {'name': 'proctor.student_detail.notes', 'collection': 'proctor_notes',
+     'filter': {'user_email': _EMAIL}, 'sort': [('created_at', -1)]},
+    {'name': 'proctor.student_detail.history', 'collection': 'stress', 'pipeline': [
+        {'$match': {'user_email': _EMAIL, 'created_at': {'$gte': _SINCE}}},
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                    'avg_score': {'$avg': '$score'}}},
+    ]},
+    {'name': 'proctor.at_risk', 'collection': 'student_state',
+     'filter': {'proctor_email': _PROCTOR, 'risk': {'$exists': True}}, 'sort': [('risk', -1)], 'limit': 20},
+    {'name': 'proctor.delta', 'collection': 'student_state',
+     'filter': {'proctor_email': _PROCTOR, 'updated_at': {'$gte': _SINCE}}, 'limit': 201},
+    {'name': 'hod.wellness', 'collection': 'wellness_cube',
+     'filter': {'grain': 'department', 'day': {'$gte': '2000-01-01'}}},
+    {'name': 'chat.context', 'collection': 'chats',
+     'filter': {'user_email': _EMAIL, 'type': 'mental'}, 'sort': [('created_at', -1)], 'limit': 20},
+    {'name': 'chat.conversation_turn', 'collection': 'chats',
+     'filter': {'user_email': _EMAIL, 'type': 'mental', 'conversation_id': 'c-0'}, 'limit': 1},
+    {'name': 'chat.history', 'collection': 'chats',
+     'filter': {'user_email': _EMAIL, 'type': 'mental',
+                '$or': [{'created_at': {'$lt': _SINCE}}, {'created_at': _SINCE, '_id': {'$lt': ObjectId()}}]},
+     'sort': [('created_at', -1), ('_id', -1)], 'limit': 51},
+    {'name': 'chat.export', 'collection': 'chats',
+     'filter': {'user_email': _EMAIL, 'type': 'mental'}, 'sort': [('created_at', 1), ('_id', 1)]},
+    {'name': 'student.stress_latest', 'collection': 'stress',
+     'filter': {'user_email': _EMAIL}, 'sort': [('created_at', -1)], 'limit': 1},
+    {'name': 'student.stress_today', 'collection': 'stress',
+     'filter': {'user_email': _EMAIL, 'created_at': {'$gte': _SINCE}}},
+    {'name': 'student.mood_latest', 'collection': 'moods',
+     'filter': {'user_email': _EMAIL}, 'sort': [('created_at', -1)], 'limit': 1},
+    {'name': 'student.streak', 'collection': 'stress', 'pipeline': [
+        {'$match': {'user_email': _EMAIL}},
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}}}},
+    ]},
+    {'name': 'student.sync_receipts', 'collection': 'sync_receipts',
+     'filter': {'user_email': _EMAIL, 'key': {'$in': ['k1', 'k2']}}},
+    {'name': 'study.context_cache', 'collection': 'context_caches',
+     'filter': {'key': f'document:{_EMAIL}:conv-1'}},
+    {'name': 'alerts.dedupe', 'collection': 'alerts',
+     'filter': {'student_email': _EMAIL, 'created_at': {'$gte': _SINCE},
+                'status': {'$in': ['pending', 'sending', 'sent', 'logged']}}, 'sort': [('created_at', -1)]},
+    {'name': 'alerts.claim', 'collection': 'alerts',
+     'filter': {'$or': [{'status': 'pending', 'next_attempt_at': {'$not': {'$gt': _SINCE}}},
+                        {'status': 'sending', 'lease_until': {'$lt': _SINCE}}]},
+     'sort': [('created_at', 1)], 'limit': 1},
+    {'name': 'batch.walk', 'collection': 'users',
+     'filter': {'role': 'student', 'email': {'$gt': ''}}, 'sort': [('email', 1)], 'limit': 500},
+    {'name': 'retention.chats', 'collection': 'chats',
+     'filter': {'created_at': {'$gte': _SINCE, '$lt': _SINCE}}, 'sort': [('created_at', 1)], 'limit': 2000},
+    {'name': 'retention.alerts', 'collection': 'alerts',
+     'filter': {'status': {'$in': ['sent', 'logged', 'failed']}, 'created_at': {'$gte': _SINCE, '$lt': _SINCE}},
+     'sort': [('created_at', 1)], 'limit': 2000},
+    {'name': 'batch.resume_check', 'collection': 'stress',
+     'filter': {'batch_id': 'daily-2000-01-01', 'user_email': {'$in': [_EMAIL]}}},
+]
+
+
+def _key_tuple(keys) -> Tuple:
+    return tuple((k, int(v) if isinstance(v, (int, float)) else v) for k, v in keys)
+
+
+def plan(db) -> Dict[str, Dict[str, List]]:
+    """Compare declared and existing indexes per collection."""
+    result = {}
+    for model in MANAGED_MODELS:
+        coll = db[model.collection_name]
+        existing = {name: _key_tuple(info['key']) for name, info in coll.index_information().items()}
+        declared = [(index_keys(field), options) for field, options in model.index_specs()]
+        declared_keys = {_key_tuple(keys) for keys, _ in declared}
+        result[model.collection_name] = {
+            'create': [(keys, options) for keys, options in declared
+                       if _key_tuple(keys) not in existing.values()],
+            'drop': [name for name, keys in existing.items()
+                     if name != '_id_' and keys not in declared_keys],
+        }
+    return result
+
+
+def migrate(db, drop: bool = True) -> Dict[str, Dict[str, List]]:
+    """Build missing indexes first, then drop superseded ones, so no query loses its index."""
+    changes = plan(db)
+    for coll_name, change in changes.items():
+        for keys, options in change['create']:
+            logger.info(f"{coll_name}: building {keys}")
+            db[coll_name].create_index(keys, background=True, **options)
+    if drop:
+        for coll_name, change in changes.items():
+            for name in change['drop']:
+                logger.info(f"{coll_name}: dropping {name}")
+                db[coll_name].drop_index(name)
+    return changes
+
+
+def _stages(node) -> List[str]:
+    """All plan stage names in an explain() document, at any depth."""
+    found = []
+    if isinstance(node, dict):
+        if 'stage' in node:
+            found.append(node['stage'])
+        for value in node.values():
+            found.extend(_stages(value))
+    elif isinstance(node, list):
+        for item in node:
+            found.extend(_stages(item))
+    return found
+
+
+def explain(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    if 'pipeline' in query:
+        cmd = {'aggregate': query['collection'], 'pipeline': query['pipeline'], 'cursor': {}}
+    else:
+        cmd = {'find': query['collection'], 'filter': query['filter']}
+        if query.get('sort'):
+            cmd['sort'] = dict(query['sort'])
+        if query.get('limit'):
+            cmd['limit'] = query['limit']
+    return db.command({'explain': cmd, 'verbosity': 'queryPlanner'})
+
+
+def verify(db, queries: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Explain each registered query; returns one row per query with its plan stages."""
+    rows = []
+    for query in queries or ROUTE_QUERIES:
+        stages = _stages(explain(db, query))
+        rows.append({
+            'name': query['name'],
+            'collection': query['collection'],
+            'stages': stages,
+            'ok': 'COLLSCAN' not in stages,
+        })
+    return rows
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Manage and verify MongoDB indexes.')
+    parser.add_argument('command', choices=['plan', 'migrate', 'verify'])
+    parser.add_argument('--keep-extra', action='store_true', help='Do not drop undeclared indexes')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db = get_db()
+
+    if args.command in ('plan', 'migrate'):
+        changes = migrate(db, drop=not args.keep_extra) if args.command == 'migrate' else plan(db)
+        for coll_name, change in changes.items():
+            for keys, options in change['create']:
+                print(f"{coll_name}: + {keys} {options or ''}")
+            for name in change['drop']:
+                print(f"{coll_name}: - {name}{' (kept)' if args.keep_extra else ''}")
+        if args.command == 'plan':
+            return
+
+    rows = verify(db)
+    for row in rows:
+        print(f"{'ok  ' if row['ok'] else 'SCAN'} {row['name']:<36} {row['collection']:<14} "
+              f"{' > '.join(dict.fromkeys(row['stages']))}")
+    if not all(row['ok'] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Worker lifecycle for graceful drain (see gunicorn.conf.py).
+
+When a gunicorn worker is told to stop (SIGTERM on deploy, or max_requests
+recycling) it stops accepting connections and gives in-flight requests
+`graceful_timeout` seconds to finish. Chat and study calls finish on their
+own; long-lived streams do not, so they poll `draining()` and end, and the
+browser's EventSource reconnects to a live worker. /health answers 503
+while draining so a load balancer stops routing here.
+
+`shutdown()` then flushes write-behind queues and stops the background
+threads before the process exits.
+"""
+import logging
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_drain = threading.Event()
+_worker: Optional[Any] = None
+
+
+def attach(worker: Any) -> None:
+    """Follow a gunicorn worker's `alive` flag (post_worker_init hook)."""
+    global _worker
+    _worker = worker
+
+
+def begin_drain() -> None:
+    _drain.set()
+
+
+def draining() -> bool:
+    return _drain.is_set() or (_worker is not None and not _worker.alive)
+
+
+def shutdown() -> None:
+    """Flush and stop this process's background work (worker_exit hook)."""
+    from services import write_behind
+    from services.alert_dispatcher import get_dispatcher
+    from services.alert_feed import get_feed
+
+    begin_drain()
+    get_feed().stop()
+    get_dispatcher().stop()
+    write_behind.stop_all()
+    logger.info("Worker drained: write-behind flushed, background threads stopped")
@@ -0,0 +1,54 @@
+"""Keyset (seek) pagination and NDJSON streaming over MongoDB cursors.
+
+Pages are ordered by (created_at, _id) descending and continued from an opaque
+cursor instead of `skip`, so page N costs the same as page 1 and rows inserted
+meanwhile never shift a page. The collection needs an index ending in
+(created_at desc, _id desc) after its equality fields.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_keyset(doc: Dict[str, Any], field: str = 'created_at') -> str:
+    """Cursor for the row after `doc`: '<ms since epoch>_<ObjectId hex>'."""
+    ms = int((doc[field] - _EPOCH).total_seconds() * 1000)
+    return f"{ms}_{doc['_id']}"
+
+
+def decode_keyset(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        ms, oid = cursor.split('_', 1)
+        return _EPOCH + timedelta(milliseconds=int(ms)), ObjectId(oid)
+    except (AttributeError, ValueError, InvalidId):
+        raise ValueError('invalid cursor')
+
+
+def keyset_page(coll, query: Dict[str, Any], limit: int, before: Optional[str] = None,
+                projection: Optional[Dict[str, Any]] = None,
+                field: str = 'created_at') -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return (rows newest first, cursor for the next older page or None).
+
+    Raises ValueError for a malformed `before` cursor.
+    """
+    query = dict(query)
+    if before:
+        at, oid = decode_keyset(before)
+        query['$or'] = [{field: {'$lt': at}}, {field: at, '_id': {'$lt': oid}}]
+    if projection is not None:
+        projection = {**projection, field: 1}
+    rows = list(coll.find(query, projection).sort([(field, -1), ('_id', -1)]).limit(limit + 1))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_keyset(rows[-1], field)
+    return rows, None
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]], serialize: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Iterator[str]:
+    """Yield one JSON line per row as the cursor produces them (nothing is buffered)."""
+    for row in rows:
+        yield json.dumps(serialize(row), ensure_ascii=False) + '\n'
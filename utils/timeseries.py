@@ -0,0 +1,162 @@
+"""Move stress/mood readings into MongoDB time-series collections.
+
+With READINGS_TIMESERIES=true, `stress` and `moods` are created as time-series
+collections (timeField=created_at, metaField=user_email). Existing plain
+collections are converted with:
+
+    python -m utils.timeseries migrate                 # both collections
+    python -m utils.timeseries migrate --collection stress --batch-size 10000
+    python -m utils.timeseries stats                   # size of new vs legacy
+
+Migration renames the plain collection to `<name>_legacy`, creates the
+time-series collection under the original name (new writes land there at
+once) and copies the legacy documents across in `_id` order. Progress is
+checkpointed in `migrations`, so an interrupted copy can simply be re-run.
+Stop the app for the rename step: a write racing the rename would recreate
+a plain collection. The legacy collection is kept until `--drop-legacy`.
+
+Reads need no changes: every query on these collections filters on
+`user_email` and/or a `created_at` range, which time-series collections serve
+from their (meta, time) bucket index. Change streams do not report
+time-series writes, so the live feed follows `student_state` instead
+(see services.alert_feed).
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+from models import MoodModel, StressModel
+from utils.database import index_keys, is_timeseries
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = 'migrations'
+READING_MODELS = {m.collection_name: m for m in (StressModel, MoodModel)}
+
+
+def _checkpoint_id(name: str) -> str:
+    return f"timeseries:{name}"
+
+
+def migrate(db, model, batch_size: int = 5000, drop_legacy: bool = False) -> Dict[str, Any]:
+    """Convert one readings collection; safe to re-run after an interruption."""
+    name = model.collection_name
+    legacy = f"{name}_legacy"
+    options = model.timeseries_options()
+    if not options:
+        raise RuntimeError('Set READINGS_TIMESERIES=true before migrating')
+
+    jobs = db[MIGRATIONS_COLLECTION]
+    job = jobs.find_one({'_id': _checkpoint_id(name)})
+    if job and job.get('status') == 'completed':
+        logger.info(f"{name}: already migrated")
+        return job
+
+    existing = db.list_collection_names()
+    if name in existing and not is_timeseries(db, name):
+        if legacy in existing:
+            raise RuntimeError(f"Both '{name}' and '{legacy}' are plain collections; resolve manually")
+        db[name].rename(legacy)
+        logger.info(f"{name}: renamed to {legacy}")
+    if name not in db.list_collection_names():
+        db.create_collection(name, timeseries=options)
+        for field, index_options in model.index_specs():
+            db[name].create_index(index_keys(field), **index_options)
+        logger.info(f"{name}: created time-series collection {options}")
+    if legacy not in db.list_collection_names():
+        jobs.update_one({'_id': _checkpoint_id(name)}, {'$set': {
+            'status': 'completed', 'copied': 0, 'finished_at': datetime.utcnow()}}, upsert=True)
+        return jobs.find_one({'_id': _checkpoint_id(name)})
+
+    resumed = job is not None
+    if not job:
+        job = {'_id': _checkpoint_id(name), 'status': 'running', 'last_id': None,
+               'copied': 0, 'skipped': 0, 'started_at': datetime.utcnow()}
+        jobs.insert_one(job)
+
+    source, target = db[legacy], db[name]
+    last_id = job.get('last_id')
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(source.find(query).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        # The timeField is mandatory in a time-series collection
+        valid = [d for d in docs if isinstance(d.get('created_at'), datetime)]
+        if resumed:
+            # The chunk after a crash may already be partly copied
+            valid = _not_yet_copied(target, valid)
+            resumed = False
+        if valid:
+            target.insert_many(valid, ordered=False)
+        last_id = docs[-1]['_id']
+        jobs.update_one({'_id': _checkpoint_id(name)}, {
+            '$set': {'last_id': last_id, 'updated_at': datetime.utcnow()},
+            '$inc': {'copied': len(valid), 'skipped': len(docs) - len(valid)},
+        })
+        logger.info(f"{name}: copied {len(valid)} (through {last_id})")
+
+    jobs.update_one({'_id': _checkpoint_id(name)}, {'$set': {
+        'status': 'completed', 'finished_at': datetime.utcnow()}})
+    job = jobs.find_one({'_id': _checkpoint_id(name)})
+
+    if drop_legacy:
+        if target.count_documents({}) >= source.count_documents({}) - job.get('skipped', 0):
+            source.drop()
+            logger.info(f"{name}: dropped {legacy}")
+        else:
+            logger.warning(f"{name}: counts differ, keeping {legacy}")
+    return job
+
+
+def _not_yet_copied(target, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    emails = list({d.get('user_email') for d in docs})
+    done = {d['_id'] for d in target.find(
+        {'user_email': {'$in': emails}, '_id': {'$in': [d['_id'] for d in docs]}}, {'_id': 1})}
+    return [d for d in docs if d['_id'] not in done]
+
+
+def stats(db) -> List[Dict[str, Any]]:
+    """Storage and index size of each readings collection and its legacy copy."""
+    rows = []
+    existing = set(db.list_collection_names())
+    for name in READING_MODELS:
+        for coll_name in (name, f"{name}_legacy"):
+            if coll_name not in existing:
+                continue
+            st = db.command('collStats', coll_name)
+            rows.append({
+                'collection': coll_name,
+                'timeseries': is_timeseries(db, coll_name),
+                'count': db[coll_name].count_documents({}),
+                'storage_bytes': st.get('storageSize', 0),
+                'index_bytes': st.get('totalIndexSize', 0),
+            })
+    return rows
+
+
+def main() -> None:
+    from utils.database import get_db
+
+    parser = argparse.ArgumentParser(description='Store readings as MongoDB time-series collections.')
+    parser.add_argument('command', choices=['migrate', 'stats'])
+    parser.add_argument('--collection', choices=sorted(READING_MODELS), default=None)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--drop-legacy', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db = get_db()
+    if args.command == 'migrate':
+        names = [args.collection] if args.collection else list(READING_MODELS)
+        for name in names:
+            job = migrate(db, READING_MODELS[name], batch_size=args.batch_size, drop_legacy=args.drop_legacy)
+            print(f"{name}: {job.get('copied', 0)} copied, {job.get('skipped', 0)} skipped (no created_at)")
+    for row in stats(db):
+        print(f"{row['collection']:<16} {'time-series' if row['timeseries'] else 'plain':<12} "
+              f"{row['count']:>10} docs  storage {row['storage_bytes'] / 1e6:8.1f} MB  "
+              f"indexes {row['index_bytes'] / 1e6:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()